@@ -3,8 +3,6 @@ from flask import Flask, render_template, send_from_directory
 from config import Config
 from extensions import db, login_manager, csrf
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 
 # Try to import Flask-Migrate (optional)
 try:
@@ -14,23 +12,24 @@ except ImportError:
     migrate = None
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
-
-    # Configure logging
-    if not app.debug:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        file_handler = RotatingFileHandler(
-            'logs/app.log', maxBytes=10240, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
-        app.logger.info('Application startup')
+    # Optional overrides (e.g. from tests), applied before extensions start
+    if config:
+        app.config.update(config)
+
+    # Take the client address and scheme from the configured number of
+    # reverse proxies, so rate limits see clients rather than the proxy
+    proxies = app.config.get('PROXY_FIX', 0)
+    if proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    # Structured logging through a background queue listener
+    from utils import log
+    log.init_app(app)
+    app.logger.info('Application startup')
 
     # Upload Configuration - ADDED
     app.config['UPLOAD_FOLDER'] = app.config.get(
@@ -77,18 +76,28 @@ def create_app():
 
     # Import models so SQLAlchemy recognizes them
     with app.app_context():
-        import models.models  # registers User, Teacher, Student, Assignment, Class, Submission
+        import models.models  # registers User, Teacher, Student, Assignment, Class, Submission, ActivityEvent
 
         # Check if database exists and if schema is outdated
         db_file = app.config['SQLALCHEMY_DATABASE_URI'].replace(
             'sqlite:///', '')
         db_exists = os.path.exists(db_file)
 
+        # Apply additive schema changes in place so existing data is kept;
+        # the outdated-schema check below is for changes no migration covers
+        if os.environ.get('RECREATE_DB', '').lower() != 'true':
+            from migrate_unique_submissions import migrate_database as migrate_submissions
+            for change in migrate_submissions(db.engine):
+                app.logger.info('Migrated database: %s', change)
+            from migrate_add_versions import migrate_database as migrate_versions
+            for column in migrate_versions(db.engine):
+                app.logger.info('Migrated database: added %s', column)
+
         # Drop and recreate all tables if RECREATE_DB environment variable is set
         if os.environ.get('RECREATE_DB', '').lower() == 'true':
-            print("WARNING: RECREATE_DB is set to True - dropping all tables...")
+            app.logger.warning('RECREATE_DB is set - dropping all tables')
             db.drop_all()
-            print("SUCCESS: All tables dropped")
+            app.logger.info('All tables dropped')
         elif db_exists:
             # Check if schema is outdated by testing queries on multiple models
             schema_outdated = False
@@ -101,19 +110,58 @@ def create_app():
             except Exception as e:
                 error_str = str(e).lower()
                 if 'no such column' in error_str or 'no such table' in error_str:
-                    print(
-                        "WARNING: Detected outdated database schema. Recreating tables...")
-                    print(f"   Error: {str(e)[:150]}")
+                    app.logger.warning('Outdated database schema detected, recreating tables: %s',
+                                       str(e)[:150])
                     schema_outdated = True
                 else:
                     raise
 
             if schema_outdated:
                 db.drop_all()
-                print("SUCCESS: Old tables dropped")
+                app.logger.info('Old tables dropped')
 
         db.create_all()
-        print("SUCCESS: Database tables created/verified")
+        app.logger.info('Database tables created/verified')
+
+    # Server-side sessions (revocable, countable, small cookies)
+    from utils import sessions
+    sessions.init_app(app)
+
+    # Optional process pool for password hashing (503 when saturated)
+    from utils import hash_pool
+    hash_pool.init_app(app)
+
+    # Login/registration throttling (429 when a bucket is empty)
+    from utils import rate_limit
+    rate_limit.init_app(app)
+
+    # Buffered, append-only activity log
+    from utils import activity
+    activity.init_app(app)
+
+    # Batched last_login (and similar) timestamp writes
+    from utils import touch
+    touch.init_app(app)
+
+    # Priority admission control in front of everything else (503 when shed)
+    from utils import admission
+    admission.init_app(app)
+
+    # Per-request query counts, DB time and slow query log
+    from utils import profiling
+    profiling.init_app(app)
+
+    # Prometheus metrics at /metrics
+    from utils import metrics
+    metrics.init_app(app)
+
+    # {% cache %} fragments keyed on class/assignment versions
+    from utils import fragments
+    fragments.init_app(app)
+
+    # Fingerprinted static assets and gzip of large responses
+    from utils import assets
+    assets.init_app(app)
 
     # Define user loader AFTER models are imported
     from models.user import User
@@ -0,0 +1,385 @@
+"""
+Endpoint benchmark over scripted user journeys
+
+Seeds a synthetic school (benchmarks/school_data.py), then runs every
+journey -- a student checking dashboard, assignments and grades, a teacher
+grading, an admin going through the listings -- for a number of rounds and
+reports per endpoint:
+
+    p50 / p95 / p99 latency (ms), SQL statements per request (max), and
+    peak Python memory allocated while serving the request (KiB, tracemalloc)
+
+Latency and queries are measured in one pass and memory in a separate
+pass, because tracemalloc slows every allocation down.
+
+By default requests go through the Flask test client against an in-memory
+SQLite database. With --url they go over HTTP to a running server instead
+(seed its database with school_data.py first, same --scale and --seed),
+from --concurrency threads; queries then come from the Server-Timing
+header (PROFILING_SERVER_TIMING=true on the server) and memory is not
+measured.
+
+--check compares the results with benchmarks/baselines.json and exits with
+status 1 if an endpoint runs more queries than its baseline, or its p95
+latency or peak memory grew by more than the tolerance. Latency baselines
+depend on the machine; record them with --update-baseline on the machine
+that runs the check.
+
+Usage:
+    python benchmarks/journeys.py
+    python benchmarks/journeys.py --scale medium --rounds 20 --check
+    python benchmarks/journeys.py --update-baseline
+    python benchmarks/journeys.py --url http://127.0.0.1:5000 --concurrency 8
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from benchmarks.school_data import PASSWORD, SCALES, generate_school, plan_school
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# (name, role, steps); a step is (method, url template, form data or None),
+# templates are filled in from the school's well-known ids
+JOURNEYS = [
+    ('student', 'student', [
+        ('GET', '/student/dashboard', None),
+        ('GET', '/student/assignments', None),
+        ('GET', '/student/assignments/{assignment_id}/submission', None),
+        ('GET', '/student/grades', None),
+        ('GET', '/student/classes', None),
+    ]),
+    ('teacher-grading', 'teacher', [
+        ('GET', '/teacher/dashboard', None),
+        ('GET', '/teacher/grades', None),
+        ('GET', '/teacher/assignments/{assignment_id}/grade', None),
+        ('POST', '/teacher/submissions/{submission_id}/grade', {'grade': '88', 'feedback': 'Benchmark'}),
+        ('GET', '/teacher/students', None),
+        ('GET', '/teacher/students/{student_id}', None),
+        ('GET', '/teacher/classes/{class_id}', None),
+    ]),
+    ('admin-listings', 'admin', [
+        ('GET', '/admin/dashboard', None),
+        ('GET', '/admin/users', None),
+        ('GET', '/admin/teachers', None),
+        ('GET', '/admin/students', None),
+        ('GET', '/admin/assignments', None),
+    ]),
+]
+
+_PLACEHOLDER = re.compile(r'{(\w+)}')
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+_CSRF_TOKEN = re.compile(r'name="csrf[-_]token"\s+(?:content|value)="([^"]+)"')
+
+
+def endpoint_name(method, template):
+    """Report key of a step, e.g. 'GET /teacher/classes/<class_id>'"""
+    return method + ' ' + _PLACEHOLDER.sub(r'<\1>', template)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Results:
+    """Samples per endpoint, safe to add to from several threads"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, status, seconds=None, queries=None, memory=None):
+        with self._lock:
+            entry = self.samples.setdefault(endpoint, {'ms': [], 'queries': [], 'kib': [], 'errors': 0})
+            if status >= 400:
+                entry['errors'] += 1
+            if seconds is not None:
+                entry['ms'].append(seconds * 1000)
+            if queries is not None:
+                entry['queries'].append(queries)
+            if memory is not None:
+                entry['kib'].append(memory / 1024)
+
+    def summary(self):
+        """
+        Returns:
+            dict: {endpoint: n, errors, p50_ms, p95_ms, p99_ms, queries, memory_kib}
+        """
+        report = {}
+        for endpoint, entry in sorted(self.samples.items()):
+            ms = entry['ms']
+            report[endpoint] = {
+                'n': len(ms),
+                'errors': entry['errors'],
+                'p50_ms': round(percentile(ms, 50), 2) if ms else None,
+                'p95_ms': round(percentile(ms, 95), 2) if ms else None,
+                'p99_ms': round(percentile(ms, 99), 2) if ms else None,
+                'queries': max(entry['queries']) if entry['queries'] else None,
+                'memory_kib': round(max(entry['kib']), 1) if entry['kib'] else None,
+            }
+        return report
+
+
+# ---------------------------------------------------------
+# In-process runner (Flask test client)
+# ---------------------------------------------------------
+def create_benchmark_app(scale, seed, **config):
+    """Create an app on an in-memory database seeded with a synthetic school"""
+    from sqlalchemy import event
+    from app import create_app
+    from extensions import db
+
+    app = create_app(dict({
+        'WTF_CSRF_ENABLED': False,
+        'ACTIVITY_LOG_ASYNC': False,
+        'TOUCH_ASYNC': False,
+        'SESSION_PURGE_INTERVAL': 0,
+        'RATE_LIMIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+        'LOG_REQUESTS': False,
+    }, **config))
+    with app.app_context():
+        db.create_all()
+        school = generate_school(scale, seed=seed)
+        engine = db.engine
+
+    counter = {'queries': 0}
+
+    def count(*args):
+        counter['queries'] += 1
+    event.listen(engine, 'before_cursor_execute', count)
+    return app, school['ids'], counter
+
+
+def _login(app, email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'login failed for {email}: {response.status_code}')
+    # The first page after login also writes the session
+    client.get('/')
+    return client
+
+
+def run_in_process(app, ids, counter, rounds, measure_memory=True):
+    """Run every journey `rounds` times and return the Results"""
+    results = Results()
+    clients = {role: _login(app, ids[f'{role}_email']) for role in ('student', 'teacher', 'admin')}
+
+    def request(client, method, url, data):
+        response = client.open(url, method=method, data=data)
+        response.close()
+        return response.status_code
+
+    for _ in range(rounds):
+        for _, role, steps in JOURNEYS:
+            for method, template, data in steps:
+                url = template.format(**ids)
+                counter['queries'] = 0
+                started = time.perf_counter()
+                status = request(clients[role], method, url, data)
+                results.add(endpoint_name(method, template), status,
+                            seconds=time.perf_counter() - started, queries=counter['queries'])
+
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            for _, role, steps in JOURNEYS:
+                for method, template, data in steps:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    status = request(clients[role], method, template.format(**ids), data)
+                    results.add(endpoint_name(method, template), status,
+                                memory=tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+# ---------------------------------------------------------
+# HTTP runner (a running server)
+# ---------------------------------------------------------
+class HttpClient:
+    """Cookie-keeping urllib client that sends the page's CSRF token"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect()
+        )
+        self.csrf_token = None
+
+    def open(self, method, path, data=None):
+        """Returns (status, body, headers)"""
+        body = None
+        headers = {'Accept': 'text/html'}
+        if data is not None:
+            data = dict(data, csrf_token=self.csrf_token or '')
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token or ''
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request) as response:
+                status, content, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as error:
+            status, content, response_headers = error.code, error.read(), error.headers
+        match = _CSRF_TOKEN.search(content.decode('utf-8', 'replace'))
+        if match:
+            self.csrf_token = match.group(1)
+        return status, content, response_headers
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def run_http(base_url, ids, rounds, concurrency):
+    """Run the journeys against a server from `concurrency` threads"""
+    results = Results()
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(rounds):
+                for _, role, steps in JOURNEYS:
+                    client = HttpClient(base_url)
+                    client.open('GET', '/login')
+                    client.open('POST', '/login', {'email': ids[f'{role}_email'], 'password': PASSWORD})
+                    for method, template, data in steps:
+                        started = time.perf_counter()
+                        status, _, headers = client.open(method, template.format(**ids), data)
+                        elapsed = time.perf_counter() - started
+                        match = _SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+                        results.add(endpoint_name(method, template), status, seconds=elapsed,
+                                    queries=int(match.group(1)) if match else None)
+        except Exception as error:  # reported after the other threads finish
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+# ---------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------
+def compare(report, baseline, latency_tolerance=0.5, memory_tolerance=0.5):
+    """
+    List regressions of a report against a baseline
+
+    Args:
+        report (dict): Results.summary()
+        baseline (dict): A stored summary for the same scale
+        latency_tolerance (float): Allowed relative growth of p95 latency
+        memory_tolerance (float): Allowed relative growth of peak memory
+
+    Returns:
+        list: Human-readable regression messages (empty if none)
+    """
+    problems = []
+    for endpoint, current in report.items():
+        if current['errors']:
+            problems.append(f'{endpoint}: {current["errors"]} error responses')
+        expected = baseline.get(endpoint)
+        if expected is None:
+            continue
+        if None not in (current['queries'], expected.get('queries')) and current['queries'] > expected['queries']:
+            problems.append(f'{endpoint}: {current["queries"]} queries (baseline {expected["queries"]})')
+        for field, tolerance, unit in (('p95_ms', latency_tolerance, 'ms'), ('memory_kib', memory_tolerance, 'KiB')):
+            if None in (current[field], expected.get(field)):
+                continue
+            limit = expected[field] * (1 + tolerance)
+            if current[field] > limit:
+                problems.append(f'{endpoint}: {field} {current[field]}{unit} > {limit:.1f}{unit} '
+                                f'(baseline {expected[field]}{unit} + {tolerance:.0%})')
+    return problems
+
+
+def load_baselines(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines, path=BASELINE_FILE):
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def print_report(report):
+    print(f"{'endpoint':<52} {'n':>4} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'mem KiB':>8}")
+    for endpoint, row in report.items():
+        cells = [row[k] if row[k] is not None else '-' for k in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'memory_kib')]
+        print(f"{endpoint:<52} {row['n']:>4} {row['errors']:>4} " + ' '.join(f'{c:>8}' for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rounds', type=int, default=10, help='times each journey is run')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--concurrency', type=int, default=4, help='threads for --url')
+    parser.add_argument('--check', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.5)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    if args.url:
+        ids = plan_school(seed=args.seed, **SCALES[args.scale])['ids']
+        results = run_http(args.url, ids, args.rounds, args.concurrency)
+    else:
+        app, ids, counter = create_benchmark_app(args.scale, args.seed)
+        results = run_in_process(app, ids, counter, args.rounds, measure_memory=not args.no_memory)
+    report = results.summary()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    baselines = load_baselines()
+    if args.update_baseline:
+        baselines[args.scale] = report
+        save_baselines(baselines)
+        print(f'Baseline for {args.scale} written to {BASELINE_FILE}')
+    if args.check:
+        problems = compare(report, baselines.get(args.scale, {}),
+                           args.latency_tolerance, args.memory_tolerance)
+        for problem in problems:
+            print(f'REGRESSION {problem}')
+        if problems:
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Seeded synthetic school data for benchmarks and query budget tests
+
+plan_school() turns a scale (teachers, classes per teacher, students per
+class, assignments per class, submission and grading rates) and a seed into
+the rows of a complete school; generate_school() inserts them. The plan is
+a pure function of its arguments and rows get explicit ids, so the same
+scale and seed always produce the same database, and a load generator
+pointed at a server seeded from that plan can work out the same ids and
+credentials without a database of its own.
+
+Every user's password is PASSWORD. Emails are admin@school.test,
+teacher<n>@school.test and student<n>@school.test.
+
+Usage (seed a database for a server to run against):
+    DATABASE_URL=sqlite:///bench.db python benchmarks/school_data.py --scale medium
+"""
+import argparse
+import math
+import os
+import random
+import string
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'benchmark-pass-123'
+
+# Named sizes; any of the plan_school() keyword arguments may be overridden
+SCALES = {
+    'tiny': dict(teachers=2, classes_per_teacher=2, students_per_class=5, assignments_per_class=3),
+    'small': dict(teachers=5, classes_per_teacher=3, students_per_class=20, assignments_per_class=6),
+    'medium': dict(teachers=20, classes_per_teacher=4, students_per_class=30, assignments_per_class=10),
+    'large': dict(teachers=60, classes_per_teacher=5, students_per_class=35, assignments_per_class=15),
+}
+
+# Fixed point in time, so plans do not depend on when they are made
+EPOCH = datetime(2024, 9, 2, 8, 0, 0)
+
+_FIRST_NAMES = ['Ana', 'Ben', 'Chea', 'Dara', 'Eli', 'Fatima', 'Gus', 'Hana', 'Ivan', 'Jia',
+                'Kosal', 'Lina', 'Mony', 'Nika', 'Omar', 'Pich', 'Rina', 'Sok', 'Tola', 'Vy']
+_LAST_NAMES = ['Chan', 'Doe', 'Heng', 'Kim', 'Ly', 'Meas', 'Nguyen', 'Ouk', 'Sam', 'Tan']
+_SUBJECTS = ['Algebra', 'Biology', 'Chemistry', 'English', 'Geography', 'History', 'Physics', 'Programming']
+
+
+def plan_school(seed=42, teachers=5, classes_per_teacher=3, students_per_class=20,
+                assignments_per_class=6, classes_per_student=3, submission_rate=0.8,
+                graded_rate=0.6):
+    """
+    Build the rows of a synthetic school
+
+    Args:
+        seed (int): Random seed
+        teachers (int): Number of teachers
+        classes_per_teacher (int): Classes taught by each teacher
+        students_per_class (int): Enrolment of every class
+        assignments_per_class (int): Assignments in every class, due a week apart
+        classes_per_student (int): Classes each student is enrolled in
+        submission_rate (float): Share of (assignment, student) pairs submitted
+        graded_rate (float): Share of submissions that are graded
+
+    Returns:
+        dict: Rows per table ('users', 'teachers', 'students', 'classes',
+            'class_student', 'assignments', 'submissions',
+            'submission_versions') and 'ids', a few well-known ids for
+            journeys (teacher, student, class, assignment, submission, an
+            assignment the student was graded on and a class the student
+            has not joined)
+    """
+    rng = random.Random(seed)
+    rows = {name: [] for name in ('users', 'teachers', 'students', 'classes', 'class_student',
+                                  'assignments', 'submissions', 'submission_versions')}
+
+    def add_user(username, role):
+        user_id = len(rows['users']) + 1
+        rows['users'].append({
+            'id': user_id, 'username': username, 'email': f'{username}@school.test',
+            'password': None, 'role': role, 'status': 'active',
+            'created_at': EPOCH - timedelta(days=30),
+        })
+        return user_id
+
+    add_user('admin', 'admin')
+
+    codes = set()
+    for t in range(1, teachers + 1):
+        user_id = add_user(f'teacher{t}', 'teacher')
+        rows['teachers'].append({
+            'id': t, 'user_id': user_id, 'first_name': rng.choice(_FIRST_NAMES),
+            'last_name': rng.choice(_LAST_NAMES), 'department': 'Sciences',
+            'subject': rng.choice(_SUBJECTS), 'created_at': EPOCH - timedelta(days=30),
+        })
+        for _ in range(classes_per_teacher):
+            code = None
+            while code is None or code in codes:
+                code = ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+            codes.add(code)
+            class_id = len(rows['classes']) + 1
+            rows['classes'].append({
+                'id': class_id, 'name': f'{rng.choice(_SUBJECTS)} {class_id}',
+                'description': f'Section {class_id}', 'class_code': code, 'teacher_id': t,
+                'created_at': EPOCH - timedelta(days=14),
+            })
+
+    class_count = len(rows['classes'])
+    per_student = max(1, min(classes_per_student, class_count))
+    student_count = max(students_per_class, math.ceil(class_count * students_per_class / per_student))
+    for s in range(1, student_count + 1):
+        user_id = add_user(f'student{s}', 'student')
+        rows['students'].append({
+            'id': s, 'user_id': user_id, 'first_name': rng.choice(_FIRST_NAMES),
+            'last_name': rng.choice(_LAST_NAMES), 'year': str(rng.randint(1, 4)),
+            'section': rng.choice('ABC'), 'created_at': EPOCH - timedelta(days=30),
+        })
+
+    # Fill classes in turn from a shuffled order of students, so every class
+    # gets exactly students_per_class students and nobody is enrolled twice
+    roster = {}
+    order = list(range(1, student_count + 1))
+    rng.shuffle(order)
+    position = 0
+    for cls in rows['classes']:
+        members = set()
+        while len(members) < min(students_per_class, student_count):
+            members.add(order[position % student_count])
+            position += 1
+        roster[cls['id']] = sorted(members)
+        rows['class_student'].extend({'class_id': cls['id'], 'student_id': s} for s in roster[cls['id']])
+
+    for cls in rows['classes']:
+        for a in range(assignments_per_class):
+            assignment_id = len(rows['assignments']) + 1
+            due = EPOCH + timedelta(weeks=a + 1)
+            rows['assignments'].append({
+                'id': assignment_id, 'title': f'Assignment {a + 1}', 'description': 'Synthetic assignment',
+                'due_date': due, 'status': 'active', 'created_at': EPOCH,
+                'class_id': cls['id'], 'teacher_id': cls['teacher_id'],
+            })
+            for student_id in roster[cls['id']]:
+                if rng.random() >= submission_rate:
+                    continue
+                submission_id = len(rows['submissions']) + 1
+                submitted = due - timedelta(minutes=rng.randint(1, 7 * 24 * 60))
+                graded = rng.random() < graded_rate
+                content_hash = '%064x' % rng.getrandbits(256)
+                file_path = f'uploads/submissions/{content_hash[:2]}/{content_hash}/work.pdf'
+                rows['submissions'].append({
+                    'id': submission_id, 'assignment_id': assignment_id, 'student_id': student_id,
+                    'file_path': file_path, 'comments': '', 'submitted_at': submitted,
+                    'grade': round(rng.uniform(40, 100), 1) if graded else None,
+                    'feedback': 'Good work' if graded else None,
+                    'graded_at': submitted + timedelta(days=2) if graded else None,
+                    'version': 1, 'content_hash': content_hash,
+                })
+                rows['submission_versions'].append({
+                    'id': submission_id, 'submission_id': submission_id, 'version': 1, 'is_latest': True,
+                    'file_path': file_path, 'file_name': 'work.pdf', 'file_size': rng.randint(10_000, 2_000_000),
+                    'content_type': 'application/pdf', 'content_hash': content_hash,
+                    'comments': '', 'submitted_at': submitted,
+                })
+
+    first_class = rows['classes'][0]
+    first_assignment = next(a for a in rows['assignments'] if a['class_id'] == first_class['id'])
+    ungraded = next((s for s in rows['submissions']
+                     if s['assignment_id'] == first_assignment['id'] and s['grade'] is None),
+                    next((s for s in rows['submissions'] if s['assignment_id'] == first_assignment['id']), None))
+    student_id = roster[first_class['id']][0]
+    # A class the student is not enrolled in, if there is one
+    open_class = next((c for c in rows['classes'] if student_id not in roster[c['id']]), None)
+    graded = next((s for s in rows['submissions'] if s['student_id'] == student_id and s['grade'] is not None), None)
+    rows['ids'] = {
+        'teacher_email': 'teacher1@school.test',
+        'student_email': f'student{student_id}@school.test',
+        'admin_email': 'admin@school.test',
+        'teacher_id': 1,
+        'teacher_user_id': rows['teachers'][0]['user_id'],
+        'student_id': student_id,
+        'student_user_id': rows['students'][student_id - 1]['user_id'],
+        'class_id': first_class['id'],
+        'class_code': first_class['class_code'],
+        'open_class_id': open_class['id'] if open_class else None,
+        'open_class_code': open_class['class_code'] if open_class else None,
+        'assignment_id': first_assignment['id'],
+        'submission_id': ungraded['id'] if ungraded else None,
+        'graded_assignment_id': graded['assignment_id'] if graded else None,
+    }
+    return rows
+
+
+def generate_school(scale='small', seed=42, password_hash=None, **overrides):
+    """
+    Insert a planned school into the current app's (empty) database
+
+    Args:
+        scale (str): Name in SCALES
+        seed (int): Random seed
+        password_hash (str): Stored password of every user (default: a
+            hash of PASSWORD under the app's hashing policy)
+        **overrides: plan_school() arguments replacing the scale's values
+
+    Returns:
+        dict: Row counts per table and the plan's 'ids'
+    """
+    from extensions import db
+    from models.user import User
+    from models.teacher import Teacher
+    from models.student import Student
+    from models.class_model import Class, class_student
+    from models.assignment import Assignment
+    from models.submission import Submission
+    from models.submission_version import SubmissionVersion
+    from utils.passwords import hash_password
+
+    plan = plan_school(seed=seed, **dict(SCALES[scale], **overrides))
+    password_hash = password_hash or hash_password(PASSWORD)
+    for user in plan['users']:
+        user['password'] = password_hash
+
+    tables = [('users', User.__table__), ('teachers', Teacher.__table__), ('students', Student.__table__),
+              ('classes', Class.__table__), ('class_student', class_student),
+              ('assignments', Assignment.__table__), ('submissions', Submission.__table__),
+              ('submission_versions', SubmissionVersion.__table__)]
+    with db.engine.begin() as conn:
+        for name, table in tables:
+            if plan[name]:
+                conn.execute(table.insert(), plan[name])
+
+    summary = {name: len(plan[name]) for name, _ in tables}
+    summary['ids'] = plan['ids']
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a database with a synthetic school')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app({'ACTIVITY_LOG_ASYNC': False, 'TOUCH_ASYNC': False})
+    with app.app_context():
+        db.create_all()
+        summary = generate_school(args.scale, seed=args.seed)
+    for name, value in summary.items():
+        print(f'{name:<20} {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,9 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static/uploads/assignments')
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'zip', 'jpg', 'jpeg', 'png'}
     SUBMISSION_FOLDER = os.path.join(BASE_DIR, 'static/uploads/submissions')
+    # Submitted files, stored by content hash (see utils/submissions.py); a
+    # relative path is taken from the project root, where the app is run from
+    SUBMISSION_UPLOAD_FOLDER = os.environ.get('SUBMISSION_UPLOAD_FOLDER', 'uploads/submissions')
     
     # CSRF Protection
     WTF_CSRF_ENABLED = True
@@ -30,11 +33,128 @@ class Config:
     # Maximum file upload size (16MB)
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     
+    # Logging: records are queued and written by a background thread, as JSON
+    # lines (LOG_FORMAT=json) or text, to LOG_FILE rotated at LOG_MAX_BYTES.
+    # Records beyond LOG_QUEUE_SIZE waiting to be written are dropped.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 10))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'true').lower() == 'true'  # one access record per request
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutes
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    # Where session data lives: database (default) or redis keep it server-side
+    # with only an id in the cookie; cookie keeps Flask's signed cookie sessions
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'database')
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    SESSION_PURGE_INTERVAL = int(os.environ.get('SESSION_PURGE_INTERVAL', 300))  # seconds, 0 = off
+    
+    # Admin dashboard statistics snapshot lifetime (seconds)
+    ADMIN_STATS_REFRESH_SECONDS = int(os.environ.get('ADMIN_STATS_REFRESH_SECONDS', 60))
+    
+    # Activity log: events are buffered and written in batches
+    ACTIVITY_LOG_ASYNC = os.environ.get('ACTIVITY_LOG_ASYNC', 'true').lower() == 'true'
+    ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 2.0))
+    ACTIVITY_FLUSH_SIZE = int(os.environ.get('ACTIVITY_FLUSH_SIZE', 100))
+    ACTIVITY_RETENTION_DAYS = int(os.environ.get('ACTIVITY_RETENTION_DAYS', 90))
+    
+    # "Touch" timestamps such as User.last_login are buffered and written in batches
+    TOUCH_ASYNC = os.environ.get('TOUCH_ASYNC', 'true').lower() == 'true'
+    TOUCH_FLUSH_INTERVAL = float(os.environ.get('TOUCH_FLUSH_INTERVAL', 5.0))
+    TOUCH_FLUSH_SIZE = int(os.environ.get('TOUCH_FLUSH_SIZE', 200))
+    
+    # What a second submit of the same assignment does: replace (default) adds
+    # a new version while the submission is ungraded; reject keeps the first
+    # submission. Every accepted file is kept in the version history.
+    SUBMISSION_RESUBMIT_POLICY = os.environ.get('SUBMISSION_RESUBMIT_POLICY', 'replace')
+    
+    # Password hashing policy: a name from utils.passwords.HASH_POLICIES or a
+    # werkzeug method string such as "scrypt:32768:8:1" / "pbkdf2:sha256:600000".
+    # Existing hashes are upgraded on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # Hash in a bounded process pool instead of on the request thread (0 = off).
+    # Requests beyond workers + queue size, or slower than the timeout, get a 503.
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5.0))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 1))
+    
+    # Number of reverse proxies in front of the app whose X-Forwarded-For and
+    # X-Forwarded-Proto headers are trusted (0 = none, the app faces clients).
+    # Without it every client behind a proxy has the proxy's address, so the
+    # per-IP rate limits lump them together. Never set it higher than the real
+    # number of proxies: clients could then choose their own address.
+    PROXY_FIX = int(os.environ.get('PROXY_FIX', 0))
+    
+    # Login/registration throttling: token buckets per client IP and per email,
+    # written as "capacity/seconds". Backend: memory (per process), database
+    # (shared table) or redis (RATE_LIMIT_REDIS_URL, needs the redis package).
+    # Successful logins don't count against RATE_LIMIT_LOGIN_IP, and
+    # RATE_LIMIT_REGISTER_IP leaves room for a class registering together from
+    # one school address.
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000))
+    RATE_LIMIT_LOGIN_IP = os.environ.get('RATE_LIMIT_LOGIN_IP', '30/60')
+    RATE_LIMIT_LOGIN_EMAIL = os.environ.get('RATE_LIMIT_LOGIN_EMAIL', '10/300')
+    RATE_LIMIT_REGISTER_IP = os.environ.get('RATE_LIMIT_REGISTER_IP', '60/3600')
+    RATE_LIMIT_REGISTER_EMAIL = os.environ.get('RATE_LIMIT_REGISTER_EMAIL', '3/3600')
+    
+    # Admission control (0 = off): at most ADMISSION_MAX_CONCURRENT requests
+    # run at once per process. Submits and grading may use the reserved slots;
+    # dashboards and analytics are capped lower and shed first under overload.
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 0))
+    ADMISSION_RESERVED = int(os.environ.get('ADMISSION_RESERVED', 4))
+    ADMISSION_LOW_LIMIT = int(os.environ.get('ADMISSION_LOW_LIMIT', 0))  # 0 = no separate cap
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 64))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5.0))
+    ADMISSION_LOW_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_LOW_QUEUE_TIMEOUT', 0.5))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+    
+    # Per-request SQL profiling: query count, DB time and rows per endpoint.
+    # Statements slower than PROFILING_SLOW_QUERY_MS (0 = off) are logged with
+    # their route; Server-Timing headers are sent in debug or when enabled here.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILING_SLOW_QUERY_MS = float(os.environ.get('PROFILING_SLOW_QUERY_MS', 100))
+    PROFILING_SERVER_TIMING = os.environ.get('PROFILING_SERVER_TIMING', 'false').lower() == 'true'
+    
+    # Prometheus metrics at /metrics, readable by a logged-in admin, by a
+    # scraper sending "Authorization: Bearer <METRICS_TOKEN>", or from
+    # METRICS_ALLOW_FROM (comma-separated IPs/networks; empty by default, as
+    # behind a proxy on the same host every client looks like 127.0.0.1).
+    # Set METRICS_MULTIPROC_DIR to a directory shared by all workers to
+    # report totals across processes.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    METRICS_ALLOW_FROM = os.environ.get('METRICS_ALLOW_FROM', '')
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+    METRICS_WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', 5.0))
+    
+    # Fragment cache for {% cache %} blocks in templates (utils/fragments.py):
+    # 'memory' keeps up to FRAGMENT_CACHE_MAX_ENTRIES fragments per process,
+    # 'redis' shares them between workers through FRAGMENT_CACHE_REDIS_URL.
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    FRAGMENT_CACHE_REDIS_URL = os.environ.get('FRAGMENT_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 1000))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 600))
+    
+    # Static assets and compression (utils/assets.py): after `flask assets
+    # build`, url_for('static', ...) links to minified, content-hashed files
+    # cached for ASSETS_MAX_AGE seconds. HTML/JSON responses of at least
+    # COMPRESS_MIN_SIZE bytes are gzipped for clients that accept it.
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', 'true').lower() == 'true'
+    ASSETS_MAX_AGE = int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 3600))
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
     
     # Admin security - whitelist of authorized admin emails/usernames
     # Only these emails/usernames can register as admin or be granted admin role
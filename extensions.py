@@ -1,5 +1,8 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 # Try to import CSRFProtect, make it optional
 try:
@@ -15,3 +18,12 @@ except ImportError:
 db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.login_view = "auth_bp.login"
+
+
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores foreign keys, ON DELETE CASCADE included, unless asked per connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
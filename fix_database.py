@@ -9,7 +9,7 @@ This script helps fix database schema issues by either:
 Usage:
     python fix_database.py                    # Check database status
     python fix_database.py --recreate         # Recreate database (deletes all data)
-    python fix_database.py --migrate          # Run migration to add class_code
+    python fix_database.py --migrate          # Run migrations (class_code, submissions, version columns)
 """
 import os
 import sys
@@ -32,12 +32,28 @@ def recreate_database():
         return False
 
 def migrate_database():
-    """Run migration to add class_code column"""
+    """Run the migrations that add class_code, unique submissions and the version columns"""
     print("Running migration to add class_code column...")
     try:
         from migrate_add_class_code import migrate_database
         db_path = "instance/database.db"
-        return migrate_database(db_path)
+        if not migrate_database(db_path):
+            return False
+    except Exception as e:
+        print(f"ERROR: Migration failed: {str(e)}")
+        return False
+
+    print("Running migrations for submissions and version columns...")
+    try:
+        from sqlalchemy import create_engine
+        from migrate_unique_submissions import migrate_database as migrate_submissions
+        from migrate_add_versions import migrate_database as migrate_versions
+        engine = create_engine(f"sqlite:///{db_path}")
+        for change in migrate_submissions(engine):
+            print(f"SUCCESS: {change}")
+        for column in migrate_versions(engine):
+            print(f"SUCCESS: Added {column}")
+        return True
     except Exception as e:
         print(f"ERROR: Migration failed: {str(e)}")
         return False
@@ -96,7 +112,7 @@ if __name__ == "__main__":
             print("Usage:")
             print("  python fix_database.py           # Check database status")
             print("  python fix_database.py --recreate  # Recreate database (deletes all data)")
-            print("  python fix_database.py --migrate    # Run migration to add class_code")
+            print("  python fix_database.py --migrate    # Run migrations (class_code, submissions, version columns)")
     else:
         check_database()
 
@@ -0,0 +1,86 @@
+"""
+Migration script to add the version counters of classes and assignments.
+This script will:
+1. Add version (starting at 1) to the classes and assignments tables
+2. Add updated_at, filled in from created_at for existing rows
+3. Do nothing for columns that already exist
+
+The app runs it on startup (see create_app), so existing databases keep
+their data instead of being recreated; it can also be run by hand.
+"""
+import os
+import sys
+from sqlalchemy import create_engine, inspect, text
+
+# Placeholder for NOT NULL timestamps until existing rows are backfilled;
+# SQLite cannot add a column with a non-constant default
+EPOCH = '1970-01-01 00:00:00'
+
+# table -> (column, DDL, backfill statement or None)
+COLUMNS = {
+    'classes': [
+        ('version', 'INTEGER NOT NULL DEFAULT 1', None),
+        ('updated_at', f"TIMESTAMP NOT NULL DEFAULT '{EPOCH}'",
+         'UPDATE classes SET updated_at = created_at'),
+    ],
+    'assignments': [
+        ('version', 'INTEGER NOT NULL DEFAULT 1', None),
+        ('updated_at', f"TIMESTAMP NOT NULL DEFAULT '{EPOCH}'",
+         'UPDATE assignments SET updated_at = created_at'),
+    ],
+}
+
+
+def migrate_database(engine):
+    """
+    Add the missing version columns to an existing database
+
+    Args:
+        engine (Engine): Database to migrate
+
+    Returns:
+        list: "table.column" of every column added
+    """
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for table, columns in COLUMNS.items():
+            if table not in tables:
+                # A new database; create_all() builds the table complete
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name, ddl, backfill in columns:
+                if name in existing:
+                    continue
+                conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+                if backfill:
+                    conn.execute(text(backfill))
+                added.append(f'{table}.{name}')
+    return added
+
+
+if __name__ == "__main__":
+    # Get database path from the command line or use the default
+    db_path = "instance/database.db"
+
+    if len(sys.argv) > 1:
+        db_path = sys.argv[1]
+
+    if not os.path.exists(db_path):
+        print(f"ERROR: Database file not found: {db_path}")
+        sys.exit(1)
+
+    print(f"Migrating database: {db_path}")
+    print("=" * 50)
+
+    try:
+        added = migrate_database(create_engine(f"sqlite:///{db_path}"))
+    except Exception as e:
+        print(f"ERROR: Migration failed: {str(e)}")
+        sys.exit(1)
+
+    for column in added:
+        print(f"SUCCESS: Added {column}")
+    print("=" * 50)
+    print("SUCCESS: Migration completed!" if added else "SUCCESS: Columns already exist. No migration needed.")
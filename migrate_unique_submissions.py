@@ -0,0 +1,182 @@
+"""
+Migration script for one submission per student and assignment.
+This script will:
+1. Add the version, content_hash and updated_at columns to submissions
+2. Create submission_versions
+3. Merge duplicate (assignment_id, student_id) submissions into the one
+   to keep (the graded one if there is one, otherwise the latest): every
+   duplicate becomes an older version of it, so no file or comment is
+   lost, and each merge is reported
+4. Add the unique index the submission upsert relies on, and the
+   submissions indexes create_all() does not add to existing tables
+5. Record every other existing submission as its first version
+6. Do nothing for steps that are already done
+
+The app runs it on startup (see create_app) and logs every change, so
+existing databases keep their data instead of being recreated; it can
+also be run by hand.
+"""
+import os
+import sys
+from sqlalchemy import bindparam, create_engine, inspect, text
+
+UNIQUE_INDEX = 'uq_submissions_assignment_id_student_id'
+
+# Placeholder for NOT NULL timestamps until existing rows are backfilled;
+# SQLite cannot add a column with a non-constant default
+EPOCH = '1970-01-01 00:00:00'
+
+# (column, DDL, backfill statement or None)
+COLUMNS = [
+    ('version', 'INTEGER NOT NULL DEFAULT 1', None),
+    ('content_hash', 'VARCHAR(64)', None),
+    ('updated_at', f"TIMESTAMP NOT NULL DEFAULT '{EPOCH}'",
+     'UPDATE submissions SET updated_at = COALESCE(graded_at, submitted_at)'),
+]
+
+# Every submission of a student and assignment that has more than one
+DUPLICATES = """
+    SELECT s.id, s.assignment_id, s.student_id, s.file_path, s.comments, s.content_hash,
+           s.grade, s.submitted_at
+    FROM submissions s
+    JOIN (
+        SELECT assignment_id, student_id FROM submissions
+        GROUP BY assignment_id, student_id HAVING COUNT(*) > 1
+    ) d ON d.assignment_id = s.assignment_id AND d.student_id = s.student_id
+    ORDER BY s.assignment_id, s.student_id, s.submitted_at, s.id
+"""
+
+MERGED_VERSION = """
+    INSERT INTO submission_versions
+        (submission_id, version, is_latest, file_path, comments, content_hash, submitted_at)
+    VALUES (:submission_id, :version, :is_latest, :file_path, :comments, :content_hash, :submitted_at)
+"""
+
+FIRST_VERSIONS = """
+    INSERT INTO submission_versions
+        (submission_id, version, is_latest, file_path, comments, content_hash, submitted_at)
+    SELECT s.id, s.version, :latest, s.file_path, s.comments, s.content_hash, s.submitted_at
+    FROM submissions s
+    WHERE NOT EXISTS (SELECT 1 FROM submission_versions v WHERE v.submission_id = s.id)
+"""
+
+
+def _has_unique_key(inspector):
+    names = {index['name'] for index in inspector.get_indexes('submissions') if index.get('unique')}
+    names |= {constraint['name'] for constraint in inspector.get_unique_constraints('submissions')}
+    if UNIQUE_INDEX in names:
+        return True
+    # SQLite reports an unnamed UNIQUE (assignment_id, student_id) without a name
+    return any(sorted(c['column_names']) == ['assignment_id', 'student_id']
+               for c in inspector.get_unique_constraints('submissions'))
+
+
+def _merge_duplicates(conn):
+    # One group of rows per student and assignment, oldest first
+    groups = {}
+    for row in conn.execute(text(DUPLICATES)).mappings():
+        groups.setdefault((row['assignment_id'], row['student_id']), []).append(row)
+
+    changes = []
+    for rows in groups.values():
+        keep = max(rows, key=lambda row: (row['grade'] is not None, row['submitted_at'], row['id']))
+        older = [row for row in rows if row is not keep]
+        # The duplicates become versions 1..n-1 in the order they were
+        # submitted, and the kept row the latest version
+        for version, row in enumerate(older + [keep], start=1):
+            conn.execute(text(MERGED_VERSION), {
+                'submission_id': keep['id'], 'version': version, 'is_latest': row is keep,
+                'file_path': row['file_path'], 'comments': row['comments'],
+                'content_hash': row['content_hash'], 'submitted_at': row['submitted_at']
+            })
+        conn.execute(text('UPDATE submissions SET version = :version WHERE id = :id'),
+                     {'version': len(rows), 'id': keep['id']})
+        removed = [row['id'] for row in older]
+        conn.execute(text('DELETE FROM submissions WHERE id IN :ids').bindparams(bindparam('ids', expanding=True)),
+                     {'ids': removed})
+        changes.append(f"merged submissions {removed} into submission {keep['id']} "
+                       f"(assignment {keep['assignment_id']}, student {keep['student_id']}) as older versions")
+        for row in older:
+            if row['grade'] is not None:
+                changes.append(f"dropped grade {row['grade']} of submission {row['id']}; "
+                               f"submission {keep['id']} keeps its grade {keep['grade']}")
+    return changes
+
+
+def migrate_database(engine):
+    """
+    Bring an existing submissions table up to one row per student and assignment
+
+    Args:
+        engine (Engine): Database to migrate
+
+    Returns:
+        list: Description of every change made
+    """
+    from models.submission import Submission
+    from models.submission_version import SubmissionVersion
+
+    changes = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        if 'submissions' not in inspector.get_table_names():
+            # A new database; create_all() builds the tables complete
+            return changes
+
+        existing = {column['name'] for column in inspector.get_columns('submissions')}
+        for name, ddl, backfill in COLUMNS:
+            if name in existing:
+                continue
+            conn.execute(text(f'ALTER TABLE submissions ADD COLUMN {name} {ddl}'))
+            if backfill:
+                conn.execute(text(backfill))
+            changes.append(f'added submissions.{name}')
+
+        new_versions_table = 'submission_versions' not in inspector.get_table_names()
+        if new_versions_table:
+            SubmissionVersion.__table__.create(conn)
+            changes.append('added table submission_versions')
+
+        if not _has_unique_key(inspector):
+            changes += _merge_duplicates(conn)
+            conn.execute(text(f'CREATE UNIQUE INDEX {UNIQUE_INDEX} ON submissions (assignment_id, student_id)'))
+            changes.append(f'added index {UNIQUE_INDEX}')
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes('submissions')}
+        for index in Submission.__table__.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn)
+                changes.append(f'added index {index.name}')
+
+        if new_versions_table:
+            # Submissions merged above already have their versions
+            recorded = conn.execute(text(FIRST_VERSIONS), {'latest': True}).rowcount
+            if recorded:
+                changes.append(f'recorded {recorded} existing submissions as versions')
+    return changes
+
+
+if __name__ == "__main__":
+    # Get database path from the command line or use the default
+    db_path = "instance/database.db"
+
+    if len(sys.argv) > 1:
+        db_path = sys.argv[1]
+
+    if not os.path.exists(db_path):
+        print(f"ERROR: Database file not found: {db_path}")
+        sys.exit(1)
+
+    print(f"Migrating database: {db_path}")
+    print("=" * 50)
+
+    try:
+        changes = migrate_database(create_engine(f"sqlite:///{db_path}"))
+    except Exception as e:
+        print(f"ERROR: Migration failed: {str(e)}")
+        sys.exit(1)
+
+    for change in changes:
+        print(f"SUCCESS: {change}")
+    print("=" * 50)
+    print("SUCCESS: Migration completed!" if changes else "SUCCESS: Schema is up to date. No migration needed.")
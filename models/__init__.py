@@ -4,8 +4,12 @@ from .teacher import Teacher
 from .assignment import Assignment
 from .class_model import Class
 from .submission import Submission
+from .submission_version import SubmissionVersion
+from .activity_event import ActivityEvent, ActivityRollup
+from .rate_limit_bucket import RateLimitBucket
+from .user_session import UserSession
 
 # Import db from extensions instead of creating a new instance
 from extensions import db
 
-__all__ = ['User', 'Student', 'Teacher', 'Assignment', 'Class', 'Submission', 'db']
+__all__ = ['User', 'Student', 'Teacher', 'Assignment', 'Class', 'Submission', 'SubmissionVersion', 'ActivityEvent', 'ActivityRollup', 'RateLimitBucket', 'UserSession', 'db']
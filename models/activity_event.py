@@ -0,0 +1,38 @@
+from extensions import db
+from datetime import datetime
+
+
+class ActivityEvent(db.Model):
+    """Append-only log of user and admin actions"""
+    __tablename__ = 'activity_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.String(255), nullable=False)
+    # Plain integer (no FK) so events outlive the user they mention
+    user_id = db.Column(db.Integer, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_activity_events_type_created_at', 'type', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ActivityEvent {self.type} at {self.created_at}>"
+
+
+class ActivityRollup(db.Model):
+    """Daily per-type event counts kept after old events are pruned"""
+    __tablename__ = 'activity_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'type', name='uq_activity_rollups_day_type'),
+    )
+
+    def __repr__(self):
+        return f"<ActivityRollup {self.day} {self.type}={self.count}>"
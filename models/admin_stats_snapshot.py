@@ -0,0 +1,14 @@
+from extensions import db
+
+
+class AdminStatsSnapshot(db.Model):
+    """Admin statistics snapshot shared by every worker (see utils/admin_stats.py)"""
+    __tablename__ = 'admin_stats_snapshots'
+
+    # A single row, SNAPSHOT_ID
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # JSON counters
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<AdminStatsSnapshot {self.refreshed_at}>"
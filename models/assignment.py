@@ -12,6 +12,10 @@ class Assignment(db.Model):
     status = db.Column(db.String(20), default='pending', index=True)
     file_path = db.Column(db.String(200))  # path to uploaded assignment file
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped on every write to the assignment or what it shows (see utils/versions.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Time of the last version bump, sent as Last-Modified (see utils/conditional.py)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Assignment belongs to a class, not individual students
     class_id = db.Column(db.Integer, db.ForeignKey('classes.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -1,9 +1,13 @@
 # models/class_model.py
 from extensions import db
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 import secrets
 import string
 
+CLASS_CODE_LENGTH = 6
+CLASS_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
 class_student = db.Table(
     'class_student',
     db.Column('class_id', db.Integer, db.ForeignKey('classes.id', ondelete='CASCADE')),
@@ -19,6 +23,10 @@ class Class(db.Model):
     class_code = db.Column(db.String(6), unique=True, nullable=False, index=True)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id', ondelete='SET NULL'), index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Bumped on every write to the class or what it shows (see utils/versions.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Time of the last version bump, sent as Last-Modified (see utils/conditional.py)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     teacher = db.relationship('Teacher', backref='classes')
@@ -27,19 +35,43 @@ class Class(db.Model):
     
     @staticmethod
     def generate_class_code():
-        """Generate a unique 6-character alphanumeric class code"""
-        while True:
-            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
-            # Check if code already exists
-            existing = db.session.query(Class).filter_by(class_code=code).first()
-            if not existing:
-                return code
+        """
+        Generate a random 6-character alphanumeric class code
+
+        Uniqueness is not checked here; the unique index on class_code
+        enforces it when the class is saved (see save_with_unique_code).
+        """
+        return ''.join(secrets.choice(CLASS_CODE_ALPHABET) for _ in range(CLASS_CODE_LENGTH))
     
     def __init__(self, **kwargs):
         super(Class, self).__init__(**kwargs)
         if not self.class_code:
             self.class_code = Class.generate_class_code()
     
+    def save_with_unique_code(self, attempts=5):
+        """
+        Add and commit this class, drawing a new code if the current one is taken
+
+        With 36^6 possible codes a collision is rare, so inserting and
+        retrying on the unique constraint avoids a lookup per attempt.
+
+        Args:
+            attempts (int): Inserts to try before giving up
+
+        Raises:
+            IntegrityError: If every attempt collided, or on another constraint
+        """
+        for attempt in range(attempts):
+            db.session.add(self)
+            try:
+                db.session.commit()
+                return
+            except IntegrityError as e:
+                db.session.rollback()
+                if attempt == attempts - 1 or 'class_code' not in str(e.orig):
+                    raise
+                self.class_code = Class.generate_class_code()
+    
     def get_join_link(self, base_url=''):
         """Generate a shareable join link for this class"""
         if base_url:
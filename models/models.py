@@ -4,3 +4,8 @@ from .teacher import Teacher
 from .assignment import Assignment
 from .class_model import Class
 from .submission import Submission
+from .submission_version import SubmissionVersion
+from .activity_event import ActivityEvent, ActivityRollup
+from .rate_limit_bucket import RateLimitBucket
+from .user_session import UserSession
+from .admin_stats_snapshot import AdminStatsSnapshot
@@ -0,0 +1,14 @@
+from extensions import db
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket state shared by every worker (RATE_LIMIT_BACKEND=database)"""
+    __tablename__ = 'rate_limit_buckets'
+
+    key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    # Unix timestamp of the last refill, comparable across processes
+    updated_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RateLimitBucket {self.key} tokens={self.tokens:.2f}>"
@@ -1,3 +1,4 @@
+import os
 from extensions import db
 from datetime import datetime
 
@@ -15,13 +16,47 @@ class Submission(db.Model):
     feedback = db.Column(db.Text)  # Teacher feedback
     submitted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     graded_at = db.Column(db.DateTime)
-    
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    content_hash = db.Column(db.String(64))  # SHA-256 of the current file
+
+    __table_args__ = (
+        # One submission per student and assignment; resubmits update it
+        db.UniqueConstraint('assignment_id', 'student_id', name='uq_submissions_assignment_id_student_id'),
+        # Grade counts and averages per assignment without touching the table
+        db.Index('ix_submissions_assignment_id_grade', 'assignment_id', 'grade'),
+        # A student's submissions by assignment
+        db.Index('ix_submissions_student_id_assignment_id', 'student_id', 'assignment_id'),
+        # Newest submissions first, overall (dashboard) and per assignment;
+        # the gradebook pages by id and uses the primary key instead
+        db.Index('ix_submissions_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_submissions_assignment_id_submitted_at', 'assignment_id', 'submitted_at'),
+    )
+
     # Relationships
-    student = db.relationship('Student', backref='submissions')
+    # Deleting a student deletes their submissions through the ORM, so the
+    # versions of the classes they were in go up (utils/versions.py)
+    student = db.relationship('Student', backref=db.backref('submissions', cascade='all, delete-orphan'))
+    versions = db.relationship('SubmissionVersion', backref='submission', lazy='dynamic',
+                               cascade='all, delete-orphan', passive_deletes=True,
+                               order_by='SubmissionVersion.version')
     
     def __repr__(self):
         return f"<Submission {self.id} by Student {self.student_id} for Assignment {self.assignment_id}>"
     
+    @property
+    def file_name(self):
+        """
+        Name the current file was uploaded as
+
+        Stored files are shared by everyone who uploads the same content and
+        keep the first uploader's name, so the name comes from the version row.
+        """
+        latest = self.versions.filter_by(is_latest=True).first()
+        if latest is not None and latest.file_name:
+            return latest.file_name
+        return os.path.basename(self.file_path) if self.file_path else None
+
     def is_graded(self):
         """Check if submission has been graded"""
         return self.grade is not None
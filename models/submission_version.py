@@ -0,0 +1,30 @@
+from extensions import db
+from datetime import datetime
+
+
+class SubmissionVersion(db.Model):
+    """One accepted file of a submission; the submission row mirrors the latest one"""
+    __tablename__ = 'submission_versions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    is_latest = db.Column(db.Boolean, nullable=False, default=True, server_default='1')
+    file_path = db.Column(db.String(200))
+    # Original upload name and size; the stored file is named after its content
+    file_name = db.Column(db.String(200))
+    file_size = db.Column(db.Integer)
+    content_type = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the file
+    comments = db.Column(db.Text)
+    submitted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'version', name='uq_submission_versions_submission_id_version'),
+        # At most one latest version per submission
+        db.Index('uq_submission_versions_latest', 'submission_id', unique=True,
+                 sqlite_where=db.text('is_latest'), postgresql_where=db.text('is_latest')),
+    )
+
+    def __repr__(self):
+        return f"<SubmissionVersion {self.version} of Submission {self.submission_id}>"
@@ -0,0 +1,23 @@
+from extensions import db
+from datetime import datetime
+
+
+class UserSession(db.Model):
+    """Server-side session data; the cookie only carries the session id"""
+    __tablename__ = 'user_sessions'
+
+    # SHA-256 of the cookie value, so a leaked table cannot be replayed
+    id = db.Column(db.String(64), primary_key=True)
+    # Plain integer (no FK); sessions are revoked explicitly on user changes
+    user_id = db.Column(db.Integer, index=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Covers the active-session count and the expiry purge
+        db.Index('ix_user_sessions_expires_at_user_id', 'expires_at', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f"<UserSession user={self.user_id} expires={self.expires_at}>"
@@ -8,16 +8,31 @@ from models.teacher import Teacher
 from models.assignment import Assignment
 from models.class_model import Class
 from models.submission import Submission
-from werkzeug.security import generate_password_hash
 from datetime import datetime
 import os
 from utils.helpers import (
     validate_email, validate_password, sanitize_username, 
     get_user_display_name, format_datetime
 )
+from utils.admin_stats import get_admin_stats, refresh_admin_stats
+from utils.passwords import hash_password
+from utils.sessions import revoke_user_sessions, count_active_sessions
+from utils.admission import admission_stats
+from utils.profiling import endpoint_stats
+from utils.activity import (
+    ACTIVITY_TYPES, record_activity, activity_feed, event_to_dict
+)
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 
 admin_bp = Blueprint("admin_bp", __name__, url_prefix="/admin")
 
+# Number of users listed in the dashboard overview tables
+DASHBOARD_USER_LIMIT = 10
+
+# Events per page in the activity log
+ACTIVITY_PAGE_SIZE = 50
+
 
 def admin_required(f):
     """Decorator to ensure user is authenticated and is an admin"""
@@ -43,22 +58,22 @@ def dashboard():
         'username': admin_user.username
     }
 
-    # Calculate actual stats from database
-    total_users = User.query.count()
-    total_teachers = User.query.filter_by(role='teacher').count()
-    total_students = User.query.filter_by(role='student').count()
-    total_assignments = Assignment.query.count()
+    # Counts come from the precomputed snapshot (see utils/admin_stats.py)
+    snapshot = get_admin_stats()
 
     stats = {
-        'total_users': total_users,
-        'total_teachers': total_teachers,
-        'total_students': total_students,
-        'total_assignments': total_assignments
+        'total_users': snapshot['total_users'],
+        'total_teachers': snapshot['total_teachers'],
+        'total_students': snapshot['total_students'],
+        'total_assignments': snapshot['total_assignments']
     }
 
+    # Latest users for the overview tables; the full list lives on the roles page
+    latest_users = User.query.options(
+        selectinload(User.student_profile), selectinload(User.teacher_profile)
+    ).order_by(User.created_at.desc()).limit(DASHBOARD_USER_LIMIT).all()
+
     # Get recent users (last 5 registered)
-    recent_users_data = User.query.order_by(
-        User.created_at.desc()).limit(5).all()
     recent_users = [{
         'id': u.id,
         'username': u.username,
@@ -66,15 +81,14 @@ def dashboard():
         'role': u.role,
         'status': u.status,
         'created_at': u.created_at.strftime('%b %d, %Y') if u.created_at else 'N/A'
-    } for u in recent_users_data]
+    } for u in latest_users[:5]]
 
-    # Get recent activities (simplified - could be enhanced with activity log)
-    recent_activities = []
+    # Latest entries from the activity log
+    recent_events, _ = activity_feed(limit=5)
+    recent_activities = [event_to_dict(e) for e in recent_events]
 
-    # Get all users for management
-    all_users_data = User.query.all()
     all_users = []
-    for u in all_users_data:
+    for u in latest_users:
         display_info = get_user_display_name(u)
         all_users.append({
             'id': u.id,
@@ -87,26 +101,17 @@ def dashboard():
             'created_at': format_datetime(u.created_at)
         })
 
-    # Calculate assignment stats
-    total_assignment_count = Assignment.query.count()
-    pending_count = Assignment.query.filter_by(status='pending').count()
-    graded_count = Submission.query.filter(
-        Submission.grade.isnot(None)).count()
-
-    # Count late assignments (past due date)
-    now = datetime.utcnow()
-    late_count = Assignment.query.filter(Assignment.due_date < now).count()
-
     assignment_stats = {
-        'total': total_assignment_count,
-        'pending': pending_count,
-        'graded': graded_count,
-        'late': late_count
+        'total': snapshot['total_assignments'],
+        'pending': snapshot['pending_assignments'],
+        'graded': snapshot['graded_submissions'],
+        'late': snapshot['late_assignments']
     }
 
     system_health = {
-        'active_sessions': 0,
-        'last_backup': 'N/A'
+        'active_sessions': count_active_sessions(),
+        'last_backup': 'N/A',
+        'stats_refreshed_at': format_datetime(snapshot['refreshed_at'], '%b %d, %Y %I:%M:%S %p')
     }
 
     return render_template(
@@ -121,10 +126,21 @@ def dashboard():
     )
 
 
+@admin_bp.route("/stats/refresh", methods=['POST'])
+@admin_required
+def refresh_stats():
+    """Rebuild the dashboard statistics snapshot now"""
+    refresh_admin_stats()
+    flash('Statistics refreshed.', 'success')
+    return redirect(request.referrer or url_for('admin_bp.dashboard'))
+
+
 @admin_bp.route("/users")
 @admin_required
 def manage_users():
-    users_data = User.query.all()
+    users_data = User.query.options(
+        selectinload(User.student_profile), selectinload(User.teacher_profile)
+    ).all()
     users = []
     for u in users_data:
         display_info = get_user_display_name(u)
@@ -145,7 +161,7 @@ def manage_users():
 @admin_bp.route("/teachers")
 @admin_required
 def manage_teachers():
-    teachers_data = Teacher.query.all()
+    teachers_data = Teacher.query.options(selectinload(Teacher.user)).all()
     teachers = [{
         'id': t.id,
         'first_name': t.first_name or '',
@@ -162,7 +178,7 @@ def manage_teachers():
 @admin_bp.route("/students")
 @admin_required
 def manage_students():
-    students_data = Student.query.all()
+    students_data = Student.query.options(selectinload(Student.user)).all()
     students = []
     for s in students_data:
         # Get class name if student is enrolled in any class
@@ -190,7 +206,14 @@ def manage_students():
 @admin_bp.route("/assignments")
 @admin_required
 def manage_assignments():
-    assignments_data = Assignment.query.all()
+    assignments_data = Assignment.query.options(
+        selectinload(Assignment.teacher).selectinload(Teacher.user), selectinload(Assignment.class_obj)
+    ).all()
+    submission_counts = dict(
+        db.session.query(Submission.assignment_id, func.count(Submission.id))
+        .group_by(Submission.assignment_id)
+        .all()
+    )
     assignments = []
     for a in assignments_data:
         # Get teacher name
@@ -204,8 +227,7 @@ def manage_assignments():
             course_name = a.class_obj.name
 
         # Get submissions count
-        submissions_count = Submission.query.filter_by(
-            assignment_id=a.id).count()
+        submissions_count = submission_counts.get(a.id, 0)
 
         assignments.append({
             'id': a.id,
@@ -226,13 +248,16 @@ def manage_assignments():
 @admin_bp.route("/roles")
 @admin_required
 def manage_roles():
-    users_data = User.query.all()
+    users_data = User.query.options(
+        selectinload(User.student_profile), selectinload(User.teacher_profile)
+    ).all()
     users = []
 
-    # Calculate role counts
-    admin_count = User.query.filter_by(role='admin').count()
-    teacher_count = User.query.filter_by(role='teacher').count()
-    student_count = User.query.filter_by(role='student').count()
+    # Role counts come from the precomputed snapshot
+    snapshot = get_admin_stats()
+    admin_count = snapshot['total_admins']
+    teacher_count = snapshot['total_teachers']
+    student_count = snapshot['total_students']
 
     for u in users_data:
         display_info = get_user_display_name(u)
@@ -338,7 +363,7 @@ def add_user():
         new_user = User(
             username=username,
             email=email,
-            password=generate_password_hash(password),
+            password=hash_password(password),
             role=role
         )
 
@@ -363,6 +388,7 @@ def add_user():
                 db.session.add(teacher)
 
             db.session.commit()
+            record_activity('user_added', f'Admin added {role}: {username}')
             flash('User added successfully!', 'success')
             return redirect(url_for('admin_bp.manage_users'))
         except Exception as e:
@@ -415,7 +441,7 @@ def add_teacher():
             new_user = User(
                 username=username,
                 email=email,
-                password=generate_password_hash(password),
+                password=hash_password(password),
                 role='teacher'
             )
             db.session.add(new_user)
@@ -431,6 +457,7 @@ def add_teacher():
             )
             db.session.add(teacher)
             db.session.commit()
+            record_activity('user_added', f'Admin added teacher: {username}')
             flash('Teacher added successfully!', 'success')
             return redirect(url_for('admin_bp.manage_teachers'))
         except Exception as e:
@@ -484,7 +511,7 @@ def add_student():
             new_user = User(
                 username=username,
                 email=email,
-                password=generate_password_hash(password),
+                password=hash_password(password),
                 role='student'
             )
             db.session.add(new_user)
@@ -501,6 +528,7 @@ def add_student():
             )
             db.session.add(student)
             db.session.commit()
+            record_activity('user_added', f'Admin added student: {username}')
             flash('Student added successfully!', 'success')
             return redirect(url_for('admin_bp.manage_students'))
         except Exception as e:
@@ -527,43 +555,57 @@ def update_settings():
 @admin_bp.route("/activity-log")
 @admin_required
 def activity_log():
-    activities = []
     activity_type_filter = request.args.get('type', '')
+    if activity_type_filter not in ACTIVITY_TYPES:
+        activity_type_filter = ''
 
-    # Get recent user registrations
-    recent_users = User.query.order_by(User.created_at.desc()).limit(20).all()
-    for user in recent_users:
-        if not activity_type_filter or activity_type_filter == 'user_registered':
-            activities.append({
-                'type': 'user_registered',
-                'description': f'New {user.role} registered: {user.username}',
-                'timestamp': user.created_at if user.created_at else datetime.utcnow()
-            })
-
-    # Get recent assignments
-    recent_assignments = Assignment.query.order_by(Assignment.created_at.desc()).limit(10).all()
-    for assignment in recent_assignments:
-        if not activity_type_filter or activity_type_filter == 'assignment_created':
-            activities.append({
-                'type': 'assignment_created',
-                'description': f'Assignment "{assignment.title}" created',
-                'timestamp': assignment.created_at if assignment.created_at else datetime.utcnow()
-            })
-
-    # Get recent graded submissions
-    recent_graded = Submission.query.filter(Submission.grade.isnot(None)).order_by(Submission.graded_at.desc()).limit(10).all()
-    for submission in recent_graded:
-        if not activity_type_filter or activity_type_filter == 'assignment_graded':
-            activities.append({
-                'type': 'assignment_graded',
-                'description': f'Assignment graded for student ID {submission.student_id}',
-                'timestamp': submission.graded_at if submission.graded_at else datetime.utcnow()
-            })
-
-    # Sort by timestamp
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
-
-    return render_template("admin/activity_log.html", activities=activities)
+    events, next_cursor = activity_feed(
+        event_type=activity_type_filter or None,
+        before=request.args.get('before'),
+        limit=ACTIVITY_PAGE_SIZE
+    )
+    activities = [event_to_dict(e) for e in events]
+
+    return render_template("admin/activity_log.html", activities=activities,
+                           activity_types=ACTIVITY_TYPES,
+                           current_type=activity_type_filter,
+                           next_cursor=next_cursor)
+
+
+@admin_bp.route("/api/activity")
+@admin_required
+def activity_feed_api():
+    """Keyset-paginated activity feed as JSON"""
+    event_type = request.args.get('type') or None
+    limit = min(request.args.get('limit', ACTIVITY_PAGE_SIZE, type=int) or ACTIVITY_PAGE_SIZE, 200)
+    events, next_cursor = activity_feed(
+        event_type=event_type, before=request.args.get('before'), limit=limit
+    )
+
+    return jsonify({
+        'events': [dict(event_to_dict(e), timestamp=e.created_at.isoformat()) for e in events],
+        'next_cursor': next_cursor
+    })
+
+
+@admin_bp.route("/api/admission")
+@admin_required
+def admission_stats_api():
+    """In-flight requests, queue depth and shed counts of this worker"""
+    stats = admission_stats()
+    if stats is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(stats, enabled=True))
+
+
+@admin_bp.route("/api/profiling")
+@admin_required
+def profiling_stats_api():
+    """Per-endpoint query count, DB time and total time histograms of this worker"""
+    stats = endpoint_stats()
+    if stats is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'endpoints': stats})
 
 
 @admin_bp.route("/users/<int:user_id>")
@@ -647,6 +689,10 @@ def change_role(user_id):
                     db.session.add(teacher)
 
             db.session.commit()
+            # Force a fresh login so the new role takes effect everywhere
+            if old_role != new_role:
+                revoke_user_sessions(user.id)
+            record_activity('role_changed', f'{user.username} changed from {old_role} to {new_role}')
             flash('Role changed successfully!', 'success')
             return redirect(url_for('admin_bp.manage_users'))
         except Exception as e:
@@ -671,8 +717,11 @@ def delete_user(user_id):
 
     try:
         user = User.query.get_or_404(user_id)
+        username, role = user.username, user.role
         db.session.delete(user)
         db.session.commit()
+        revoke_user_sessions(user_id)
+        record_activity('user_deleted', f'Deleted {role}: {username}')
         return jsonify({'success': True, 'message': 'User deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -740,12 +789,11 @@ def delete_assignment(assignment_id):
         assignment = Assignment.query.get_or_404(assignment_id)
         assignment_title = assignment.title
 
-        # Delete all submissions associated with this assignment
-        Submission.query.filter_by(assignment_id=assignment_id).delete()
-
-        # Delete the assignment
+        # Deleting the assignment deletes its submissions through the ORM
+        # cascade, so the class version goes up for cached analytics
         db.session.delete(assignment)
         db.session.commit()
+        record_activity('assignment_deleted', f'Assignment "{assignment_title}" deleted')
 
         return jsonify({'success': True, 'message': f'Assignment "{assignment_title}" deleted successfully'})
     except Exception as e:
@@ -1,12 +1,15 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required
+from flask_login import login_user, logout_user, login_required, current_user
 from extensions import db
 from models.user import User
 from models.student import Student
 from models.teacher import Teacher
 from utils.helpers import validate_email, validate_password, sanitize_username
-from datetime import datetime
+from utils.activity import record_activity
+from utils.passwords import hash_password, verify_password, needs_rehash
+from utils.rate_limit import rate_limit
+from utils.touch import touch
+from utils.metrics import inc_counter
 
 auth_bp = Blueprint("auth_bp", __name__)
 
@@ -16,6 +19,7 @@ auth_bp = Blueprint("auth_bp", __name__)
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
+@rate_limit("register")
 def register():
     if request.method == "POST":
         username = request.form.get("username")
@@ -72,7 +76,7 @@ def register():
                 return redirect(url_for("auth_bp.register"))
 
         # 🧂 Hash password
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = hash_password(password)
 
         # 💾 Create new user
         new_user = User(username=username, email=email,
@@ -89,6 +93,7 @@ def register():
             db.session.add(teacher_profile)
 
         db.session.commit()
+        record_activity("user_registered", f"New {role} registered: {username}", user_id=new_user.id)
 
         flash("✅ Account created successfully! Please log in.", "success")
         return redirect(url_for("auth_bp.login"))
@@ -100,6 +105,7 @@ def register():
 # LOGIN
 # -------------------------
 @auth_bp.route("/login", methods=["GET", "POST"])
+@rate_limit("login", ip_failures_only=True)
 def login():
     if request.method == "POST":
         email = request.form.get("email")
@@ -107,12 +113,18 @@ def login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.password, password):
-            # Update last login
-            user.last_login = datetime.utcnow()
-            db.session.commit()
-            
+        if user and verify_password(user.password, password):
+            # Upgrade hashes made under an older hashing policy
+            if needs_rehash(user.password):
+                user.password = hash_password(password)
+                db.session.commit()
+
+            # Update last login (written in the next batch, not in this request)
+            touch(User, "last_login", user.id)
+
             login_user(user)
+            inc_counter("auth_logins_total", result="success")
+            record_activity("user_login", f"{user.username} logged in", user_id=user.id)
             flash("Login successful!", "success")
 
             # Redirect based on role
@@ -123,6 +135,9 @@ def login():
             else:
                 return redirect(url_for("student_bp.dashboard"))
 
+        inc_counter("auth_logins_total", result="failure")
+        record_activity("login_failed", f"Failed login attempt for {email}",
+                        user_id=user.id if user else None)
         flash("Invalid email or password.", "danger")
 
     return render_template("login.html")
@@ -134,6 +149,7 @@ def login():
 @auth_bp.route("/logout")
 @login_required
 def logout():
+    record_activity("user_logout", f"{current_user.username} logged out")
     logout_user()
     flash("Logged out successfully.", "info")
     return redirect(url_for("auth_bp.login"))
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, send_file
+from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, send_file, current_app
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from models.student import Student
@@ -9,14 +9,21 @@ from models.user import User
 from models.teacher import Teacher
 from extensions import db
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.utils import secure_filename
 import os
-from utils.helpers import generate_secure_filename, validate_file_extension, validate_file_mime_type
+from utils.helpers import validate_file_extension, validate_file_mime_type
+from utils.analytics import letter_distribution
+from utils.activity import record_activity
+from utils.class_codes import normalize_code, get_class_by_code
+from utils.catalog import class_catalog, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.submissions import save_submission, store_file, SubmissionRejected
+from utils.conditional import version_etag, not_modified, with_validators, latest
 
 student_bp = Blueprint("student_bp", __name__, url_prefix="/student")
 
-# Configuration for file uploads
-UPLOAD_FOLDER = 'uploads/submissions'
+# Configuration for file uploads (the folder is SUBMISSION_UPLOAD_FOLDER)
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'zip'}
 
 
@@ -67,6 +74,44 @@ def is_student_enrolled(student, class_obj):
         return result is not None
 
 
+def get_student_coursework(student):
+    """
+    Every assignment of a student's classes, with the student's submission
+
+    Classes, their teachers, assignments and submissions take one query
+    each, so the pages built from this do not query per class or per
+    assignment. Classes and submissions come from the student's
+    relationships, which later uses in the same request reuse.
+
+    Args:
+        student (Student): The student
+
+    Returns:
+        list: (class, assignment, submission or None) tuples, assignments
+            grouped by class
+    """
+    classes = get_student_classes(student)
+    if not classes:
+        return []
+
+    # Attach the teachers, so cls.teacher does not load them one at a time
+    teacher_ids = {cls.teacher_id for cls in classes if cls.teacher_id is not None}
+    teachers = {
+        teacher.id: teacher
+        for teacher in Teacher.query.options(joinedload(Teacher.user)).filter(Teacher.id.in_(teacher_ids))
+    } if teacher_ids else {}
+    for cls in classes:
+        set_committed_value(cls, 'teacher', teachers.get(cls.teacher_id))
+
+    by_class = {}
+    for assignment in Assignment.query.filter(
+            Assignment.class_id.in_([cls.id for cls in classes])).order_by(Assignment.id):
+        by_class.setdefault(assignment.class_id, []).append(assignment)
+    submissions = {submission.assignment_id: submission for submission in student.submissions}
+    return [(cls, assignment, submissions.get(assignment.id))
+            for cls in classes for assignment in by_class.get(cls.id, [])]
+
+
 def calculate_letter_grade(percentage):
     """Convert percentage to letter grade"""
     if percentage >= 97:
@@ -107,6 +152,8 @@ def dashboard():
     if not student:
         return redirect(url_for('auth_bp.login'))
 
+    coursework = get_student_coursework(student)
+
     # Calculate actual stats
     enrolled_classes = len(get_student_classes(student))
 
@@ -115,16 +162,13 @@ def dashboard():
     submitted_assignments = 0
     total_grades = []
 
-    for cls in get_student_classes(student):
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission:
-                submitted_assignments += 1
-                if submission.grade is not None:
-                    total_grades.append(submission.grade)
-            else:
-                pending_assignments += 1
+    for cls, assignment, submission in coursework:
+        if submission:
+            submitted_assignments += 1
+            if submission.grade is not None:
+                total_grades.append(submission.grade)
+        else:
+            pending_assignments += 1
 
     average_grade = sum(total_grades) / \
         len(total_grades) if total_grades else 0
@@ -139,16 +183,13 @@ def dashboard():
     # Get recent assignments
     recent_assignments = []
     all_cls_assignments = []
-    for cls in get_student_classes(student):
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            all_cls_assignments.append({
-                'assignment': assignment,
-                'submission': submission,
-                'class_name': cls.name,
-                'due_date': assignment.due_date or datetime.utcnow()
-            })
+    for cls, assignment, submission in coursework:
+        all_cls_assignments.append({
+            'assignment': assignment,
+            'submission': submission,
+            'class_name': cls.name,
+            'due_date': assignment.due_date or datetime.utcnow()
+        })
     # Sort by due_date descending and take top 5
     recent_assignments = sorted(
         all_cls_assignments, key=lambda x: x['due_date'], reverse=True)[:5]
@@ -195,52 +236,50 @@ def assignments():
 
     for cls in get_student_classes(student):
         subjects.add(cls.name)
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-
-            # Determine status
-            if submission:
-                if submission.grade is not None:
-                    status = 'graded'
-                else:
-                    status = 'submitted'
+
+    for cls, assignment, submission in get_student_coursework(student):
+        # Determine status
+        if submission:
+            if submission.grade is not None:
+                status = 'graded'
             else:
-                if assignment.due_date and assignment.due_date < datetime.utcnow():
-                    status = 'overdue'
-                else:
-                    status = 'pending'
-
-            # Calculate days left
-            days_left = None
-            if assignment.due_date and status == 'pending':
-                delta = assignment.due_date - datetime.utcnow()
-                if delta.days >= 0:
-                    days_left = f"{delta.days} days left" if delta.days > 0 else "Due today"
-
-            all_assignments.append({
-                'id': assignment.id,
-                'title': assignment.title,
-                'description': assignment.description,
-                'subject': cls.name,
-                'professor': cls.teacher.full_name if cls.teacher else 'No Teacher',
-                'due_date': assignment.due_date,
-                'due_date_formatted': assignment.due_date.strftime('%b %d, %Y') if assignment.due_date else 'N/A',
-                'status': status,
-                'status_label': status.upper(),
-                'days_left': days_left,
-                'submission': submission,
-                'grade': submission.grade if submission else None,
-                'letter_grade': calculate_letter_grade(submission.grade) if submission and submission.grade else None,
-                'submitted_date': submission.submitted_at.strftime('%b %d, %Y') if submission and submission.submitted_at else None,
-                'graded_date': submission.graded_at.strftime('%b %d, %Y') if submission and submission.graded_at else None,
-                'card_class': 'urgent' if status == 'overdue' else status,
-                'icon': 'fas fa-book',
-                'icon_bg': 'rgba(59, 130, 246, 0.1)',
-                'icon_color': '#3b82f6',
-                'grade_class': 'excellent' if submission and submission.grade and submission.grade >= 90 else 'good' if submission and submission.grade and submission.grade >= 80 else 'average',
-                'file_path': assignment.file_path
-            })
+                status = 'submitted'
+        else:
+            if assignment.due_date and assignment.due_date < datetime.utcnow():
+                status = 'overdue'
+            else:
+                status = 'pending'
+
+        # Calculate days left
+        days_left = None
+        if assignment.due_date and status == 'pending':
+            delta = assignment.due_date - datetime.utcnow()
+            if delta.days >= 0:
+                days_left = f"{delta.days} days left" if delta.days > 0 else "Due today"
+
+        all_assignments.append({
+            'id': assignment.id,
+            'title': assignment.title,
+            'description': assignment.description,
+            'subject': cls.name,
+            'professor': cls.teacher.full_name if cls.teacher else 'No Teacher',
+            'due_date': assignment.due_date,
+            'due_date_formatted': assignment.due_date.strftime('%b %d, %Y') if assignment.due_date else 'N/A',
+            'status': status,
+            'status_label': status.upper(),
+            'days_left': days_left,
+            'submission': submission,
+            'grade': submission.grade if submission else None,
+            'letter_grade': calculate_letter_grade(submission.grade) if submission and submission.grade else None,
+            'submitted_date': submission.submitted_at.strftime('%b %d, %Y') if submission and submission.submitted_at else None,
+            'graded_date': submission.graded_at.strftime('%b %d, %Y') if submission and submission.graded_at else None,
+            'card_class': 'urgent' if status == 'overdue' else status,
+            'icon': 'fas fa-book',
+            'icon_bg': 'rgba(59, 130, 246, 0.1)',
+            'icon_color': '#3b82f6',
+            'grade_class': 'excellent' if submission and submission.grade and submission.grade >= 90 else 'good' if submission and submission.grade and submission.grade >= 80 else 'average',
+            'file_path': assignment.file_path
+        })
 
     # Calculate stats
     today = datetime.utcnow()
@@ -350,9 +389,17 @@ def assignment_details(assignment_id):
     if assignment.class_obj not in enrolled_classes:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    # Attachments are files, not rows; their directory's mtime versions them
+    assignment_files_dir = os.path.join('static', 'uploads', 'assignments', str(assignment.id))
+    files_stamp = os.stat(assignment_files_dir).st_mtime_ns if os.path.isdir(assignment_files_dir) else 0
+    etag = version_etag(assignment, assignment.class_obj, files_stamp)
+    last_modified = latest(assignment.updated_at, assignment.class_obj.updated_at)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     # Get assignment files from the upload directory
     attachments = []
-    assignment_files_dir = os.path.join('static', 'uploads', 'assignments', str(assignment.id))
     
     if os.path.exists(assignment_files_dir):
         for filename in os.listdir(assignment_files_dir):
@@ -380,7 +427,7 @@ def assignment_details(assignment_id):
                     'url': f'/student/assignments/{assignment_id}/download/{filename}'
                 })
 
-    return jsonify({
+    return with_validators(jsonify({
         'id': assignment.id,
         'title': assignment.title,
         'description': assignment.description or 'No description provided',
@@ -389,7 +436,7 @@ def assignment_details(assignment_id):
         'due_date_formatted': assignment.due_date.strftime('%b %d, %Y at %I:%M %p') if assignment.due_date else 'N/A',
         'weight': 100,
         'attachments': attachments
-    })
+    }), etag, last_modified)
 
 
 @student_bp.route("/assignments/<int:assignment_id>/download/<filename>")
@@ -442,13 +489,20 @@ def assignment_feedback(assignment_id):
         return jsonify({'error': 'Student not found'}), 404
 
     assignment = Assignment.query.get_or_404(assignment_id)
+
+    # The assignment's version goes up with every change to its submissions
+    etag = version_etag(assignment, student.id)
+    cached = not_modified(etag, assignment.updated_at)
+    if cached is not None:
+        return cached
+
     submission = assignment.submissions.filter_by(
         student_id=student.id).first()
 
     if not submission or submission.grade is None:
         return jsonify({'error': 'No feedback available'}), 404
 
-    return jsonify({
+    return with_validators(jsonify({
         'title': assignment.title,
         'grade': submission.grade,
         'letter_grade': calculate_letter_grade(submission.grade),
@@ -456,7 +510,7 @@ def assignment_feedback(assignment_id):
         'graded_by': assignment.class_obj.teacher.full_name if assignment.class_obj.teacher else 'Unknown',
         'graded_date': submission.graded_at.strftime('%b %d, %Y at %I:%M %p') if submission.graded_at else 'N/A',
         'feedback': submission.feedback or 'No feedback provided'
-    })
+    }), etag, assignment.updated_at)
 
 
 @student_bp.route("/assignments/<int:assignment_id>/submission")
@@ -468,20 +522,28 @@ def assignment_submission(assignment_id):
         return jsonify({'error': 'Student not found'}), 404
 
     assignment = Assignment.query.get_or_404(assignment_id)
+
+    # The assignment's version goes up with every change to its submissions
+    etag = version_etag(assignment, student.id)
+    cached = not_modified(etag, assignment.updated_at)
+    if cached is not None:
+        return cached
+
     submission = assignment.submissions.filter_by(
         student_id=student.id).first()
 
     if not submission:
         return jsonify({'error': 'No submission found'}), 404
 
-    return jsonify({
+    return with_validators(jsonify({
         'title': assignment.title,
         'submitted_date': submission.submitted_at.strftime('%b %d, %Y at %I:%M %p') if submission.submitted_at else 'N/A',
-        'submission_file': os.path.basename(submission.file_path) if submission.file_path else 'No file',
+        'submission_file': submission.file_name or 'No file',
         'file_icon': 'pdf',
         'comments': submission.comments or 'No comments provided',
+        'version': submission.version,
         'grading_status': 'Graded' if submission.grade is not None else 'Pending grading'
-    })
+    }), etag, assignment.updated_at)
 
 
 @student_bp.route("/assignments/submit", methods=['POST'])
@@ -507,14 +569,7 @@ def submit_assignment():
         if assignment.class_obj not in enrolled_classes:
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
 
-        # Check if already submitted
-        existing_submission = assignment.submissions.filter_by(
-            student_id=student.id).first()
-        if existing_submission:
-            return jsonify({'success': False, 'message': 'Assignment already submitted'}), 400
-
         # Handle file upload
-        file_path = None
         if file and file.filename:
             # Validate file extension
             if not validate_file_extension(file.filename, ALLOWED_EXTENSIONS):
@@ -531,31 +586,27 @@ def submit_assignment():
             if not validate_file_mime_type(file, allowed_mime_types):
                 return jsonify({'success': False, 'message': 'Invalid file type. Allowed: PDF, DOC, DOCX, TXT, ZIP'}), 400
             
-            # Generate secure filename
-            filename = generate_secure_filename(file.filename)
-            if filename:
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(file_path)
-            else:
+            # The content hash keeps stored files apart, so the name needs no random prefix
+            filename = secure_filename(file.filename)
+            if not filename:
                 return jsonify({'success': False, 'message': 'Invalid filename'}), 400
+            # Stored under its content hash; an unchanged file is not written twice
+            stored = store_file(file.stream, current_app.config['SUBMISSION_UPLOAD_FOLDER'],
+                                filename, file.mimetype)
         else:
             return jsonify({'success': False, 'message': 'No file provided'}), 400
 
-        # Create submission
-        submission = Submission(
-            assignment_id=assignment_id,
-            student_id=student.id,
-            file_path=file_path,
-            comments=comments,
-            submitted_at=datetime.utcnow()
-        )
+        # One upsert; the unique (assignment, student) constraint settles double submits
+        try:
+            _, version = save_submission(assignment.id, student.id, stored, comments)
+        except SubmissionRejected as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
 
-        db.session.add(submission)
-        db.session.commit()
+        action = 'resubmitted' if version > 1 else 'submitted'
+        record_activity('assignment_submitted', f'{student.full_name} {action} "{assignment.title}"')
 
-        flash('Assignment submitted successfully!', 'success')
-        return jsonify({'success': True, 'message': 'Assignment submitted successfully'})
+        flash(f'Assignment {action} successfully!', 'success')
+        return jsonify({'success': True, 'message': f'Assignment {action} successfully', 'version': version})
 
     except Exception as e:
         db.session.rollback()
@@ -572,22 +623,21 @@ def grades():
     if not student:
         return redirect(url_for('auth_bp.login'))
 
+    coursework = get_student_coursework(student)
+
     # Get all graded submissions
     all_submissions = []
     total_grades = []
 
-    for cls in get_student_classes(student):
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission and submission.grade is not None:
-                all_submissions.append({
-                    'assignment': assignment,
-                    'submission': submission,
-                    'class': cls,
-                    'teacher': cls.teacher
-                })
-                total_grades.append(submission.grade)
+    for cls, assignment, submission in coursework:
+        if submission and submission.grade is not None:
+            all_submissions.append({
+                'assignment': assignment,
+                'submission': submission,
+                'class': cls,
+                'teacher': cls.teacher
+            })
+            total_grades.append(submission.grade)
 
     # Calculate overall stats
     overall_average = sum(total_grades) / \
@@ -597,13 +647,8 @@ def grades():
     graded_count = len(all_submissions)
 
     # Count pending grades
-    pending_grades = 0
-    for cls in get_student_classes(student):
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission and submission.grade is None:
-                pending_grades += 1
+    pending_grades = sum(1 for _, _, submission in coursework
+                         if submission and submission.grade is None)
 
     overall_stats = {
         'average': round(overall_average, 1),
@@ -614,53 +659,29 @@ def grades():
 
     # Calculate performance by subject
     subjects_performance = []
-    for cls in get_student_classes(student):
-        class_grades = []
-        class_submissions = []
-
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission and submission.grade is not None:
-                class_grades.append(submission.grade)
-                class_submissions.append(submission)
-
-        if class_grades:
-            avg = sum(class_grades) / len(class_grades)
-            subjects_performance.append({
-                'class': cls,
-                'teacher': cls.teacher,
-                'average': round(avg, 1),
-                'letter_grade': calculate_letter_grade(avg),
-                'assignments_count': len(class_submissions),
-                'highest': max(class_grades),
-                'lowest': min(class_grades)
-            })
+    class_grades = {}
+    for cls, assignment, submission in coursework:
+        if submission and submission.grade is not None:
+            class_grades.setdefault(cls, []).append(submission.grade)
+
+    for cls, grades_in_class in class_grades.items():
+        avg = sum(grades_in_class) / len(grades_in_class)
+        subjects_performance.append({
+            'class': cls,
+            'teacher': cls.teacher,
+            'average': round(avg, 1),
+            'letter_grade': calculate_letter_grade(avg),
+            'assignments_count': len(grades_in_class),
+            'highest': max(grades_in_class),
+            'lowest': min(grades_in_class)
+        })
 
     # Sort submissions by date
     all_submissions.sort(
         key=lambda x: x['submission'].graded_at or x['submission'].submitted_at, reverse=True)
 
-    # Calculate grade distribution
-    grade_distribution = {
-        'A': sum(1 for g in total_grades if g >= 90),
-        'B': sum(1 for g in total_grades if 80 <= g < 90),
-        'C': sum(1 for g in total_grades if 70 <= g < 80),
-        'D': sum(1 for g in total_grades if 60 <= g < 70),
-        'F': sum(1 for g in total_grades if g < 60)
-    }
-
-    total = sum(grade_distribution.values())
-    if total > 0:
-        grade_distribution_percent = {
-            'A': round((grade_distribution['A'] / total) * 100),
-            'B': round((grade_distribution['B'] / total) * 100),
-            'C': round((grade_distribution['C'] / total) * 100),
-            'D': round((grade_distribution['D'] / total) * 100),
-            'F': round((grade_distribution['F'] / total) * 100)
-        }
-    else:
-        grade_distribution_percent = {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0}
+    # Calculate grade distribution (single vectorized histogram pass)
+    _, grade_distribution_percent = letter_distribution(total_grades)
 
     return render_template(
         "student/grades.html",
@@ -713,23 +734,18 @@ def profile():
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating profile: {str(e)}', 'danger')
-            print(f"Profile update error: {str(e)}")
+            current_app.logger.exception('Profile update failed')
 
         return redirect(url_for('student_bp.profile'))
 
     # GET request - calculate stats
-    enrolled_classes = len(get_student_classes(student))
+    classes = get_student_classes(student)
+    coursework = get_student_coursework(student)
+    enrolled_classes = len(classes)
 
-    total_grades = []
-    total_assignments = 0
-
-    for cls in get_student_classes(student):
-        for assignment in cls.assignments.all():
-            total_assignments += 1
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission and submission.grade is not None:
-                total_grades.append(submission.grade)
+    total_grades = [submission.grade for _, _, submission in coursework
+                    if submission and submission.grade is not None]
+    total_assignments = len(coursework)
 
     average_grade = round(sum(total_grades) /
                           len(total_grades), 1) if total_grades else 0
@@ -741,24 +757,32 @@ def profile():
     }
 
     # Get current courses with grades
-    current_courses = []
-    for cls in get_student_classes(student):
-        class_grades = []
+    class_grades = {}
+    assignment_counts = {}
+    for cls, assignment, submission in coursework:
+        assignment_counts[cls.id] = assignment_counts.get(cls.id, 0) + 1
+        if submission and submission.grade is not None:
+            class_grades.setdefault(cls.id, []).append(submission.grade)
+    student_counts = dict(
+        db.session.query(class_student.c.class_id, func.count())
+        .filter(class_student.c.class_id.in_([cls.id for cls in classes]))
+        .group_by(class_student.c.class_id)
+        .all()
+    ) if classes else {}
 
-        for assignment in cls.assignments.all():
-            submission = assignment.submissions.filter_by(
-                student_id=student.id).first()
-            if submission and submission.grade is not None:
-                class_grades.append(submission.grade)
-
-        course_average = round(sum(class_grades) /
-                               len(class_grades), 1) if class_grades else None
+    current_courses = []
+    for cls in classes:
+        grades_in_class = class_grades.get(cls.id)
+        course_average = round(sum(grades_in_class) /
+                               len(grades_in_class), 1) if grades_in_class else None
 
         current_courses.append({
             'class': cls,
             'teacher': cls.teacher,
             'average': course_average,
-            'letter_grade': calculate_letter_grade(course_average) if course_average else 'N/A'
+            'letter_grade': calculate_letter_grade(course_average) if course_average else 'N/A',
+            'student_count': student_counts.get(cls.id, 0),
+            'assignment_count': assignment_counts.get(cls.id, 0)
         })
 
     return render_template(
@@ -775,45 +799,48 @@ def profile():
 @student_bp.route("/classes")
 @login_required
 def classes():
-    """View available classes and enrolled classes"""
+    """View enrolled classes and browse the rest of the catalog"""
     student = get_student_or_redirect()
     if not student:
         return redirect(url_for('auth_bp.login'))
 
-    # Get all available classes
-    all_classes = Class.query.all()
-    
-    # Get enrolled class IDs
-    student_classes = get_student_classes(student)
-    enrolled_class_ids = [cls.id for cls in student_classes]
-    
-    # Separate into enrolled and available
-    enrolled_classes = []
-    available_classes = []
-    
-    for cls in all_classes:
-        class_info = {
-            'id': cls.id,
-            'name': cls.name,
-            'description': cls.description or 'No description',
-            'teacher': cls.teacher.full_name if cls.teacher else 'No Teacher',
-            'teacher_id': cls.teacher_id,
-            'created_at': cls.created_at.strftime('%b %d, %Y') if cls.created_at else 'N/A',
-            'student_count': cls.students.count() if cls.students else 0,
-            'assignment_count': cls.assignments.count() if cls.assignments else 0
-        }
-        
-        if cls.id in enrolled_class_ids:
-            enrolled_classes.append(class_info)
-        else:
-            available_classes.append(class_info)
-    
+    search = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    enrolled_page = request.args.get('enrolled_page', 1, type=int)
+
+    # A student's own classes are usually few, so they come in large pages;
+    # the rest of the catalog is paged normally
+    enrolled = class_catalog(student.id, enrolled=True, page=enrolled_page, per_page=MAX_PAGE_SIZE)
+    available = class_catalog(student.id, search=search, enrolled=False, page=page)
+
     return render_template(
         "student/classes.html",
         student=student,
-        enrolled_classes=enrolled_classes,
-        available_classes=available_classes
+        enrolled_classes=enrolled['items'],
+        enrolled_page=enrolled,
+        available_classes=available['items'],
+        available_page=available,
+        search=search
+    )
+
+
+@student_bp.route("/api/classes")
+@login_required
+def classes_api():
+    """Paginated, searchable class catalog with enrollment flags"""
+    student = get_student_or_redirect()
+    if not student:
+        return jsonify({'success': False, 'message': 'Student not found'}), 404
+
+    enrolled = request.args.get('enrolled')
+    catalog = class_catalog(
+        student.id,
+        search=request.args.get('q', ''),
+        enrolled={'true': True, 'false': False}.get((enrolled or '').lower()),
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
     )
+    return jsonify({'success': True, **catalog})
 
 
 @student_bp.route("/join", methods=['GET', 'POST'])
@@ -825,14 +852,14 @@ def join_class_page():
         return redirect(url_for('auth_bp.login'))
     
     if request.method == 'POST':
-        class_code = request.form.get('class_code', '').strip().upper()
+        class_code = normalize_code(request.form.get('class_code'))
         
         if not class_code:
             flash('Please enter a class code', 'error')
             return render_template("student/join_class.html", student=student)
         
         try:
-            cls = Class.query.filter_by(class_code=class_code).first()
+            cls = get_class_by_code(class_code)
             
             if not cls:
                 flash('Invalid class code. Please check and try again.', 'error')
@@ -846,6 +873,7 @@ def join_class_page():
             # Enroll student in class
             student.classes.append(cls)
             db.session.commit()
+            record_activity('class_joined', f'{student.full_name} joined {cls.name}')
             
             flash(f'Successfully joined {cls.name}!', 'success')
             return redirect(url_for('student_bp.classes'))
@@ -865,10 +893,10 @@ def join_class_by_code(class_code):
     if not student:
         return redirect(url_for('auth_bp.login'))
     
-    class_code = class_code.strip().upper()
+    class_code = normalize_code(class_code)
     
     try:
-        cls = Class.query.filter_by(class_code=class_code).first()
+        cls = get_class_by_code(class_code)
         
         if not cls:
             flash('Invalid class code. Please check and try again.', 'error')
@@ -891,6 +919,7 @@ def join_class_by_code(class_code):
         # If POST request, enroll the student
         student.classes.append(cls)
         db.session.commit()
+        record_activity('class_joined', f'{student.full_name} joined {cls.name}')
         
         flash(f'Successfully joined {cls.name}!', 'success')
         return redirect(url_for('student_bp.classes'))
@@ -918,6 +947,7 @@ def join_class(class_id):
         # Enroll student in class
         student.classes.append(cls)
         db.session.commit()
+        record_activity('class_joined', f'{student.full_name} joined {cls.name}')
         
         return jsonify({
             'success': True, 
@@ -946,6 +976,7 @@ def leave_class(class_id):
         # Remove student from class
         student.classes.remove(cls)
         db.session.commit()
+        record_activity('class_left', f'{student.full_name} left {cls.name}')
         
         return jsonify({
             'success': True, 
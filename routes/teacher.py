@@ -1,17 +1,27 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file, abort, current_app
 from flask_login import login_required, current_user
 from extensions import db
 from models.teacher import Teacher
 from models.student import Student
-from models.class_model import Class
+from models.class_model import Class, class_student
 from models.assignment import Assignment
 from models.submission import Submission
-from datetime import datetime
-from werkzeug.security import check_password_hash, generate_password_hash
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, joinedload
 from werkzeug.utils import secure_filename
 import os
 from pathlib import Path
 from utils.helpers import generate_secure_filename, validate_file_extension, validate_file_mime_type
+from utils.analytics import class_analytics, assignment_analytics
+from utils.activity import record_activity
+from utils.teacher_dashboard import dashboard_summary, dashboard_widgets
+from utils.roster import teacher_roster, DEFAULT_PAGE_SIZE as ROSTER_PAGE_SIZE
+from utils.gradebook import (grade_page, grade_summary, grade_filter_options,
+                             DEFAULT_PAGE_SIZE as GRADES_PAGE_SIZE, STATUSES as GRADE_STATUSES)
+from utils.passwords import hash_password, verify_password
+from utils.submissions import version_history, diff_versions
+from utils.conditional import version_etag, not_modified, with_validators, latest
 
 teacher_bp = Blueprint("teacher_bp", __name__, url_prefix="/teacher")
 
@@ -39,78 +49,14 @@ def teacher_required(f):
 @login_required
 @teacher_required
 def dashboard():
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
+    teacher = Teacher.query.options(joinedload(Teacher.user)).filter_by(user_id=current_user.id).first()
 
-    # Calculate stats
-    classes_taught = Class.query.filter_by(teacher_id=teacher.id).all()
-    total_students = 0
-    for cls in classes_taught:
-        total_students += cls.students.count()
-    total_classes = len(classes_taught)
-
-    # Pending grading: submissions without a grade
-    pending_assignments = Submission.query.join(Assignment, Submission.assignment_id == Assignment.id).join(
-        Class, Assignment.class_id == Class.id).filter(Class.teacher_id == teacher.id, Submission.grade == None).count()
-
-    # Upcoming deadlines: assignments with due dates in the future
-    from datetime import datetime, timedelta
-    upcoming = Assignment.query.join(Class, Assignment.class_id == Class.id).filter(
-        Class.teacher_id == teacher.id, Assignment.due_date > datetime.utcnow()).count()
-
-    stats = {
-        "total_students": total_students,
-        "total_classes": total_classes,
-        "pending_assignments": pending_assignments,
-        "upcoming_deadlines": upcoming,
-    }
+    # Counters in one query; the recent-activity widgets are cached
+    # (see utils/teacher_dashboard.py)
+    stats = dashboard_summary(teacher.id)
+    widgets = dashboard_widgets(teacher.id)
 
-    # Recent classes (limit 5)
-    recent_classes = Class.query.filter_by(
-        teacher_id=teacher.id).limit(5).all()
-    classes_formatted = []
-    for cls in recent_classes:
-        student_count = cls.students.count()
-        classes_formatted.append({
-            "id": cls.id,
-            "name": cls.name,
-            "student_count": student_count,
-        })
-
-    # Recent assignments (limit 5)
-    recent_assignments = Assignment.query.join(Class, Assignment.class_id == Class.id).filter(
-        Class.teacher_id == teacher.id).order_by(Assignment.created_at.desc()).limit(5).all()
-    assignments_formatted = []
-    for assignment in recent_assignments:
-        assignments_formatted.append({
-            "id": assignment.id,
-            "title": assignment.title,
-            "due_date": assignment.due_date.strftime("%b %d, %Y") if assignment.due_date else "No date",
-            "status": "pending",  # or compute based on submission grades
-        })
-
-    # Recent students (limit 5) - those with recent submissions
-    recent_students = (
-        db.session.query(Student, Assignment, Submission)
-        .join(Class, Student.classes)
-        .join(Assignment, Assignment.class_id == Class.id)
-        .join(Submission, Submission.student_id == Student.id)
-        .filter(Class.teacher_id == teacher.id)
-        .order_by(Submission.submitted_at.desc())
-        .limit(5)
-        .all()
-    )
-    students_formatted = []
-    for student, assignment, submission in recent_students:
-        students_formatted.append({
-            "id": student.id,
-            "first_name": student.first_name or "",
-            "last_name": student.last_name or "",
-            "class_name": assignment.class_obj.name if assignment.class_obj else "",
-            "last_assignment": assignment.title,
-            "grade": submission.grade if submission.grade else None,
-        })
-
-    return render_template("teacher/dashboard.html", teacher=teacher, stats=stats, recent_classes=classes_formatted, recent_assignments=assignments_formatted, recent_students=students_formatted)
+    return render_template("teacher/dashboard.html", teacher=teacher, stats=stats, recent_classes=widgets["recent_classes"], recent_assignments=widgets["recent_assignments"], recent_students=widgets["recent_students"])
 
 
 # ---------------------------------------------------------
@@ -122,28 +68,16 @@ def dashboard():
 def students():
     teacher = Teacher.query.filter_by(user_id=current_user.id).first()
 
-    # Get all classes taught by this teacher
-    classes_taught = Class.query.filter_by(teacher_id=teacher.id).all()
-
-    # Get all students in those classes (remove duplicates)
-    all_students = []
-    student_ids = set()
-    for cls in classes_taught:
-        for student in cls.students:
-            if student.id not in student_ids:
-                all_students.append((student, cls))
-                student_ids.add(student.id)
-
-    formatted = []
-    for student, cls in all_students:
-        formatted.append({
-            "id": student.id,
-            "full_name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
-            "email": student.user.email if student.user else "",
-            "class_name": cls.name,
-        })
+    roster = teacher_roster(
+        teacher.id,
+        search=request.args.get("q", ""),
+        sort=request.args.get("sort", "name"),
+        direction=request.args.get("direction", "asc"),
+        page=request.args.get("page", 1, type=int),
+        per_page=request.args.get("per_page", ROSTER_PAGE_SIZE, type=int)
+    )
 
-    return render_template("teacher/students.html", teacher=teacher, students=formatted)
+    return render_template("teacher/students.html", teacher=teacher, students=roster["items"], roster=roster, search=request.args.get("q", ""))
 
 
 # ---------------------------------------------------------
@@ -157,10 +91,25 @@ def classes():
 
     classes = Class.query.filter_by(teacher_id=teacher.id).all()
 
+    # Enrolment and assignment counts of every class in one grouped query each
+    class_ids = [cls.id for cls in classes]
+    student_counts = dict(
+        db.session.query(class_student.c.class_id, func.count())
+        .filter(class_student.c.class_id.in_(class_ids))
+        .group_by(class_student.c.class_id)
+        .all()
+    ) if class_ids else {}
+    assignment_counts = dict(
+        db.session.query(Assignment.class_id, func.count(Assignment.id))
+        .filter(Assignment.class_id.in_(class_ids))
+        .group_by(Assignment.class_id)
+        .all()
+    ) if class_ids else {}
+
     formatted = []
     for cls in classes:
-        student_count = cls.students.count()
-        assignment_count = cls.assignments.count()
+        student_count = student_counts.get(cls.id, 0)
+        assignment_count = assignment_counts.get(cls.id, 0)
 
         formatted.append({
             "id": cls.id,
@@ -191,13 +140,21 @@ def assignments():
         .all()
     )
 
+    # Total and graded submissions of every assignment in one grouped query
+    counts = {}
+    if assignments:
+        counts = {
+            assignment_id: (total, graded)
+            for assignment_id, total, graded in db.session.query(
+                Submission.assignment_id, func.count(Submission.id), func.count(Submission.grade)
+            )
+            .filter(Submission.assignment_id.in_([assignment.id for assignment, _ in assignments]))
+            .group_by(Submission.assignment_id)
+        }
+
     formatted = []
     for assignment, cls in assignments:
-        # Count total submissions and graded submissions
-        total_submissions = Submission.query.filter_by(
-            assignment_id=assignment.id).count()
-        graded_submissions = Submission.query.filter_by(
-            assignment_id=assignment.id).filter(Submission.grade != None).count()
+        total_submissions, graded_submissions = counts.get(assignment.id, (0, 0))
 
         # Determine status
         if total_submissions == 0:
@@ -236,28 +193,61 @@ def assignments():
 @login_required
 @teacher_required
 def grades():
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
+    teacher = Teacher.query.options(joinedload(Teacher.user)).filter_by(user_id=current_user.id).first()
+    filters = _grade_filters()
 
-    grades = (
-        db.session.query(Submission, Student, Assignment, Class)
-        .join(Student, Submission.student_id == Student.id)
-        .join(Assignment, Submission.assignment_id == Assignment.id)
-        .join(Class, Assignment.class_id == Class.id)
-        .filter(Class.teacher_id == teacher.id)
-        .all()
+    try:
+        page = grade_page(teacher.id, cursor=request.args.get("cursor"),
+                          limit=request.args.get("limit", GRADES_PAGE_SIZE, type=int), **filters)
+    except ValueError:
+        # Stale or hand-edited cursor: start over from the newest grades
+        page = grade_page(teacher.id, limit=request.args.get("limit", GRADES_PAGE_SIZE, type=int), **filters)
+
+    return render_template(
+        "teacher/grades.html",
+        teacher=teacher,
+        grades=page["items"],
+        page=page,
+        summary=grade_summary(teacher.id, **filters),
+        options=grade_filter_options(teacher.id),
+        filters=request.args,
+        # Filters carried over by the pagination links
+        query_args={k: v for k, v in request.args.items() if k != "cursor"}
     )
 
-    formatted = []
-    for submission, student, assignment, cls in grades:
-        formatted.append({
-            "submission_id": submission.id,
-            "student_name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
-            "class_name": cls.name,
-            "assignment_title": assignment.title,
-            "grade": submission.grade if submission.grade else "Not graded",
-        })
 
-    return render_template("teacher/grades.html", teacher=teacher, grades=formatted)
+@teacher_bp.route("/api/grades")
+@login_required
+@teacher_required
+def grades_api():
+    """Keyset-paginated grades, filtered by class, assignment, status and date"""
+    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
+    try:
+        page = grade_page(teacher.id, cursor=request.args.get("cursor"),
+                          limit=request.args.get("limit", GRADES_PAGE_SIZE, type=int), **_grade_filters())
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+    return jsonify({"success": True, **page})
+
+
+def _grade_filters():
+    """Read the gradebook filters from the query string"""
+    def parse_date(name):
+        try:
+            return datetime.strptime(request.args.get(name, ""), "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    status = request.args.get("status")
+    end = parse_date("to")
+    return {
+        "class_id": request.args.get("class_id", type=int),
+        "assignment_id": request.args.get("assignment_id", type=int),
+        "status": status if status in GRADE_STATUSES else None,
+        "start": parse_date("from"),
+        # Inclusive end date
+        "end": end + timedelta(days=1) if end else None,
+    }
 
 
 # ---------------------------------------------------------
@@ -294,36 +284,76 @@ def profile():
 @login_required
 @teacher_required
 def view_student(id):
-    student = Student.query.get_or_404(id)
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-
-    # Check that student is in one of teacher's classes
-    # Use safe method to get student classes (handles both dynamic and list)
-    student_classes = student.classes.all() if hasattr(student.classes, 'all') else (student.classes if student.classes else [])
-    teacher_classes = Class.query.filter_by(teacher_id=teacher.id).all()
-    teacher_class_ids = [c.id for c in teacher_classes]
-
-    is_authorized = any(cls.id in teacher_class_ids for cls in student_classes)
+    teacher = Teacher.query.options(joinedload(Teacher.user)).filter_by(user_id=current_user.id).first()
+
+    # Load the student and check, in the same query, that they are enrolled
+    # in one of this teacher's classes
+    teaches_student = (
+        select(class_student.c.class_id)
+        .join(Class, Class.id == class_student.c.class_id)
+        .where(class_student.c.student_id == Student.id, Class.teacher_id == teacher.id)
+        .exists()
+    )
+    row = (
+        db.session.query(Student, teaches_student)
+        .options(joinedload(Student.user))
+        .filter(Student.id == id)
+        .first()
+    )
+    if row is None:
+        abort(404)
+    student, is_authorized = row
     if not is_authorized:
         flash("Access denied.", "danger")
         return redirect(url_for("teacher_bp.students"))
 
-    # Get student submissions and grades
-    submissions = Submission.query.filter_by(student_id=student.id).all()
+    # Only the classes and submissions this teacher can see
+    classes = (
+        Class.query
+        .join(class_student, class_student.c.class_id == Class.id)
+        .filter(class_student.c.student_id == student.id, Class.teacher_id == teacher.id)
+        .distinct()
+        .order_by(Class.name)
+        .all()
+    )
+    submissions = (
+        Submission.query
+        .join(Submission.assignment)
+        .join(Class, Class.id == Assignment.class_id)
+        .filter(Submission.student_id == student.id, Class.teacher_id == teacher.id)
+        .options(contains_eager(Submission.assignment).contains_eager(Assignment.class_obj))
+        .order_by(Submission.submitted_at.desc())
+        .all()
+    )
 
     formatted_submissions = []
     for submission in submissions:
-        assignment = Assignment.query.get(submission.assignment_id)
-        if assignment and assignment.class_id in teacher_class_ids:
-            formatted_submissions.append({
-                "id": submission.id,
-                "assignment_title": assignment.title,
-                "submitted_at": submission.submitted_at.strftime("%b %d, %Y %I:%M %p") if submission.submitted_at else "Not submitted",
-                "grade": submission.grade if submission.grade else "Not graded",
-                "feedback": submission.feedback or "No feedback yet",
-            })
+        assignment = submission.assignment
+        formatted_submissions.append({
+            "id": submission.id,
+            "assignment_title": assignment.title,
+            "class_name": assignment.class_obj.name,
+            "submitted_at": submission.submitted_at.strftime("%b %d, %Y %I:%M %p") if submission.submitted_at else "Not submitted",
+            "grade": submission.grade if submission.grade is not None else "Not graded",
+            "feedback": submission.feedback or "No feedback yet",
+        })
 
-    return render_template("teacher/view_student.html", teacher=teacher, student=student, submissions=formatted_submissions)
+    student_data = {
+        "id": student.id,
+        "first_name": student.first_name or "",
+        "last_name": student.last_name or "",
+        "email": student.user.email if student.user else "",
+        "classes": [{"id": c.id, "name": c.name, "description": c.description or ""} for c in classes],
+        "assignments": [{
+            "title": s["assignment_title"],
+            "class_name": s["class_name"],
+            "submission_date": s["submitted_at"],
+            "grade": s["grade"],
+            "status": "Graded" if s["grade"] != "Not graded" else "Pending",
+        } for s in formatted_submissions],
+    }
+
+    return render_template("teacher/view_student.html", teacher=teacher, student=student_data, submissions=formatted_submissions)
 
 
 # ---------------------------------------------------------
@@ -340,10 +370,10 @@ def change_password():
     if new_password != confirm:
         return jsonify({"success": False, "message": "Passwords do not match"}), 400
 
-    if not check_password_hash(current_user.password, current_password):
+    if not verify_password(current_user.password, current_password):
         return jsonify({"success": False, "message": "Incorrect current password"}), 400
 
-    current_user.password = generate_password_hash(new_password)
+    current_user.password = hash_password(new_password)
     db.session.commit()
 
     return jsonify({"success": True, "message": "Password updated"})
@@ -381,6 +411,7 @@ def grade_submission(id):
     submission.graded_at = datetime.utcnow()
 
     db.session.commit()
+    record_activity("assignment_graded", f'"{assignment.title}" graded for {submission.student.full_name}')
 
     return jsonify({"success": True, "message": "Grade saved!", "grade": grade})
 
@@ -394,6 +425,14 @@ def grade_submission(id):
 def export_grades():
     teacher = Teacher.query.filter_by(user_id=current_user.id).first()
 
+    # Every grade, assignment and student name shown bumps its class's version
+    classes = Class.query.filter_by(teacher_id=teacher.id).order_by(Class.id).all()
+    etag = version_etag(teacher, *classes)
+    last_modified = latest(*(cls.updated_at for cls in classes))
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     grades = (
         db.session.query(Submission, Student, Assignment, Class)
         .join(Student, Submission.student_id == Student.id)
@@ -412,7 +451,7 @@ def export_grades():
             "grade": submission.grade if submission.grade else "N/A",
         })
 
-    return jsonify({"success": True, "data": formatted})
+    return with_validators(jsonify({"success": True, "data": formatted}), etag, last_modified)
 
 
 # ---------------------------------------------------------
@@ -423,22 +462,17 @@ def export_grades():
 @teacher_required
 def export_students():
     teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-    classes_taught = Class.query.filter_by(teacher_id=teacher.id).all()
 
-    all_students = []
-    student_ids = set()
-    for cls in classes_taught:
-        for student in cls.students:
-            if student.id not in student_ids:
-                all_students.append((student, cls))
-                student_ids.add(student.id)
+    roster = teacher_roster(teacher.id, search=request.args.get("q", ""), per_page=None)
 
     formatted = []
-    for student, cls in all_students:
+    for student in roster["items"]:
         formatted.append({
-            "name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
-            "email": student.user.email if student.user else "",
-            "class": cls.name,
+            "id": student["id"],
+            "name": student["full_name"],
+            "email": student["email"],
+            "class": student["class_name"],
+            "joined_date": student["joined_date"],
         })
 
     return jsonify({"success": True, "data": formatted})
@@ -460,8 +494,8 @@ def create_class():
         return jsonify({"success": False, "message": "Class name is required"}), 400
 
     cls = Class(name=name, description=description, teacher_id=teacher.id)
-    db.session.add(cls)
-    db.session.commit()
+    cls.save_with_unique_code()
+    record_activity("class_created", f'Class "{cls.name}" created by {teacher.full_name}')
 
     # Generate join link
     join_link = cls.get_join_link(request.url_root.rstrip('/'))
@@ -509,6 +543,7 @@ def create_assignment():
         title=title, description=description, class_id=class_id, due_date=due_date)
     db.session.add(assignment)
     db.session.commit()
+    record_activity("assignment_created", f'Assignment "{assignment.title}" created in {cls.name}')
 
     # Handle file uploads
     if 'assignment_file' in request.files:
@@ -605,29 +640,48 @@ def view_class(class_id):
         flash("Access denied.", "danger")
         return redirect(url_for("teacher_bp.classes"))
 
-    # Get students in this class
-    students = cls.students.all()
-    students_formatted = []
-    for student in students:
-        students_formatted.append({
-            "id": student.id,
-            "full_name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
-            "email": student.user.email if student.user else "",
-        })
+    def load_overview():
+        # Only called when the overview fragment is not cached for this
+        # version of the class (see the {% cache %} block in the template)
+        analytics = class_analytics(cls.id)
+
+        # Get students in this class
+        students = cls.students.options(joinedload(Student.user)).all()
+        students_formatted = []
+        for student in students:
+            student_stats = analytics["students"].get(student.id, {})
+            students_formatted.append({
+                "id": student.id,
+                "full_name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
+                "email": student.user.email if student.user else "",
+                "average": student_stats.get("mean"),
+                "z_score": student_stats.get("z_score"),
+            })
 
-    # Get assignments for this class
-    assignments = Assignment.query.filter_by(class_id=class_id).all()
-    assignments_formatted = []
-    for assignment in assignments:
-        submissions_count = assignment.submissions.count() if assignment.submissions else 0
-        assignments_formatted.append({
-            "id": assignment.id,
-            "title": assignment.title,
-            "due_date": assignment.due_date.strftime("%b %d, %Y") if assignment.due_date else "No date",
-            "submissions": submissions_count,
-        })
+        # Get assignments for this class
+        assignments = Assignment.query.filter_by(class_id=class_id).all()
+        submission_counts = dict(
+            db.session.query(Submission.assignment_id, func.count(Submission.id))
+            .filter(Submission.assignment_id.in_([assignment.id for assignment in assignments]))
+            .group_by(Submission.assignment_id)
+            .all()
+        ) if assignments else {}
+        assignments_formatted = []
+        for assignment in assignments:
+            submissions_count = submission_counts.get(assignment.id, 0)
+            assignment_stats = analytics["assignments"].get(assignment.id, {})
+            assignments_formatted.append({
+                "id": assignment.id,
+                "title": assignment.title,
+                "due_date": assignment.due_date.strftime("%b %d, %Y") if assignment.due_date else "No date",
+                "submissions": submissions_count,
+                "average": assignment_stats.get("mean"),
+                "difficulty": assignment_stats.get("difficulty"),
+            })
 
-    return render_template("teacher/view_class.html", teacher=teacher, class_obj=cls, students=students_formatted, assignments=assignments_formatted)
+        return {"students": students_formatted, "assignments": assignments_formatted, "analytics": analytics}
+
+    return render_template("teacher/view_class.html", teacher=teacher, class_obj=cls, load_overview=load_overview)
 
 
 # ---------------------------------------------------------
@@ -637,31 +691,49 @@ def view_class(class_id):
 @login_required
 @teacher_required
 def view_assignment(assignment_id):
-    assignment = Assignment.query.get_or_404(assignment_id)
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-    cls = Class.query.get(assignment.class_id)
+    teacher = Teacher.query.options(joinedload(Teacher.user)).filter_by(user_id=current_user.id).first()
+    assignment = (
+        Assignment.query
+        .join(Assignment.class_obj)
+        .options(contains_eager(Assignment.class_obj))
+        .filter(Assignment.id == assignment_id)
+        .first_or_404()
+    )
+    cls = assignment.class_obj
 
     # Check that assignment's class belongs to teacher
     if cls.teacher_id != teacher.id:
         flash("Access denied.", "danger")
         return redirect(url_for("teacher_bp.assignments"))
 
-    # Get submissions for this assignment
-    submissions = Submission.query.filter_by(assignment_id=assignment_id).all()
+    # Grade analytics (cached until the next grade write for this class)
+    analytics = assignment_analytics(assignment.id)
+
+    # Submissions with their students, in one query
+    submissions = (
+        Submission.query
+        .join(Submission.student)
+        .options(contains_eager(Submission.student))
+        .filter(Submission.assignment_id == assignment.id)
+        .order_by(Student.last_name, Student.first_name, Submission.id)
+        .all()
+    )
     submissions_formatted = []
     for submission in submissions:
-        student = Student.query.get(submission.student_id)
+        student = submission.student
         submissions_formatted.append({
             "id": submission.id,
             "student_name": f"{student.first_name or ''} {student.last_name or ''}".strip(),
             "student_id": student.id,
             "submitted_at": submission.submitted_at.strftime("%b %d, %Y %I:%M %p") if submission.submitted_at else "Not submitted",
             "grade": submission.grade if submission.grade is not None else "Not graded",
+            "z_score": analytics["students"].get(student.id),
             "file_path": submission.file_path,
             "feedback": submission.feedback or "",
+            "version": submission.version,
         })
 
-    return render_template("teacher/view_assignment.html", teacher=teacher, assignment=assignment, cls=cls, submissions=submissions_formatted)
+    return render_template("teacher/view_assignment.html", teacher=teacher, assignment=assignment, cls=cls, submissions=submissions_formatted, analytics=analytics)
 
 
 # ---------------------------------------------------------
@@ -671,7 +743,7 @@ def view_assignment(assignment_id):
 @login_required
 @teacher_required
 def download_submission(submission_id):
-    """Download a submission file"""
+    """Download a submission file (the latest, or ?version=N)"""
     submission = Submission.query.get_or_404(submission_id)
     teacher = Teacher.query.filter_by(user_id=current_user.id).first()
     
@@ -685,9 +757,15 @@ def download_submission(submission_id):
     if not cls or cls.teacher_id != teacher.id:
         flash("Access denied.", "danger")
         return redirect(url_for("teacher_bp.assignments"))
+
+    stored_path, filename = submission.file_path, None
+    version_number = request.args.get("version", type=int)
+    if version_number is not None:
+        version = submission.versions.filter_by(version=version_number).first_or_404()
+        stored_path, filename = version.file_path, version.file_name
     
     # Check if file exists
-    if not submission.file_path:
+    if not stored_path:
         flash("No file attached to this submission.", "warning")
         return redirect(url_for("teacher_bp.view_assignment", assignment_id=assignment.id))
     
@@ -695,7 +773,7 @@ def download_submission(submission_id):
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
     # Handle Windows path separators and normalize
-    file_path = submission.file_path.replace('\\', os.sep).replace('/', os.sep)
+    file_path = stored_path.replace('\\', os.sep).replace('/', os.sep)
     
     # Construct full path
     if os.path.isabs(file_path):
@@ -707,8 +785,10 @@ def download_submission(submission_id):
     # Normalize path to handle .. and . correctly
     full_path = os.path.normpath(os.path.abspath(full_path))
     
-    # Security check: ensure file is within project directory
-    if not full_path.startswith(base_dir):
+    # Security check: ensure file is within project directory, or in the
+    # submission folder when that is configured to live elsewhere
+    upload_dir = os.path.normpath(os.path.join(base_dir, current_app.config['SUBMISSION_UPLOAD_FOLDER']))
+    if not (full_path.startswith(base_dir) or full_path.startswith(upload_dir + os.sep)):
         flash("Access denied.", "danger")
         return redirect(url_for("teacher_bp.view_assignment", assignment_id=assignment.id))
     
@@ -717,12 +797,49 @@ def download_submission(submission_id):
         flash("File not found.", "danger")
         return redirect(url_for("teacher_bp.view_assignment", assignment_id=assignment.id))
     
-    # Get filename for download
-    filename = os.path.basename(full_path)
+    # Stored files are shared by content and named after whoever uploaded
+    # them first, so send the name this submission's file was uploaded as
+    filename = filename or submission.file_name or os.path.basename(full_path)
     
     return send_file(full_path, as_attachment=False, download_name=filename)
 
 
+# ---------------------------------------------------------
+# Submission Version History
+# ---------------------------------------------------------
+@teacher_bp.route("/submissions/<int:submission_id>/versions")
+@login_required
+@teacher_required
+def submission_versions(submission_id):
+    """Version metadata of a submission; ?from=N&to=M adds a metadata diff"""
+    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
+    owned = (
+        db.session.query(Submission.id)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Class, Assignment.class_id == Class.id)
+        .filter(Submission.id == submission_id, Class.teacher_id == teacher.id)
+        .first()
+    )
+    if owned is None:
+        return jsonify({"success": False, "message": "Submission not found"}), 404
+
+    history = version_history(submission_id)
+    result = {"success": True, "versions": history}
+
+    old = request.args.get("from", type=int)
+    new = request.args.get("to", type=int)
+    if old is not None or new is not None:
+        # Default to comparing against the previous / latest version
+        latest_version = history[-1]["version"] if history else None
+        new = new if new is not None else latest_version
+        old = old if old is not None else (new - 1 if new else None)
+        diff = diff_versions(history, old, new)
+        if diff is None:
+            return jsonify({"success": False, "message": "Unknown version"}), 404
+        result["diff"] = diff
+    return jsonify(result)
+
+
 # ---------------------------------------------------------
 # Grade Assignment (alias to view_assignment)
 # ---------------------------------------------------------
@@ -0,0 +1,222 @@
+"""
+pytest plugin: SQL query and latency budgets per request
+
+query_counter captures the SQL statements every request runs, through
+SQLAlchemy's before_cursor_execute event on the app's engines, and checks
+them against a budget:
+
+    def test_dashboard(query_counter, school_apps):
+        measured = [query_counter.request(school.app, school.client('student'),
+                                          'GET', '/student/dashboard', label=school.scale)
+                    for school in school_apps]
+        query_counter.check('student dashboard', measured, max_queries=8)
+
+Given measurements of the same endpoint taken at several data scales
+(smallest first), check() also fails when the query count grows with the
+data, which is what an N+1 loop looks like. Failures list the statements,
+most repeated first, so the loop is easy to find.
+
+school_apps builds one app per scale in BUDGET_SCALES, seeded with
+benchmarks/school_data.py, and hands out logged in clients per role; the
+apps are shared by every test of the session. The scales differ in every
+dimension a view might loop over: classes per teacher and per student,
+students per class and assignments per class.
+
+Latency budgets are wall clock and so depend on the machine; set
+QUERY_BUDGET_LATENCY=0 to check query counts only.
+
+Tests write their log file and submitted files to a temporary directory
+(LOG_FILE and SUBMISSION_UPLOAD_FOLDER are set before app.py is imported,
+which creates an app of its own), never to the project's logs/ and
+uploads/submissions/.
+"""
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+_FILES = tempfile.mkdtemp(prefix='test-files-')
+os.environ.setdefault("LOG_FILE", os.path.join(_FILES, 'logs', 'app.log'))
+os.environ.setdefault("SUBMISSION_UPLOAD_FOLDER", os.path.join(_FILES, 'submissions'))
+
+import pytest
+from sqlalchemy import event
+
+
+# Data sizes every budgeted endpoint is measured at, smallest first: a scale
+# of benchmarks/school_data.py and plan_school() overrides
+BUDGET_SCALES = (
+    ('tiny', {'classes_per_student': 1}),
+    ('small', {'classes_per_student': 3}),
+)
+
+# Wall clock ceiling of a request that declares no latency budget of its own
+DEFAULT_MAX_MS = 1000
+
+LATENCY_BUDGETS = os.environ.get('QUERY_BUDGET_LATENCY', '1') != '0'
+
+_LITERALS = re.compile(r"'[^']*'|\b\d+\b")
+
+
+class Measurement:
+    """Statements one request ran, its response and how long it took"""
+
+    def __init__(self, label, response, statements, elapsed_ms):
+        self.label = label
+        self.response = response
+        self.statements = statements
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def queries(self):
+        return len(self.statements)
+
+    def repeated(self, limit=5):
+        """The most frequent statement shapes, literals blanked out"""
+        shapes = Counter(' '.join(_LITERALS.sub('?', sql).split()) for sql in self.statements)
+        return shapes.most_common(limit)
+
+
+class QueryCounter:
+    """Capture SQL per request and assert query and latency budgets"""
+
+    def request(self, app, client, method, url, label=None, **kwargs):
+        """
+        Make one request and record the statements it ran
+
+        Args:
+            app (Flask): App whose engines are watched
+            client (FlaskClient): Client to make the request with
+            method (str): HTTP method
+            url (str): Path (and query string)
+            label (str): Name used in failure messages (default: the url)
+            **kwargs: Passed on to client.open (data, headers, ...)
+
+        Returns:
+            Measurement: The request's statements, response and duration
+        """
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            from extensions import db
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            response.close()
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', capture)
+        return Measurement(label or url, response, statements, elapsed_ms)
+
+    def check(self, name, measurements, max_queries, max_ms=None):
+        """
+        Fail unless every measurement is within budget and counts stay flat
+
+        Args:
+            name (str): What was measured, for failure messages
+            measurements (list): Measurements of one endpoint, smallest
+                data scale first
+            max_queries (int): Most statements a request may run
+            max_ms (float): Slowest a request may be (default:
+                DEFAULT_MAX_MS); ignored with QUERY_BUDGET_LATENCY=0
+        """
+        problems = []
+        for measured in measurements:
+            if measured.queries > max_queries:
+                problems.append(f'{measured.label}: {measured.queries} queries, budget {max_queries}')
+        for smaller, larger in zip(measurements, measurements[1:]):
+            if larger.queries > smaller.queries:
+                problems.append(f'query count grows with the data: {smaller.queries} at {smaller.label}, '
+                                f'{larger.queries} at {larger.label}')
+        if LATENCY_BUDGETS:
+            limit = max_ms or DEFAULT_MAX_MS
+            for measured in measurements:
+                if measured.elapsed_ms > limit:
+                    problems.append(f'{measured.label}: {measured.elapsed_ms:.0f} ms, budget {limit} ms')
+        if problems:
+            worst = max(measurements, key=lambda m: m.queries)
+            lines = [f'{name} is over budget:'] + ['  ' + p for p in problems]
+            lines.append(f'most repeated statements at {worst.label}:')
+            lines += [f'  {count} x {sql[:200]}' for sql, count in worst.repeated()]
+            pytest.fail('\n'.join(lines), pytrace=False)
+
+
+# Settings for apps built by tests: no CSRF tokens, background threads or
+# slow password hashes
+TEST_CONFIG = {
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'ACTIVITY_LOG_ASYNC': False,
+    'TOUCH_ASYNC': False,
+    'SESSION_PURGE_INTERVAL': 0,
+    'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+}
+
+
+class SchoolApp:
+    """An app seeded with a synthetic school, with a logged in client per role"""
+
+    def __init__(self, scale, seed=42, **overrides):
+        from app import create_app, db
+        from benchmarks.school_data import PASSWORD, generate_school
+
+        self.scale = scale
+        self.app = create_app(dict(TEST_CONFIG, RATE_LIMIT_ENABLED=False))
+        with self.app.app_context():
+            db.create_all()
+            self.ids = generate_school(scale, seed=seed, **overrides)['ids']
+        self.password = PASSWORD
+        self._clients = {}
+
+    def client(self, role):
+        """Test client logged in as the plan's admin, teacher or student"""
+        if role not in self._clients:
+            client = self.app.test_client()
+            response = client.post('/login', data={'email': self.ids[f'{role}_email'],
+                                                   'password': self.password})
+            assert response.status_code == 302, f'{role} login failed at scale {self.scale}'
+            # The first request after login writes the session; keep it out of budgets
+            client.get('/')
+            self._clients[role] = client
+        return self._clients[role]
+
+    def close(self):
+        from app import db
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_FILES, ignore_errors=True)
+
+
+@pytest.fixture
+def app_config():
+    """A copy of TEST_CONFIG for create_app()"""
+    return dict(TEST_CONFIG)
+
+
+@pytest.fixture
+def query_counter():
+    return QueryCounter()
+
+
+@pytest.fixture(scope='session')
+def school_apps():
+    """One seeded SchoolApp per scale in BUDGET_SCALES, smallest first"""
+    apps = [SchoolApp(scale, **overrides) for scale, overrides in BUDGET_SCALES]
+    yield apps
+    for school in apps:
+        school.close()
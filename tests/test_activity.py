@@ -0,0 +1,80 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.activity_event import ActivityEvent, ActivityRollup
+from utils.activity import record_activity, activity_feed, prune_activity_events
+
+
+class ActivityLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({'ACTIVITY_LOG_ASYNC': False})
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_feed_pages_backwards_with_cursor(self):
+        for i in range(5):
+            record_activity('user_login', f'login {i}', user_id=i)
+        record_activity('user_deleted', 'deleted someone')
+
+        first_page, cursor = activity_feed(event_type='user_login', limit=2)
+        self.assertEqual([e.description for e in first_page], ['login 4', 'login 3'])
+        self.assertIsNotNone(cursor)
+
+        second_page, cursor = activity_feed(event_type='user_login', before=cursor, limit=2)
+        self.assertEqual([e.description for e in second_page], ['login 2', 'login 1'])
+
+        last_page, cursor = activity_feed(event_type='user_login', before=cursor, limit=2)
+        self.assertEqual([e.description for e in last_page], ['login 0'])
+        self.assertIsNone(cursor)
+
+    def test_buffered_events_are_flushed_in_batches(self):
+        buffer = self.app.extensions['activity_log']
+        buffer.asynchronous = True
+        self.addCleanup(buffer.stop)
+        record_activity('user_login', 'queued 1')
+        record_activity('user_login', 'queued 2')
+        self.assertEqual(buffer.pending(), 2)
+        self.assertEqual(ActivityEvent.query.count(), 0)
+
+        events, _ = activity_feed()
+        self.assertEqual(len(events), 2)
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_prune_rolls_up_old_events(self):
+        old = datetime.utcnow() - timedelta(days=100)
+        db.session.add_all([
+            ActivityEvent(type='user_login', description='a', created_at=old),
+            ActivityEvent(type='user_login', description='b', created_at=old),
+            ActivityEvent(type='role_changed', description='c', created_at=old),
+        ])
+        db.session.commit()
+        record_activity('user_login', 'recent')
+
+        deleted = prune_activity_events(90)
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(ActivityEvent.query.count(), 1)
+        rollup = ActivityRollup.query.filter_by(type='user_login').one()
+        self.assertEqual(rollup.count, 2)
+        self.assertEqual(rollup.day, old.date())
+
+        # Running it again keeps adding to the same rollup rows
+        db.session.add(ActivityEvent(type='user_login', description='d', created_at=old))
+        db.session.commit()
+        prune_activity_events(90)
+        self.assertEqual(ActivityRollup.query.filter_by(type='user_login').one().count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.admin_stats_snapshot import AdminStatsSnapshot
+from models.user import User
+from routes.admin import DASHBOARD_USER_LIMIT
+from utils.admin_stats import get_admin_stats, refresh_admin_stats
+from utils.passwords import hash_password
+
+CSRF_META = re.compile(r'name="csrf-token" content="([^"]+)"')
+
+
+class AdminStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        # A database file, so a second app can play another worker
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = self.make_app()
+        # No app context stays pushed: requests would share its g, and with it
+        # the CSRF token of the first client
+        with self.app.app_context():
+            db.create_all()
+            password = hash_password('secret123')
+            db.session.add_all([
+                User(username='root', email='root@example.com', password=password, role='admin',
+                     created_at=datetime(2025, 1, 1)),
+                User(username='sam', email='sam@example.com', password=password, role='student',
+                     created_at=datetime(2025, 1, 2))
+            ])
+            db.session.commit()
+
+    def make_app(self):
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'test.db')}",
+            'WTF_CSRF_ENABLED': True,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+            'ADMIN_STATS_REFRESH_SECONDS': 60
+        })
+        app.config['TESTING'] = True
+        return app
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def add_student(self, name, created_at=None):
+        with self.app.app_context():
+            db.session.add(User(username=name, email=f'{name}@example.com', password='x', role='student',
+                                created_at=created_at or datetime.utcnow()))
+            db.session.commit()
+
+    def students(self, app=None):
+        with (app or self.app).app_context():
+            return get_admin_stats()['total_students']
+
+    def age_snapshot(self, seconds):
+        with self.app.app_context():
+            AdminStatsSnapshot.query.update(
+                {'refreshed_at': datetime.utcnow() - timedelta(seconds=seconds)})
+            db.session.commit()
+
+    def login(self, email):
+        client = self.app.test_client()
+        token = CSRF_META.search(client.get('/login').get_data(as_text=True)).group(1)
+        response = client.post('/login', data={'email': email, 'password': 'secret123', 'csrf_token': token})
+        self.assertEqual(response.status_code, 302)
+        return client, token
+
+    def test_snapshot_is_rebuilt_after_the_refresh_interval(self):
+        self.assertEqual(self.students(), 1)
+        self.add_student('ann')
+        self.age_snapshot(59)
+        self.assertEqual(self.students(), 1)
+        self.age_snapshot(60)
+        self.assertEqual(self.students(), 2)
+
+    def test_snapshot_is_shared_between_workers(self):
+        other = self.make_app()
+        try:
+            self.assertEqual(self.students(), 1)
+            self.assertEqual(self.students(other), 1)
+            self.add_student('ann')
+
+            with other.app_context():
+                refresh_admin_stats()
+            self.assertEqual(self.students(), 2)
+        finally:
+            with other.app_context():
+                db.session.remove()
+                db.engine.dispose()
+
+    def test_refresh_endpoint(self):
+        self.assertEqual(self.students(), 1)
+        self.add_student('ann')
+
+        admin, token = self.login('root@example.com')
+        # Without a CSRF token the form post is refused
+        self.assertEqual(admin.post('/admin/stats/refresh').status_code, 400)
+        self.assertEqual(self.students(), 1)
+
+        student, student_token = self.login('sam@example.com')
+        self.assertEqual(student.post('/admin/stats/refresh',
+                                      data={'csrf_token': student_token}).status_code, 403)
+        anonymous = self.app.test_client()
+        anonymous_token = CSRF_META.search(anonymous.get('/login').get_data(as_text=True)).group(1)
+        response = anonymous.post('/admin/stats/refresh', data={'csrf_token': anonymous_token})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+        self.assertEqual(self.students(), 1)
+
+        response = admin.post('/admin/stats/refresh', data={'csrf_token': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.students(), 2)
+
+    def test_dashboard_lists_the_newest_users(self):
+        start = datetime(2025, 2, 1)
+        for i in range(DASHBOARD_USER_LIMIT + 2):
+            self.add_student(f'pupil{i:02d}', created_at=start + timedelta(days=i))
+
+        admin, _ = self.login('root@example.com')
+        page = admin.get('/admin/dashboard').get_data(as_text=True)
+        listed = re.findall(r'<td>(pupil\d+|root|sam)@example\.com</td>', page)
+        self.assertEqual(listed, [f'pupil{i:02d}' for i in range(11, 1, -1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from utils.admission import AdmissionController
+
+
+class AdmissionControllerTestCase(unittest.TestCase):
+    def start_waiter(self, controller, priority, admitted):
+        """Call acquire() on a thread and record the outcome in `admitted`"""
+        def run():
+            admitted.append((priority, controller.acquire(priority)))
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def wait_for_queue(self, controller, depth):
+        for _ in range(200):
+            if sum(controller.stats()['queue_depth'].values()) == depth:
+                return
+            time.sleep(0.005)
+        self.fail('waiters did not queue')
+
+    def test_reserved_slots_are_kept_for_critical(self):
+        controller = AdmissionController(3, reserved=1, queue_timeout=0)
+        self.assertTrue(controller.acquire('normal'))
+        self.assertTrue(controller.acquire('normal'))
+        self.assertFalse(controller.acquire('normal'))
+        self.assertTrue(controller.acquire('critical'))
+        self.assertFalse(controller.acquire('critical'))
+
+        stats = controller.stats()
+        self.assertEqual(stats['in_flight'], {'critical': 1, 'normal': 2, 'low': 0})
+        self.assertEqual(stats['shed'], {'critical': 1, 'normal': 1, 'low': 0})
+
+    def test_low_priority_is_capped_and_shed_first(self):
+        controller = AdmissionController(4, low_limit=1, low_queue_timeout=0)
+        self.assertTrue(controller.acquire('low'))
+        self.assertFalse(controller.acquire('low'))
+        self.assertTrue(controller.acquire('normal'))
+        controller.release('low')
+        self.assertTrue(controller.acquire('low'))
+
+    def test_freed_slot_goes_to_highest_priority(self):
+        controller = AdmissionController(1, queue_timeout=5, low_queue_timeout=5)
+        self.assertTrue(controller.acquire('normal'))
+
+        admitted = []
+        threads = [self.start_waiter(controller, 'low', admitted)]
+        self.wait_for_queue(controller, 1)
+        threads.append(self.start_waiter(controller, 'normal', admitted))
+        self.wait_for_queue(controller, 2)
+        threads.append(self.start_waiter(controller, 'critical', admitted))
+        self.wait_for_queue(controller, 3)
+
+        # Each release admits exactly one waiter, best class first
+        running = 'normal'
+        for count, expected in enumerate(('critical', 'normal', 'low'), 1):
+            controller.release(running)
+            for _ in range(200):
+                if len(admitted) == count:
+                    break
+                time.sleep(0.005)
+            self.assertEqual(admitted, [(p, True) for p in ('critical', 'normal', 'low')[:count]])
+            running = expected
+        controller.release(running)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(controller.stats()['queue_depth'], {'critical': 0, 'normal': 0, 'low': 0})
+
+    def test_queue_is_bounded_and_waits_time_out(self):
+        controller = AdmissionController(1, max_queue=1, queue_timeout=0.05)
+        self.assertTrue(controller.acquire('critical'))
+
+        admitted = []
+        thread = self.start_waiter(controller, 'normal', admitted)
+        self.wait_for_queue(controller, 1)
+        # Queue full: shed without waiting
+        self.assertFalse(controller.acquire('critical'))
+        thread.join()
+        # The queued request gave up after its timeout
+        self.assertEqual(admitted, [('normal', False)])
+        self.assertEqual(controller.stats()['shed'], {'critical': 1, 'normal': 1, 'low': 0})
+
+
+class AdmissionMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'ADMISSION_MAX_CONCURRENT': 2,
+            'ADMISSION_RESERVED': 1,
+            'ADMISSION_QUEUE_TIMEOUT': 0,
+            'ADMISSION_LOW_QUEUE_TIMEOUT': 0,
+            'ADMISSION_RETRY_AFTER': 7
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+        self.controller = self.app.extensions['admission']
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_sheds_when_unreserved_slots_are_busy(self):
+        # Another request holds the only unreserved slot
+        self.assertTrue(self.controller.acquire('normal'))
+
+        response = self.client.get('/teacher/dashboard')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertFalse(response.get_json()['success'])
+
+        page = self.client.get('/login', headers={'Accept': 'text/html'})
+        self.assertEqual(page.status_code, 503)
+        self.assertIn(b'503', page.data)
+
+        # Submits and the grading page may still use the reserved slot;
+        # static files bypass the queue
+        with self.client.post('/student/assignments/submit') as submit:
+            self.assertNotEqual(submit.status_code, 503)
+        with self.client.get('/teacher/assignments/1') as grading:
+            self.assertNotEqual(grading.status_code, 503)
+        with self.client.get('/static/does-not-exist.css') as static:
+            self.assertNotEqual(static.status_code, 503)
+
+        stats = self.controller.stats()
+        self.assertEqual(stats['shed'], {'critical': 0, 'normal': 1, 'low': 1})
+        self.assertEqual(stats['in_flight'], {'critical': 0, 'normal': 1, 'low': 0})
+
+        self.controller.release('normal')
+        self.assertEqual(self.client.get('/login').status_code, 200)
+
+    def test_slot_is_held_until_the_response_is_closed(self):
+        response = self.client.get('/login', buffered=False)
+        self.assertEqual(self.controller.stats()['in_flight']['normal'], 1)
+        response.close()
+        self.assertEqual(self.controller.stats()['in_flight']['normal'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils import analytics
+from utils.submissions import StoredFile, save_submission
+
+
+class LetterDistributionTestCase(unittest.TestCase):
+    def test_buckets_match_letter_boundaries(self):
+        counts, percents = analytics.letter_distribution([95, 90, 89.5, 80, 75, 60, 59.9, 100])
+        self.assertEqual(counts, {'A': 3, 'B': 2, 'C': 1, 'D': 1, 'F': 1})
+        self.assertEqual(sum(counts.values()), 8)
+        self.assertEqual(percents['A'], 38)
+
+    def test_empty_grades(self):
+        counts, percents = analytics.letter_distribution([])
+        self.assertEqual(counts, {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0})
+        self.assertEqual(percents, {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'F': 0})
+        self.assertIsNone(analytics.summarize([]))
+
+    def test_summary(self):
+        summary = analytics.summarize([70, 80, 90])
+        self.assertEqual(summary['mean'], 80.0)
+        self.assertEqual(summary['median'], 80.0)
+        self.assertEqual(summary['std'], 8.2)
+        self.assertEqual(summary['percentiles'][50], 80.0)
+
+
+class ClassAnalyticsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        teacher_user = User(username="teach", email="teach@example.com", password="x", role="teacher")
+        db.session.add(teacher_user)
+        db.session.flush()
+        teacher = Teacher(user_id=teacher_user.id)
+        db.session.add(teacher)
+        db.session.flush()
+        self.cls = Class(name="Algebra", teacher_id=teacher.id)
+        db.session.add(self.cls)
+        db.session.flush()
+
+        self.students = []
+        for i in range(3):
+            user = User(username=f"s{i}", email=f"s{i}@example.com", password="x")
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id)
+            db.session.add(student)
+            self.students.append(student)
+        db.session.flush()
+
+        self.easy = Assignment(title="Easy", description="", class_id=self.cls.id)
+        self.hard = Assignment(title="Hard", description="", class_id=self.cls.id)
+        db.session.add_all([self.easy, self.hard])
+        db.session.flush()
+
+        for student, easy_grade, hard_grade in zip(self.students, [90, 95, 100], [40, 50, None]):
+            db.session.add(Submission(assignment_id=self.easy.id, student_id=student.id, grade=easy_grade))
+            db.session.add(Submission(assignment_id=self.hard.id, student_id=student.id, grade=hard_grade))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_class_analytics(self):
+        result = analytics.class_analytics(self.cls.id)
+        self.assertEqual(result['summary']['count'], 5)
+        self.assertEqual(result['assignments'][self.easy.id]['mean'], 95.0)
+        self.assertEqual(result['assignments'][self.hard.id]['difficulty'], 0.55)
+
+        # Student 1 is above average on both assignments, student 0 below
+        self.assertGreater(result['students'][self.students[1].id]['z_score'], 0)
+        self.assertLess(result['students'][self.students[0].id]['z_score'], 0)
+
+    def test_assignment_analytics_z_scores(self):
+        result = analytics.assignment_analytics(self.hard.id)
+        self.assertEqual(result['summary']['count'], 2)
+        self.assertEqual(result['students'][self.students[0].id], -1.0)
+        self.assertEqual(result['students'][self.students[1].id], 1.0)
+        self.assertNotIn(self.students[2].id, result['students'])
+
+    def test_cached_until_the_class_changes(self):
+        first = analytics.class_analytics(self.cls.id)
+        self.assertIs(analytics.class_analytics(self.cls.id), first)
+
+        submission = Submission.query.filter_by(assignment_id=self.hard.id, student_id=self.students[2].id).first()
+        submission.grade = 60
+        db.session.commit()
+        refreshed = analytics.class_analytics(self.cls.id)
+        self.assertEqual(refreshed['summary']['count'], 6)
+
+    def test_resubmit_refreshes_assignment_analytics(self):
+        self.assertEqual(analytics.assignment_analytics(self.hard.id)['summary']['count'], 2)
+        # A resubmit goes through a Core upsert, not the ORM
+        save_submission(self.hard.id, self.students[2].id,
+                        StoredFile('b.txt', 'b.txt', 1, 'text/plain', 'b' * 64), policy='replace')
+        Submission.query.filter_by(assignment_id=self.hard.id, student_id=self.students[2].id).update({'grade': 70})
+        db.session.commit()
+        self.assertEqual(analytics.assignment_analytics(self.hard.id)['summary']['count'], 3)
+
+    def test_deleting_a_student_refreshes_class_analytics(self):
+        self.students[1].classes.append(self.cls)
+        db.session.commit()
+        self.assertEqual(analytics.class_analytics(self.cls.id)['summary']['count'], 5)
+
+        db.session.delete(db.session.get(User, self.students[1].user_id))
+        db.session.commit()
+        self.assertEqual(analytics.class_analytics(self.cls.id)['summary']['count'], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
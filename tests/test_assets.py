@@ -0,0 +1,122 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from flask import jsonify, url_for
+from app import create_app, db
+from utils.assets import build_assets, minify_css
+
+
+class AssetPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+
+        # Build a copy of the assets so the real static folder is left alone
+        self.static = tempfile.mkdtemp()
+        for folder in ('css', 'js'):
+            shutil.copytree(os.path.join(self.app.static_folder, folder), os.path.join(self.static, folder))
+        self.app.static_folder = self.static
+        self.manifest = build_assets(self.static)
+        self.app.extensions['assets'].load()
+
+        @self.app.route('/_test/report')
+        def report():
+            return jsonify({'rows': [{'student': f'Student {i}', 'grade': i % 100} for i in range(500)]})
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.static, ignore_errors=True)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_minify_css(self):
+        css = '/*! license */\n/* note */\na , b {\n  color : red ;\n  content: "x  /* y */ ;";\n}\n'
+        self.assertEqual(minify_css(css), '/*! license */ a,b{color : red;content: "x  /* y */ ;"}')
+
+    def test_build_writes_fingerprinted_compressed_files(self):
+        self.assertEqual(set(self.manifest), {'css/bootstrap.css', 'css/bootstrap.min.css', 'css/style.css',
+                                              'js/bootstrap.bundle.min.js', 'js/main.js'})
+        with open(os.path.join(self.static, 'dist', 'manifest.json')) as f:
+            self.assertEqual(json.load(f), self.manifest)
+
+        target = os.path.join(self.static, self.manifest['css/style.css'])
+        self.assertRegex(self.manifest['css/style.css'], r'^dist/css/style\.[0-9a-f]{10}\.css$')
+        with open(target, 'rb') as f:
+            built = f.read()
+        with open(os.path.join(self.static, 'css', 'style.css'), 'rb') as f:
+            self.assertLess(len(built), len(f.read()))
+        with gzip.open(target + '.gz') as f:
+            self.assertEqual(f.read(), built)
+
+        # Files that are already minified are copied as they are
+        with open(os.path.join(self.static, 'css', 'bootstrap.min.css'), 'rb') as source, \
+                open(os.path.join(self.static, self.manifest['css/bootstrap.min.css']), 'rb') as target:
+            self.assertEqual(source.read(), target.read())
+
+        # The same content builds to the same names
+        self.assertEqual(build_assets(self.static), self.manifest)
+
+    def test_url_for_links_to_build(self):
+        with self.app.test_request_context():
+            self.assertEqual(url_for('static', filename='css/style.css'),
+                             '/static/' + self.manifest['css/style.css'])
+            self.assertEqual(url_for('static', filename='uploads/avatar.png'), '/static/uploads/avatar.png')
+
+    def test_build_served_precompressed_and_immutable(self):
+        url = '/static/' + self.manifest['css/bootstrap.css']
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        compressed = response.data
+        response.close()
+
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(gzip.decompress(compressed), plain.data)
+        plain.close()
+
+    def test_sources_served_as_before(self):
+        response = self.client.get('/static/css/style.css', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('immutable', response.headers.get('Cache-Control', ''))
+        response.close()
+
+    def test_large_json_gzipped_on_the_fly(self):
+        response = self.client.get('/_test/report', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['rows']), 500)
+
+        plain = self.client.get('/_test/report')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(len(plain.get_json()['rows']), 500)
+
+    def test_small_responses_left_alone(self):
+        self.app.config['COMPRESS_MIN_SIZE'] = 10 ** 6
+        response = self.client.get('/_test/report', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
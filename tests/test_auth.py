@@ -1,15 +1,24 @@
+import os
 import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
 from app import create_app, db
 from models.user import User
+from models.student import Student
 from werkzeug.security import generate_password_hash
 
 
 class AuthTestCase(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',  # In-memory DB for tests
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0
+        })
         self.app.config['TESTING'] = True
-        # In-memory DB for tests
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.client = self.app.test_client()
 
         with self.app.app_context():
@@ -18,6 +27,9 @@ class AuthTestCase(unittest.TestCase):
             user = User(username="testuser", email="test@example.com", 
                        password=generate_password_hash("testpass"), role="student")
             db.session.add(user)
+            db.session.flush()
+            # The student dashboard needs the profile
+            db.session.add(Student(user_id=user.id, first_name="Test"))
             db.session.commit()
 
     def tearDown(self):
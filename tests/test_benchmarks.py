@@ -0,0 +1,58 @@
+import os
+import unittest
+from collections import Counter
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from benchmarks.journeys import compare, percentile
+from benchmarks.school_data import plan_school
+
+
+class SchoolPlanTestCase(unittest.TestCase):
+    def test_plan_is_reproducible_and_sized(self):
+        plan = plan_school(seed=7, teachers=3, classes_per_teacher=2, students_per_class=10,
+                           assignments_per_class=4, classes_per_student=2)
+        self.assertEqual(plan, plan_school(seed=7, teachers=3, classes_per_teacher=2, students_per_class=10,
+                                           assignments_per_class=4, classes_per_student=2))
+        self.assertNotEqual(plan['submissions'], plan_school(seed=8, teachers=3, classes_per_teacher=2,
+                                                             students_per_class=10, assignments_per_class=4,
+                                                             classes_per_student=2)['submissions'])
+
+        self.assertEqual(len(plan['classes']), 6)
+        self.assertEqual(len(plan['students']), 30)
+        self.assertEqual(len(plan['assignments']), 24)
+        enrolment = Counter(row['class_id'] for row in plan['class_student'])
+        self.assertEqual(set(enrolment.values()), {10})
+        self.assertEqual(len({(r['class_id'], r['student_id']) for r in plan['class_student']}), 60)
+        pairs = [(s['assignment_id'], s['student_id']) for s in plan['submissions']]
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertEqual(len({c['class_code'] for c in plan['classes']}), 6)
+
+        ids = plan['ids']
+        submission = next(s for s in plan['submissions'] if s['id'] == ids['submission_id'])
+        self.assertEqual(submission['assignment_id'], ids['assignment_id'])
+
+
+class BaselineCompareTestCase(unittest.TestCase):
+    def row(self, p95_ms, queries, memory_kib=100.0, errors=0):
+        return {'n': 10, 'errors': errors, 'p50_ms': p95_ms / 2, 'p95_ms': p95_ms, 'p99_ms': p95_ms,
+                'queries': queries, 'memory_kib': memory_kib}
+
+    def test_regressions(self):
+        baseline = {'GET /a': self.row(10, 5), 'GET /b': self.row(10, 5)}
+        self.assertEqual(compare({'GET /a': self.row(14, 5), 'GET /new': self.row(1, 99)}, baseline), [])
+
+        problems = compare({'GET /a': self.row(16, 5), 'GET /b': self.row(10, 6, memory_kib=200, errors=1)},
+                           baseline)
+        self.assertEqual(len(problems), 4)
+        self.assertTrue(problems[0].startswith('GET /a: p95_ms 16'))
+        self.assertIn('GET /b: 6 queries (baseline 5)', problems)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertEqual(percentile([3], 99), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from utils.buffered import BatchBuffer
+
+
+class BatchBufferTestCase(unittest.TestCase):
+    def make_buffer(self, flush_func, **kwargs):
+        buffer = BatchBuffer(flush_func, interval=60, name='test-buffer', **kwargs)
+        self.addCleanup(buffer.stop)
+        return buffer
+
+    def test_thread_starts_on_first_add_in_each_process(self):
+        buffer = self.make_buffer(lambda items: None)
+        self.assertIsNone(buffer._thread)
+
+        buffer.add('parent')
+        parent_thread = buffer._thread
+        self.assertTrue(parent_thread.is_alive())
+
+        # In a forked worker the pid differs: the worker starts its own
+        # thread and leaves the parent's items to the parent
+        with mock.patch('utils.buffered.os.getpid', return_value=buffer._pid + 1):
+            buffer.add('child')
+            self.assertIsNot(buffer._thread, parent_thread)
+            self.assertTrue(buffer._thread.is_alive())
+            self.assertEqual(buffer._items, ['child'])
+            buffer.stop()
+
+    def test_failed_flush_keeps_items(self):
+        written = []
+        failing = [True]
+
+        def flush_func(items):
+            if failing[0]:
+                raise RuntimeError('database is down')
+            written.extend(items)
+
+        buffer = self.make_buffer(flush_func, asynchronous=False, max_items=2, max_pending=5)
+        with self.assertLogs('utils.buffered', 'ERROR'):
+            for i in range(7):
+                buffer.add(i)
+        # Only the newest max_pending items are kept
+        self.assertEqual(buffer.pending(), 5)
+
+        failing[0] = False
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(written, [2, 3, 4, 5, 6])
+        self.assertEqual(buffer.pending(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
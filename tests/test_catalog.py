@@ -0,0 +1,134 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from utils.catalog import class_catalog, MAX_PAGE_SIZE
+from utils.passwords import hash_password
+
+
+class ClassCatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({'ACTIVITY_LOG_ASYNC': False})
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        teacher_user = User(username='tina', email='tina@example.com', password='x', role='teacher')
+        student_user = User(username='sam', email='sam@example.com', password='x', role='student')
+        other_user = User(username='olga', email='olga@example.com', password='x', role='student')
+        db.session.add_all([teacher_user, student_user, other_user])
+        db.session.flush()
+        self.teacher = Teacher(user_id=teacher_user.id, first_name='Tina', last_name='Turing')
+        self.student = Student(user_id=student_user.id)
+        self.other = Student(user_id=other_user.id)
+        db.session.add_all([self.teacher, self.student, self.other])
+        db.session.flush()
+
+        self.algebra = self.add_class('Algebra', teacher_id=self.teacher.id)
+        self.biology = self.add_class('Biology')
+        self.chemistry = self.add_class('Chemistry 100%', teacher_id=self.teacher.id)
+        self.student.classes.append(self.algebra)
+        self.other.classes.append(self.algebra)
+        self.other.classes.append(self.biology)
+        db.session.add_all([Assignment(title=f'HW{i}', description='-', class_id=self.algebra.id) for i in range(3)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def add_class(self, name, teacher_id=None):
+        cls = Class(name=name, teacher_id=teacher_id)
+        db.session.add(cls)
+        db.session.flush()
+        return cls
+
+    def count_queries(self, func, *args, **kwargs):
+        statements = []
+        listener = lambda *a: statements.append(a[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return result, len(statements)
+
+    def test_counts_teacher_and_enrollment(self):
+        catalog = class_catalog(self.student.id)
+        self.assertEqual(catalog['total'], 3)
+        by_name = {item['name']: item for item in catalog['items']}
+
+        self.assertEqual(by_name['Algebra']['student_count'], 2)
+        self.assertEqual(by_name['Algebra']['assignment_count'], 3)
+        self.assertTrue(by_name['Algebra']['enrolled'])
+        self.assertEqual(by_name['Algebra']['teacher'], 'Tina Turing')
+
+        self.assertEqual(by_name['Biology']['student_count'], 1)
+        self.assertEqual(by_name['Biology']['assignment_count'], 0)
+        self.assertFalse(by_name['Biology']['enrolled'])
+        self.assertEqual(by_name['Biology']['teacher'], 'No Teacher')
+
+    def test_search_filters_and_pages(self):
+        self.assertEqual([c['name'] for c in class_catalog(self.student.id, search='turing')['items']],
+                         ['Algebra', 'Chemistry 100%'])
+        # LIKE wildcards in the search term are matched literally
+        self.assertEqual([c['name'] for c in class_catalog(self.student.id, search='100%')['items']],
+                         ['Chemistry 100%'])
+        self.assertEqual(class_catalog(self.student.id, search='%')['total'], 1)
+
+        available = class_catalog(self.student.id, enrolled=False, per_page=1, page=2)
+        self.assertEqual((available['total'], available['pages']), (2, 2))
+        self.assertEqual([c['name'] for c in available['items']], ['Chemistry 100%'])
+
+    def test_query_count_does_not_grow_with_classes(self):
+        _, small = self.count_queries(class_catalog, self.student.id)
+        for i in range(20):
+            cls = self.add_class(f'Extra {i}', teacher_id=self.teacher.id)
+            self.other.classes.append(cls)
+        db.session.commit()
+        catalog, large = self.count_queries(class_catalog, self.student.id, per_page=50)
+        self.assertEqual(len(catalog['items']), 23)
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)
+
+
+    def test_counts_on_later_pages(self):
+        # Counts are taken for the classes on the page only
+        page = class_catalog(self.student.id, per_page=1, page=2)
+        self.assertEqual([(c['name'], c['student_count'], c['assignment_count']) for c in page['items']],
+                         [('Biology', 1, 0)])
+        page = class_catalog(self.other.id, enrolled=True, per_page=1, page=1)
+        self.assertEqual([(c['name'], c['student_count'], c['assignment_count']) for c in page['items']],
+                         [('Algebra', 2, 3)])
+
+    def test_classes_page_pages_enrolled_classes(self):
+        for i in range(MAX_PAGE_SIZE + 2):
+            self.student.classes.append(self.add_class(f'Zoology {i:02d}', teacher_id=self.teacher.id))
+        self.student.user.password = hash_password('secret123', method='scrypt-interactive')
+        db.session.commit()
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        client = self.app.test_client()
+        client.post('/login', data={'email': 'sam@example.com', 'password': 'secret123'})
+
+        first = client.get('/student/classes').get_data(as_text=True)
+        self.assertIn('Zoology 48', first)
+        self.assertNotIn('Zoology 49', first)
+        self.assertIn('Page 1 of 2', first)
+        self.assertIn('>53<', first.replace(' ', '').replace('\n', ''))
+        second = client.get('/student/classes?enrolled_page=2').get_data(as_text=True)
+        self.assertIn('Zoology 49', second)
+        self.assertIn('Zoology 51', second)
+        self.assertNotIn('Zoology 48', second)
+
+if __name__ == "__main__":
+    unittest.main()
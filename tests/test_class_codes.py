@@ -0,0 +1,67 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.class_model import Class
+from utils import class_codes
+
+
+class ClassCodeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({'ACTIVITY_LOG_ASYNC': False})
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        class_codes._cache.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def count_queries(self, func, *args):
+        statements = []
+        listener = lambda *a: statements.append(a[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = func(*args)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return result, len(statements)
+
+    def test_collision_draws_a_new_code(self):
+        Class(name='First', class_code='AAAAAA').save_with_unique_code()
+        with mock.patch.object(Class, 'generate_class_code', side_effect=['AAAAAA', 'BBBBBB']):
+            second = Class(name='Second')
+            second.save_with_unique_code()
+        self.assertEqual(second.class_code, 'BBBBBB')
+        self.assertEqual(Class.query.count(), 2)
+
+    def test_lookups_are_cached_including_misses(self):
+        cls = Class(name='Cached')
+        cls.save_with_unique_code()
+
+        class_id, queries = self.count_queries(class_codes.resolve_class_code, cls.class_code.lower())
+        self.assertEqual((class_id, queries), (cls.id, 1))
+        class_id, queries = self.count_queries(class_codes.resolve_class_code, cls.class_code)
+        self.assertEqual((class_id, queries), (cls.id, 0))
+
+        self.assertEqual(self.count_queries(class_codes.resolve_class_code, 'ZZZZZ9'), (None, 1))
+        self.assertEqual(self.count_queries(class_codes.resolve_class_code, 'ZZZZZ9'), (None, 0))
+        # Malformed codes never reach the database
+        self.assertEqual(self.count_queries(class_codes.resolve_class_code, "' OR 1=1"), (None, 0))
+
+    def test_new_class_replaces_cached_miss(self):
+        self.assertIsNone(class_codes.resolve_class_code('NEW123'))
+        cls = Class(name='Late', class_code='NEW123')
+        cls.save_with_unique_code()
+        self.assertEqual(class_codes.get_class_by_code('new123'), cls)
+
+
+if __name__ == "__main__":
+    unittest.main()
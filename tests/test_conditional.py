@@ -0,0 +1,147 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils.conditional import version_etag
+from utils.passwords import hash_password
+
+
+class ConditionalGetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            teacher_user = User(username='tina', email='tina@example.com',
+                                password=hash_password('secret123'), role='teacher')
+            student_user = User(username='sam', email='sam@example.com',
+                                password=hash_password('secret123'), role='student')
+            db.session.add_all([teacher_user, student_user])
+            db.session.flush()
+            teacher = Teacher(user_id=teacher_user.id, first_name='Tina')
+            student = Student(user_id=student_user.id, first_name='Sam')
+            db.session.add_all([teacher, student])
+            db.session.flush()
+            cls = Class(name='Biology', teacher_id=teacher.id)
+            student.classes.append(cls)
+            db.session.add(cls)
+            db.session.flush()
+            assignment = Assignment(title='Cells', description='Draw a cell', class_id=cls.id,
+                                    due_date=datetime.utcnow() + timedelta(days=7))
+            db.session.add(assignment)
+            db.session.flush()
+            submission = Submission(assignment_id=assignment.id, student_id=student.id,
+                                    grade=85, feedback='Good', graded_at=datetime.utcnow())
+            db.session.add(submission)
+            db.session.commit()
+            self.assignment_id = assignment.id
+            self.submission_id = submission.id
+            self.student_id = student.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email):
+        client = self.app.test_client()
+        client.post('/login', data={'email': email, 'password': 'secret123'})
+        return client
+
+    def count_queries(self, client, url, **kwargs):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            response = client.get(url, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        return response, len(statements)
+
+    def test_version_etag(self):
+        with self.app.app_context():
+            assignment = db.session.get(Assignment, self.assignment_id)
+            etag = version_etag(assignment, 1)
+            self.assertEqual(etag, version_etag(assignment, 1))
+            self.assertNotEqual(etag, version_etag(assignment, 2))
+            assignment.title = 'Organelles'
+            db.session.commit()
+            self.assertNotEqual(etag, version_etag(assignment, 1))
+
+    def test_student_endpoints_answer_304(self):
+        client = self.login('sam@example.com')
+        for url in (f'/student/assignments/{self.assignment_id}/details',
+                    f'/student/assignments/{self.assignment_id}/feedback',
+                    f'/student/assignments/{self.assignment_id}/submission'):
+            first = client.get(url)
+            self.assertEqual(first.status_code, 200, url)
+            self.assertIsNotNone(first.headers.get('ETag'), url)
+            self.assertIsNotNone(first.headers.get('Last-Modified'), url)
+            self.assertIn('no-cache', first.headers['Cache-Control'])
+
+            again, queries = self.count_queries(client, url, headers={'If-None-Match': first.headers['ETag']})
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual(again.data, b'')
+            self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+            _, full_queries = self.count_queries(client, url)
+            self.assertLess(queries, full_queries, url)
+
+    def test_grading_changes_the_etag(self):
+        client = self.login('sam@example.com')
+        url = f'/student/assignments/{self.assignment_id}/feedback'
+        etag = client.get(url).headers['ETag']
+
+        teacher = self.login('tina@example.com')
+        teacher.post(f'/teacher/submissions/{self.submission_id}/grade', data={'grade': '95', 'feedback': 'Great'})
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['grade'], 95)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_if_modified_since(self):
+        client = self.login('sam@example.com')
+        url = f'/student/assignments/{self.assignment_id}/submission'
+        last_modified = client.get(url).headers['Last-Modified']
+        self.assertEqual(client.get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        self.assertEqual(client.get(url, headers={'If-Modified-Since': 'Thu, 01 Jan 1970 00:00:00 GMT'})
+                         .status_code, 200)
+
+    def test_export_grades(self):
+        client = self.login('tina@example.com')
+        first = client.get('/teacher/export_grades')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        self.assertEqual(client.get('/teacher/export_grades', headers={'If-None-Match': etag}).status_code, 304)
+
+        with self.app.app_context():
+            db.session.get(Student, self.student_id).last_name = 'Smith'
+            db.session.commit()
+        changed = client.get('/teacher/export_grades', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.get_json()['data'][0]['student'], 'Sam Smith')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils import fragments
+from utils.fragments import MemoryStore, fragment_key
+from utils.passwords import hash_password
+
+
+TEMPLATE = "{% cache 'roster', cls %}{{ load() }}{% endcache %}"
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='tina', email='tina@example.com',
+                        password=hash_password('secret123'), role='teacher')
+            pupil = User(username='sam', email='sam@example.com',
+                         password=hash_password('secret123'), role='student')
+            db.session.add_all([user, pupil])
+            db.session.flush()
+            teacher = Teacher(user_id=user.id, first_name='Tina')
+            student = Student(user_id=pupil.id, first_name='Sam')
+            db.session.add_all([teacher, student])
+            db.session.flush()
+            cls = Class(name='Biology', teacher_id=teacher.id)
+            db.session.add(cls)
+            db.session.flush()
+            assignment = Assignment(title='Cells', description='Draw a cell', class_id=cls.id)
+            db.session.add(assignment)
+            db.session.commit()
+            self.class_id = cls.id
+            self.student_id = student.id
+            self.assignment_id = assignment.id
+        self.renders = 0
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def load(self):
+        self.renders += 1
+        return f'render {self.renders}'
+
+    def render(self):
+        with self.app.app_context():
+            cls = db.session.get(Class, self.class_id)
+            return self.app.jinja_env.from_string(TEMPLATE).render(cls=cls, load=self.load)
+
+    def version(self, model, entity_id):
+        with self.app.app_context():
+            return db.session.get(model, entity_id).version
+
+    def test_fragment_key(self):
+        with self.app.app_context():
+            cls = db.session.get(Class, self.class_id)
+            self.assertEqual(fragment_key('roster', [cls, 'week', 3], 'teacher'),
+                             f'roster:classes/{cls.id}@{cls.version}:week:3:teacher')
+            self.assertEqual(fragment_key('roster', [], None), 'roster:anonymous')
+
+    def test_cached_until_version_changes(self):
+        self.assertEqual(self.render(), 'render 1')
+        self.assertEqual(self.render(), 'render 1')
+
+        with self.app.app_context():
+            db.session.get(Class, self.class_id).description = 'Updated'
+            db.session.commit()
+        self.assertEqual(self.render(), 'render 2')
+        self.assertEqual(self.render(), 'render 2')
+
+    def test_cached_html_is_not_escaped_twice(self):
+        self.load = lambda: '<b>bold</b>'
+        template = "{% cache 'bold', 1 %}<i>{{ load() }}</i>{% endcache %}"
+        with self.app.app_context():
+            for _ in range(2):
+                html = self.app.jinja_env.from_string(template).render(load=self.load)
+                self.assertEqual(html, '<i>&lt;b&gt;bold&lt;/b&gt;</i>')
+
+    def test_role_is_part_of_the_key(self):
+        template = "{% cache 'role', 1 %}{{ load() }}{% endcache %}"
+        client = self.app.test_client()
+        with self.app.app_context():
+            with self.app.test_request_context():
+                self.app.jinja_env.from_string(template).render(load=self.load)
+            client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+            with client:
+                client.get('/')
+                self.app.jinja_env.from_string(template).render(load=self.load)
+        self.assertEqual(self.renders, 2)
+
+    def test_enrolment_bumps_class(self):
+        before = self.version(Class, self.class_id)
+        with self.app.app_context():
+            student = db.session.get(Student, self.student_id)
+            student.classes.append(db.session.get(Class, self.class_id))
+            db.session.commit()
+        self.assertEqual(self.version(Class, self.class_id), before + 1)
+
+        with self.app.app_context():
+            db.session.get(Student, self.student_id).last_name = 'Smith'
+            db.session.commit()
+        self.assertEqual(self.version(Class, self.class_id), before + 2)
+
+    def test_submission_and_grade_bump_assignment_and_class(self):
+        class_before = self.version(Class, self.class_id)
+        assignment_before = self.version(Assignment, self.assignment_id)
+        with self.app.app_context():
+            submission = Submission(assignment_id=self.assignment_id, student_id=self.student_id)
+            db.session.add(submission)
+            db.session.commit()
+            submission.grade = 90
+            db.session.commit()
+        self.assertEqual(self.version(Class, self.class_id), class_before + 2)
+        self.assertEqual(self.version(Assignment, self.assignment_id), assignment_before + 2)
+
+    def test_new_assignment_bumps_class(self):
+        before = self.version(Class, self.class_id)
+        with self.app.app_context():
+            db.session.add(Assignment(title='Mitosis', description='Phases', class_id=self.class_id))
+            db.session.commit()
+        self.assertEqual(self.version(Class, self.class_id), before + 1)
+
+    def test_disabled_renders_every_time(self):
+        self.app.extensions.pop('fragment_cache')
+        self.render()
+        self.render()
+        self.assertEqual(self.renders, 2)
+
+    def test_store_selection(self):
+        self.app.config['FRAGMENT_CACHE_BACKEND'] = 'memcached'
+        with self.assertRaises(ValueError):
+            fragments._create_store(self.app)
+        if fragments.redis is None:
+            self.app.config['FRAGMENT_CACHE_BACKEND'] = 'redis'
+            self.assertIsInstance(fragments._create_store(self.app), MemoryStore)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils.gradebook import grade_page, grade_summary
+from utils.passwords import hash_password
+
+BASE_TIME = datetime(2025, 3, 1, 9, 0)
+
+
+class GradebookTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='tina', email='tina@example.com',
+                        password=hash_password('secret123'), role='teacher')
+            other_user = User(username='olga', email='olga@example.com', password='x', role='teacher')
+            db.session.add_all([user, other_user])
+            db.session.flush()
+            teacher = Teacher(user_id=user.id)
+            other_teacher = Teacher(user_id=other_user.id)
+            db.session.add_all([teacher, other_teacher])
+            db.session.flush()
+            self.teacher_id = teacher.id
+
+            math = Class(name='Math', teacher_id=teacher.id)
+            art = Class(name='Art', teacher_id=teacher.id)
+            other = Class(name='Other', teacher_id=other_teacher.id)
+            db.session.add_all([math, art, other])
+            db.session.flush()
+            self.math_id = math.id
+
+            assignments = []
+            for cls in (math, art, other):
+                assignment = Assignment(title=f'{cls.name} HW', description='-', class_id=cls.id)
+                db.session.add(assignment)
+                assignments.append(assignment)
+            db.session.flush()
+            self.math_hw_id = assignments[0].id
+
+            students = []
+            for i in range(10):
+                student_user = User(username=f'pupil{i}', email=f'pupil{i}@example.com', password='x', role='student')
+                db.session.add(student_user)
+                db.session.flush()
+                students.append(Student(user_id=student_user.id, first_name=f'P{i}', last_name='Young'))
+            db.session.add_all(students)
+            db.session.flush()
+
+            # 10 submissions per assignment, one per student and two per day;
+            # every other one graded
+            for assignment in assignments:
+                for day, student in enumerate(students):
+                    db.session.add(Submission(
+                        assignment_id=assignment.id, student_id=student.id,
+                        submitted_at=BASE_TIME + timedelta(days=day // 2),
+                        grade=70 + day if day % 2 == 0 else None
+                    ))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_keyset_pages_cover_every_row_once(self):
+        with self.app.app_context():
+            seen, cursor = [], None
+            while True:
+                page = grade_page(self.teacher_id, cursor=cursor, limit=3)
+                seen.extend(page['items'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+
+            self.assertEqual(len(seen), 20)
+            self.assertEqual(len({item['submission_id'] for item in seen}), 20)
+            ids = [item['submission_id'] for item in seen]
+            self.assertEqual(ids, sorted(ids, reverse=True))
+            self.assertNotIn('Other', {item['class_name'] for item in seen})
+
+    def test_filters(self):
+        with self.app.app_context():
+            math = grade_page(self.teacher_id, class_id=self.math_id)['items']
+            self.assertEqual({item['class_name'] for item in math}, {'Math'})
+            self.assertEqual(len(math), 10)
+
+            by_assignment = grade_page(self.teacher_id, assignment_id=self.math_hw_id)['items']
+            self.assertEqual([item['submission_id'] for item in by_assignment],
+                             [item['submission_id'] for item in math])
+
+            pending = grade_page(self.teacher_id, status='pending')['items']
+            self.assertEqual(len(pending), 10)
+            self.assertEqual({item['status'] for item in pending}, {'Pending'})
+
+            # Days 1 and 2 (submissions 2-5 of each assignment)
+            dated = grade_page(self.teacher_id, start=BASE_TIME + timedelta(days=1),
+                               end=BASE_TIME + timedelta(days=3))['items']
+            self.assertEqual(len(dated), 8)
+
+    def test_summary(self):
+        with self.app.app_context():
+            summary = grade_summary(self.teacher_id)
+            self.assertEqual((summary['total'], summary['graded'], summary['pending']), (20, 10, 10))
+            self.assertEqual(summary['average'], 74.0)
+            self.assertEqual(grade_summary(self.teacher_id, status='graded')['pending'], 0)
+
+    def test_resubmit_is_not_skipped_by_later_pages(self):
+        with self.app.app_context():
+            first = grade_page(self.teacher_id, limit=10)
+            oldest = db.session.get(Submission, min(item['submission_id'] for item in first['items']) - 1)
+            oldest.submitted_at = BASE_TIME + timedelta(days=30)
+            db.session.commit()
+
+            rest = grade_page(self.teacher_id, cursor=first['next_cursor'], limit=10)['items']
+            self.assertIn(oldest.id, [item['submission_id'] for item in rest])
+
+    def test_summary_cached_until_a_class_changes(self):
+        with self.app.app_context():
+            self.assertEqual(grade_summary(self.teacher_id)['graded'], 10)
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                grade_summary(self.teacher_id)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            # Only the class versions are read
+            self.assertEqual(len(statements), 1)
+
+            pending = Submission.query.join(Assignment).filter(
+                Assignment.class_id == self.math_id, Submission.grade.is_(None)).first()
+            pending.grade = 100
+            db.session.commit()
+            summary = grade_summary(self.teacher_id)
+            self.assertEqual((summary['graded'], summary['pending']), (11, 9))
+
+    def test_malformed_cursor(self):
+        with self.app.app_context():
+            with self.assertRaises(ValueError):
+                grade_page(self.teacher_id, cursor='not-a-cursor')
+
+    def test_grades_api(self):
+        client = self.app.test_client()
+        client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+
+        first = client.get('/teacher/api/grades?limit=15').get_json()
+        self.assertTrue(first['success'])
+        self.assertEqual(len(first['items']), 15)
+        second = client.get('/teacher/api/grades', query_string={'limit': 15, 'cursor': first['next_cursor']}).get_json()
+        self.assertEqual(len(second['items']), 5)
+        self.assertIsNone(second['next_cursor'])
+
+        graded = client.get('/teacher/api/grades?status=graded&to=2025-03-01').get_json()
+        self.assertEqual(len(graded['items']), 2)
+
+        self.assertEqual(client.get('/teacher/api/grades?cursor=junk').status_code, 400)
+        self.assertEqual(client.get('/teacher/grades?limit=5').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
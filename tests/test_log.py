@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from flask import current_app
+from flask_login import current_user
+from app import create_app, db
+from models.user import User
+from utils import log
+from utils.passwords import hash_password
+
+
+class StructuredLoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.directory, 'app.log')
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+            'LOG_FILE': self.log_file
+        })
+        self.app.config['TESTING'] = True
+
+        @self.app.route('/boom')
+        def boom():
+            # Loads the user, whose id is then logged
+            current_user.is_authenticated
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                current_app.logger.exception('Could not divide')
+            return 'ok'
+
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(User(username='tina', email='tina@example.com',
+                                password=hash_password('secret123'), role='teacher'))
+            db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        log.shutdown()
+        shutil.rmtree(self.directory)
+
+    def records(self):
+        # Stopping the listener writes out everything still queued
+        log.shutdown()
+        with open(self.log_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_requests_are_logged_with_their_context(self):
+        self.client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        response = self.client.get('/boom', headers={'X-Request-ID': 'abc-123'})
+        self.assertEqual(response.headers['X-Request-ID'], 'abc-123')
+        generated = self.client.get('/', headers={'X-Request-ID': 'not valid!'}).headers['X-Request-ID']
+        self.assertRegex(generated, r'^[0-9a-f]{32}$')
+
+        records = self.records()
+        self.assertEqual(records[0]['message'], 'Application startup')
+        self.assertNotIn('request_id', records[0])
+
+        error = next(r for r in records if r['message'] == 'Could not divide')
+        self.assertEqual(error['level'], 'ERROR')
+        self.assertEqual((error['request_id'], error['path'], error['endpoint']), ('abc-123', '/boom', 'boom'))
+        self.assertIn('ZeroDivisionError', error['exc'])
+
+        access = [r for r in records if r['logger'] == 'access']
+        self.assertEqual([r['message'].split(' ')[:3] for r in access],
+                         [['POST', '/login', '302'], ['GET', '/boom', '200'], ['GET', '/', '200']])
+        self.assertEqual(access[1]['request_id'], 'abc-123')
+        self.assertEqual(access[1]['user_id'], '1')
+        self.assertIsInstance(access[1]['duration_ms'], float)
+        self.assertGreater(access[0]['queries'], 0)
+        self.assertEqual(access[2]['request_id'], generated)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = log.DroppingQueueHandler(queue.Queue(1))
+        record = logging.LogRecord('utils.test', logging.INFO, __file__, 1, 'hello %s', ('there',), None)
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+        queued = handler.queue.get_nowait()
+        self.assertEqual((queued.msg, queued.args), ('hello there', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,36 @@
-from main import create_app, db
-from models.models import User
-from werkzeug.security import generate_password_hash
-
-app = create_app()
-
-# Create test user
-with app.app_context():
-    db.create_all()
-    if not User.query.filter_by(username="testuser").first():
-        test_user = User(username="testuser", password=generate_password_hash(
-            "testpass"), role="student")
-        db.session.add(test_user)
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+
+from app import create_app
+from extensions import db
+from models.user import User
+from utils.passwords import hash_password
+
+
+@pytest.fixture
+def client(app_config):
+    app = create_app(app_config)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='testuser', email='testuser@example.com',
+                            password=hash_password('testpass'), role='student'))
         db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def test_correct_login_redirects_to_dashboard(client):
+    response = client.post('/login', data={'email': 'testuser@example.com', 'password': 'testpass'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/student/dashboard')
+
 
-# Testing login route
-with app.test_client() as client:
-    # Correct login
-    response = client.post(
-        "/login", data={"username": "testuser", "password": "testpass"}, follow_redirects=True)
-    print("Status code:", response.status_code)
-    print("Response data:", response.data.decode())
-
-    # Wrong login
-    response = client.post(
-        "/login", data={"username": "testuser", "password": "wrongpass"}, follow_redirects=True)
-    print("Status code:", response.status_code)
-    print("Response data:", response.data.decode())
+def test_wrong_password_is_refused(client):
+    response = client.post('/login', data={'email': 'testuser@example.com', 'password': 'wrongpass'})
+    assert response.status_code == 200
+    assert b'Invalid' in response.data
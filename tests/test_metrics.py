@@ -0,0 +1,224 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.assignment import Assignment
+from models.class_model import Class
+from models.student import Student
+from models.submission import Submission
+from models.teacher import Teacher
+from models.user import User
+from utils.metrics import MultiprocessStore, merge, render
+from utils.passwords import hash_password
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(text, line_start):
+    """Value of the first exposition line starting with line_start"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class MetricsEndpointTestCase(unittest.TestCase):
+    def create_app(self, **overrides):
+        app = create_app(dict({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        }, **overrides))
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            for name, role in (('ada', 'admin'), ('tina', 'teacher')):
+                db.session.add(User(username=name, email=f'{name}@example.com',
+                                    password=hash_password('secret123'), role=role))
+            db.session.commit()
+        self.addCleanup(self.drop, app)
+        return app
+
+    def drop(self, app):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_request_and_login_metrics(self):
+        app = self.create_app(METRICS_ALLOW_FROM='127.0.0.1')
+        client = app.test_client()
+        client.post('/login', data={'email': 'tina@example.com', 'password': 'wrong'})
+        client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        client.post('/student/assignments/submit', data={'file': (io.BytesIO(b'x' * 1000), 'a.txt')},
+                    content_type='multipart/form-data')
+
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertEqual(sample(text, 'auth_logins_total{result="failure"}'), 1)
+        self.assertEqual(sample(text, 'auth_logins_total{result="success"}'), 1)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count{blueprint="auth_bp",endpoint="auth_bp.login"}'), 2)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_bucket{blueprint="auth_bp",endpoint="auth_bp.login",le="+Inf"}'), 2)
+        self.assertEqual(sample(text, 'http_requests_total{endpoint="auth_bp.login",method="POST",status="302"}'), 1)
+        self.assertGreater(sample(text, 'http_upload_bytes_total{endpoint="student_bp.submit_assignment"}'), 1000)
+        # Only the scrape itself is being served
+        self.assertEqual(sample(text, 'http_requests_in_flight '), 1)
+        self.assertIn('db_queries_per_request_count{blueprint="auth_bp",endpoint="auth_bp.login"} 2', text)
+
+    def test_access_outside_allowed_networks_needs_an_admin(self):
+        app = self.create_app(METRICS_ALLOW_FROM='10.0.0.0/8')
+        self.assertEqual(app.test_client().get('/metrics').status_code, 403)
+        self.assertEqual(app.test_client().get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code, 200)
+
+        teacher = app.test_client()
+        teacher.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        self.assertEqual(teacher.get('/metrics').status_code, 403)
+        admin = app.test_client()
+        admin.post('/login', data={'email': 'ada@example.com', 'password': 'secret123'})
+        self.assertEqual(admin.get('/metrics').status_code, 200)
+
+    def test_default_access_is_admin_or_token(self):
+        app = self.create_app(METRICS_TOKEN='s3cret')
+        # Loopback is not trusted by default: behind a proxy on the same host
+        # every client would look like 127.0.0.1
+        self.assertEqual(app.test_client().get('/metrics').status_code, 403)
+        self.assertEqual(app.test_client().get(
+            '/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(app.test_client().get(
+            '/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+        admin = app.test_client()
+        admin.post('/login', data={'email': 'ada@example.com', 'password': 'secret123'})
+        self.assertEqual(admin.get('/metrics').status_code, 200)
+
+    def test_downloads_through_both_views_are_counted(self):
+        app = self.create_app(METRICS_TOKEN='s3cret')
+        with app.app_context():
+            teacher_user = User.query.filter_by(username='tina').first()
+            teacher = Teacher(user_id=teacher_user.id)
+            student_user = User(username='sam', email='sam@example.com',
+                                password=hash_password('secret123'), role='student')
+            db.session.add_all([teacher, student_user])
+            db.session.flush()
+            cls = Class(name='Math', teacher_id=teacher.id)
+            student = Student(user_id=student_user.id)
+            db.session.add_all([cls, student])
+            db.session.flush()
+            student.classes.append(cls)
+            assignment = Assignment(title='HW', description='-', class_id=cls.id, teacher_id=teacher.id)
+            db.session.add(assignment)
+            db.session.flush()
+
+            # Both views only serve files from inside the project
+            assignment_folder = os.path.join(ROOT, 'static', 'uploads', 'assignments', str(assignment.id))
+            self.assertFalse(os.path.exists(assignment_folder))
+            os.makedirs(assignment_folder)
+            self.addCleanup(shutil.rmtree, assignment_folder, True)
+            with open(os.path.join(assignment_folder, 'notes.txt'), 'wb') as f:
+                f.write(b'n' * 300)
+            submission_folder = tempfile.mkdtemp(dir=ROOT)
+            self.addCleanup(shutil.rmtree, submission_folder, True)
+            with open(os.path.join(submission_folder, 'work.txt'), 'wb') as f:
+                f.write(b'w' * 500)
+            submission = Submission(assignment_id=assignment.id, student_id=student.id,
+                                    file_path=os.path.join(submission_folder, 'work.txt'))
+            db.session.add(submission)
+            db.session.commit()
+            assignment_id, submission_id = assignment.id, submission.id
+
+        teacher_client = app.test_client()
+        teacher_client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        response = teacher_client.get(f'/teacher/submissions/{submission_id}/download')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        student_client = app.test_client()
+        student_client.post('/login', data={'email': 'sam@example.com', 'password': 'secret123'})
+        response = student_client.get(f'/student/assignments/{assignment_id}/download/notes.txt')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        student_client.get('/static/css/style.css').close()
+
+        text = app.test_client().get('/metrics', headers={'Authorization': 'Bearer s3cret'}).get_data(as_text=True)
+        self.assertEqual(sample(text, 'http_download_bytes_total{endpoint="teacher_bp.download_submission"}'), 500)
+        self.assertEqual(sample(text, 'http_download_bytes_total{endpoint="student_bp.download_assignment_file"}'), 300)
+        self.assertIsNone(sample(text, 'http_download_bytes_total{endpoint="static"}'))
+
+    def test_disabled(self):
+        app = self.create_app(METRICS_ENABLED=False)
+        self.assertEqual(app.test_client().get('/metrics').status_code, 404)
+
+
+class MultiprocessTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def snapshot(self, pid, requests, in_flight):
+        return {
+            'pid': pid,
+            'counters': [['http_requests_total', {'endpoint': 'home', 'method': 'GET', 'status': '200'}, requests]],
+            'gauges': [['http_requests_in_flight', {}, in_flight]],
+            'histograms': [['http_request_duration_seconds', {'endpoint': 'home'},
+                            {'buckets': [[0.1, requests], [None, requests]], 'count': requests, 'sum': 0.01}]],
+        }
+
+    def test_workers_are_added_up_and_exited_gauges_dropped(self):
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        store = MultiprocessStore(self.directory)
+        store.write(self.snapshot(os.getppid(), 3, 2))
+        store.write(self.snapshot(exited.pid, 4, 5))
+        with open(os.path.join(self.directory, 'metrics-garbage.json'), 'w') as f:
+            f.write('{')
+
+        own = self.snapshot(os.getpid(), 1, 1)
+        store.write(own)
+        others = store.read_others(os.getpid())
+        self.assertEqual(len(others), 2)
+        text = render(merge([own] + others))
+
+        self.assertEqual(sample(text, 'http_requests_total{'), 8)
+        self.assertEqual(sample(text, 'http_requests_in_flight'), 3)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_bucket{endpoint="home",le="0.1"}'), 8)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count{'), 8)
+        with open(store.path(os.getpid())) as f:
+            self.assertEqual(json.load(f), own)
+
+    def test_app_writes_its_snapshot(self):
+        app = create_app({'ACTIVITY_LOG_ASYNC': False, 'TOUCH_ASYNC': False, 'SESSION_PURGE_INTERVAL': 0,
+                          'METRICS_MULTIPROC_DIR': self.directory, 'METRICS_WRITE_INTERVAL': 0,
+                          'METRICS_ALLOW_FROM': '10.0.0.0/8'})
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        self.addCleanup(self.drop, app)
+        MultiprocessStore(self.directory).write(self.snapshot(os.getppid(), 5, 0))
+
+        app.test_client().get('/')
+        with open(MultiprocessStore(self.directory).path(os.getpid())) as f:
+            written = json.load(f)
+        self.assertIn(['http_requests_total', {'endpoint': 'home', 'method': 'GET', 'status': '200'}, 1],
+                      written['counters'])
+        text = app.test_client().get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).get_data(as_text=True)
+        self.assertEqual(sample(text, 'http_requests_total{endpoint="home"'), 6)
+
+    def drop(self, app):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import inspect
+from app import create_app, db
+from models.assignment import Assignment
+from models.class_model import Class
+from models.submission import Submission
+from models.submission_version import SubmissionVersion
+from models.user import User
+from utils.submissions import StoredFile, SubmissionRejected, save_submission
+
+# Tables as the app created them before the version columns and the unique
+# submissions index existed
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    email VARCHAR(120) NOT NULL UNIQUE,
+    password VARCHAR(200) NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    created_at DATETIME NOT NULL,
+    last_login DATETIME
+);
+CREATE TABLE teachers (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    department VARCHAR(100),
+    subject VARCHAR(100),
+    phone VARCHAR(20),
+    bio TEXT,
+    avatar_path VARCHAR(255),
+    created_at DATETIME NOT NULL
+);
+CREATE TABLE classes (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    class_code VARCHAR(6) NOT NULL UNIQUE,
+    teacher_id INTEGER REFERENCES teachers (id) ON DELETE SET NULL,
+    created_at DATETIME NOT NULL
+);
+CREATE TABLE assignments (
+    id INTEGER NOT NULL PRIMARY KEY,
+    title VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    due_date DATETIME NOT NULL,
+    status VARCHAR(20),
+    file_path VARCHAR(200),
+    created_at DATETIME NOT NULL,
+    class_id INTEGER NOT NULL REFERENCES classes (id) ON DELETE CASCADE,
+    teacher_id INTEGER REFERENCES teachers (id) ON DELETE SET NULL
+);
+CREATE TABLE students (
+    id INTEGER NOT NULL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    major VARCHAR(100),
+    year VARCHAR(10),
+    section VARCHAR(20),
+    created_at DATETIME NOT NULL
+);
+CREATE TABLE submissions (
+    id INTEGER NOT NULL PRIMARY KEY,
+    assignment_id INTEGER NOT NULL REFERENCES assignments (id) ON DELETE CASCADE,
+    student_id INTEGER NOT NULL REFERENCES students (id) ON DELETE CASCADE,
+    file_path VARCHAR(200),
+    comments TEXT,
+    grade FLOAT,
+    feedback TEXT,
+    submitted_at DATETIME NOT NULL,
+    graded_at DATETIME
+);
+INSERT INTO users VALUES (1, 'tina', 'tina@example.com', 'x', 'teacher', 'active', '2025-09-01 08:00:00', NULL);
+INSERT INTO teachers (id, user_id, first_name, created_at) VALUES (1, 1, 'Tina', '2025-09-01 08:00:00');
+INSERT INTO classes VALUES (1, 'Biology', NULL, 'ABC123', 1, '2025-09-02 08:00:00');
+INSERT INTO assignments VALUES (1, 'Cells', 'Draw a cell', '2025-10-01 08:00:00', 'pending', NULL,
+                                '2025-09-03 08:00:00', 1, 1);
+INSERT INTO users VALUES (2, 'sam', 'sam@example.com', 'x', 'student', 'active', '2025-09-01 08:00:00', NULL);
+INSERT INTO users VALUES (3, 'ana', 'ana@example.com', 'x', 'student', 'active', '2025-09-01 08:00:00', NULL);
+INSERT INTO students (id, user_id, first_name, created_at) VALUES (1, 2, 'Sam', '2025-09-01 08:00:00');
+INSERT INTO students (id, user_id, first_name, created_at) VALUES (2, 3, 'Ana', '2025-09-01 08:00:00');
+-- Sam submitted three times and the second one was graded; Ana twice, ungraded
+INSERT INTO submissions VALUES (1, 1, 1, 'a1.txt', NULL, NULL, NULL, '2025-09-10 08:00:00', NULL);
+INSERT INTO submissions VALUES (2, 1, 1, 'a2.txt', NULL, 80, 'Good', '2025-09-11 08:00:00', '2025-09-12 08:00:00');
+INSERT INTO submissions VALUES (3, 1, 1, 'a3.txt', NULL, NULL, NULL, '2025-09-13 08:00:00', NULL);
+INSERT INTO submissions VALUES (4, 1, 2, 'b1.txt', NULL, NULL, NULL, '2025-09-10 08:00:00', NULL);
+INSERT INTO submissions VALUES (5, 1, 2, 'b2.txt', NULL, NULL, NULL, '2025-09-11 08:00:00', NULL);
+"""
+
+
+class MigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'database.db')
+        conn = sqlite3.connect(self.path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def start_app(self):
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}',
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.addCleanup(lambda: self.dispose(app))
+        return app
+
+    def dispose(self, app):
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_startup_keeps_data_and_adds_version_columns(self):
+        app = self.start_app()
+        with app.app_context():
+            self.assertEqual(User.query.count(), 3)
+            columns = {column['name'] for column in inspect(db.engine).get_columns('classes')}
+            self.assertTrue({'version', 'updated_at'} <= columns)
+
+            cls = db.session.get(Class, 1)
+            self.assertEqual(cls.version, 1)
+            self.assertEqual(cls.updated_at, cls.created_at)
+            assignment = db.session.get(Assignment, 1)
+            self.assertEqual(assignment.version, 1)
+            self.assertEqual(assignment.updated_at, assignment.created_at)
+
+            # Counters work on migrated rows
+            cls.description = 'Updated'
+            db.session.commit()
+            self.assertEqual(db.session.get(Class, 1).version, 2)
+
+    def test_duplicate_submissions_merged_before_unique_index(self):
+        with self.assertLogs('app', 'INFO') as logs:
+            app = self.start_app()
+        merges = [line for line in logs.output if 'merged submissions' in line]
+        self.assertEqual(len(merges), 2)
+        self.assertIn('merged submissions [1, 3] into submission 2', merges[0])
+        with app.app_context():
+            kept = {s.student_id: s for s in Submission.query.order_by(Submission.id)}
+            self.assertEqual(Submission.query.count(), 2)
+            # The graded submission wins over later ones, otherwise the latest
+            self.assertEqual(kept[1].id, 2)
+            self.assertEqual(kept[2].id, 5)
+            self.assertEqual(kept[1].updated_at, kept[1].graded_at)
+            self.assertEqual(kept[2].updated_at, kept[2].submitted_at)
+
+            # Merged rows are kept as older versions, oldest first
+            def history(submission_id):
+                versions = SubmissionVersion.query.filter_by(submission_id=submission_id).order_by(
+                    SubmissionVersion.version)
+                return [(v.version, v.file_path, v.is_latest) for v in versions]
+            self.assertEqual(history(2), [(1, 'a1.txt', False), (2, 'a3.txt', False), (3, 'a2.txt', True)])
+            self.assertEqual(history(5), [(1, 'b1.txt', False), (2, 'b2.txt', True)])
+            self.assertEqual((kept[1].version, kept[2].version), (3, 2))
+
+            indexes = {index['name']: index for index in inspect(db.engine).get_indexes('submissions')}
+            self.assertTrue(indexes['uq_submissions_assignment_id_student_id']['unique'])
+            self.assertIn('ix_submissions_assignment_id_grade', indexes)
+
+            # The upsert works against the migrated table
+            stored = StoredFile('b3.txt', 'b3.txt', 3, 'text/plain', 'f' * 64)
+            self.assertEqual(save_submission(1, 2, stored, policy='replace'), (5, 3))
+            with self.assertRaises(SubmissionRejected):
+                save_submission(1, 1, stored, policy='replace')
+
+    def test_migration_is_idempotent(self):
+        self.start_app()
+        app = self.start_app()
+        with app.app_context():
+            self.assertEqual(User.query.count(), 3)
+            self.assertEqual(db.session.get(Class, 1).name, 'Biology')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from utils.passwords import hash_password, verify_password, needs_rehash, normalize_method
+from utils.hash_pool import HashPool, HashPoolBusy
+
+
+class PasswordPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_normalize_method(self):
+        self.assertEqual(normalize_method('scrypt'), 'scrypt:32768:8:1')
+        self.assertEqual(normalize_method('pbkdf2:sha256:1000'), 'pbkdf2:sha256:1000')
+        self.assertEqual(normalize_method('scrypt-interactive'), 'scrypt:16384:8:1')
+        with self.assertRaises(ValueError):
+            normalize_method('md5')
+
+    def test_hash_uses_configured_policy(self):
+        pwhash = hash_password('secret123')
+        self.assertTrue(pwhash.startswith('scrypt:16384:8:1$'))
+        self.assertTrue(verify_password(pwhash, 'secret123'))
+        self.assertFalse(needs_rehash(pwhash))
+        self.assertTrue(needs_rehash(hash_password('secret123', method='pbkdf2:sha256:1000')))
+
+    def test_login_upgrades_old_hash(self):
+        old_hash = hash_password('secret123', method='pbkdf2:sha256:1000')
+        user = User(username='old', email='old@example.com', password=old_hash)
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/login', data={'email': 'old@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(User, user.id).password, old_hash)
+
+        response = self.client.post('/login', data={'email': 'old@example.com', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 302)
+        db.session.expire_all()
+        new_hash = db.session.get(User, user.id).password
+        self.assertTrue(new_hash.startswith('scrypt:16384:8:1$'))
+        self.assertTrue(verify_password(new_hash, 'secret123'))
+
+
+class HashPoolTestCase(unittest.TestCase):
+    def test_rejects_when_queue_is_full(self):
+        pool = HashPool(workers=1, max_pending=0, timeout=5)
+        try:
+            worker = threading.Thread(target=pool.run, args=(time.sleep, 0.5))
+            worker.start()
+            time.sleep(0.1)
+            with self.assertRaises(HashPoolBusy):
+                pool.run(time.sleep, 0)
+            self.assertEqual(pool.rejected, 1)
+            worker.join()
+            # Capacity is released once the running job finishes
+            self.assertIsNone(pool.run(time.sleep, 0))
+        finally:
+            pool.shutdown()
+
+    def test_login_through_pool_and_503_on_timeout(self):
+        app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+            'PASSWORD_HASH_WORKERS': 1,
+            'PASSWORD_HASH_RETRY_AFTER': 3
+        })
+        pool = app.extensions['hash_pool']
+        try:
+            with app.app_context():
+                db.create_all()
+                db.session.add(User(username='p', email='p@example.com', password=hash_password('secret123')))
+                db.session.commit()
+
+            client = app.test_client()
+            response = client.post('/login', data={'email': 'p@example.com', 'password': 'secret123'})
+            self.assertEqual(response.status_code, 302)
+
+            pool.timeout = 0.001
+            response = client.post('/login', data={'email': 'p@example.com', 'password': 'secret123'},
+                                   headers={'Accept': 'text/html'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '3')
+        finally:
+            pool.shutdown()
+            with app.app_context():
+                db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
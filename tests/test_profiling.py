@@ -0,0 +1,127 @@
+import os
+import re
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.teacher import Teacher
+from models.class_model import Class
+from utils.passwords import hash_password
+from utils.profiling import Histogram, endpoint_stats
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5, 10))
+        for value in (0, 1, 3, 7, 7, 50):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['buckets'], [[1, 2], [5, 3], [10, 5], [None, 6]])
+        self.assertEqual((snapshot['count'], snapshot['sum']), (6, 68))
+        self.assertEqual(histogram.quantile(0.5), 5)
+        self.assertEqual(histogram.quantile(0.8), 10)
+        self.assertIsNone(histogram.quantile(1.0))
+        self.assertIsNone(Histogram((1,)).quantile(0.5))
+
+
+class QueryProfilerTestCase(unittest.TestCase):
+    def create_app(self, **overrides):
+        app = create_app(dict({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+            'PROFILING_SERVER_TIMING': True,
+            'PROFILING_SLOW_QUERY_MS': 0
+        }, **overrides))
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            for name, role in (('tina', 'teacher'), ('ada', 'admin')):
+                db.session.add(User(username=name, email=f'{name}@example.com',
+                                    password=hash_password('secret123'), role=role))
+            db.session.flush()
+            teacher = Teacher(user_id=User.query.filter_by(username='tina').one().id)
+            db.session.add(teacher)
+            db.session.flush()
+            db.session.add_all([Class(name=f'C{i}', teacher_id=teacher.id) for i in range(3)])
+            db.session.commit()
+        self.addCleanup(self.drop, app)
+        return app
+
+    def drop(self, app):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, app, email):
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': 'secret123'})
+        client.get('/teacher/dashboard')
+        return client
+
+    def count_queries(self, app):
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        self.addCleanup(event.remove, engine, 'before_cursor_execute', listener)
+        return statements
+
+    def test_records_queries_per_endpoint(self):
+        app = self.create_app()
+        client = self.login(app, 'tina@example.com')
+        app.extensions['profiler'].reset()
+        statements = self.count_queries(app)
+
+        response = client.get('/teacher/dashboard')
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers['Server-Timing']
+        match = re.match(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+$', timing)
+        self.assertIsNotNone(match, timing)
+
+        with app.app_context():
+            # Work outside a request is not attributed to any endpoint
+            User.query.count()
+            stats = endpoint_stats()
+        self.assertEqual(list(stats), ['teacher_bp.dashboard'])
+        dashboard = stats['teacher_bp.dashboard']
+        self.assertEqual(dashboard['blueprint'], 'teacher_bp')
+        self.assertEqual(dashboard['requests'], 1)
+        # Every statement of the request, including those after the header was set
+        self.assertEqual(dashboard['queries']['sum'], len(statements) - 1)
+        self.assertGreaterEqual(len(statements) - 1, int(match.group(1)))
+        self.assertEqual(dashboard['max_queries'], len(statements) - 1)
+        self.assertGreater(dashboard['rows'], 0)
+        self.assertEqual(dashboard['total_ms']['count'], 1)
+
+    def test_slow_queries_are_logged_with_their_route(self):
+        app = self.create_app(PROFILING_SLOW_QUERY_MS=0.000001)
+        client = app.test_client()
+        with self.assertLogs('utils.profiling', level='WARNING') as logs:
+            client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        self.assertIn('POST /login [auth_bp.login]: SELECT', logs.output[0])
+
+    def test_admin_api(self):
+        app = self.create_app()
+        client = self.login(app, 'ada@example.com')
+        body = client.get('/admin/api/profiling').get_json()
+        self.assertTrue(body['enabled'])
+        self.assertIn('auth_bp.login', body['endpoints'])
+
+    def test_disabled(self):
+        app = self.create_app(PROFILING_ENABLED=False)
+        client = self.login(app, 'tina@example.com')
+        self.assertNotIn('Server-Timing', client.get('/teacher/dashboard').headers)
+        with app.app_context():
+            self.assertIsNone(endpoint_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
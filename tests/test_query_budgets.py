@@ -0,0 +1,121 @@
+"""
+Query budgets of every student, teacher and admin view
+
+Each view is requested at every scale in BUDGET_SCALES (see conftest.py)
+and must stay within its budget at all of them, with a query count that
+does not grow with the number of classes, students or assignments. A view
+that starts looping over a relationship fails here with the repeated
+statement in the message.
+
+Views are requested in the order of BUDGETS against apps shared by the
+whole module, so views that change data come after the ones that only read
+it, and deletions come last.
+"""
+import io
+from collections import namedtuple
+
+import pytest
+
+
+Budget = namedtuple('Budget', 'endpoint role method url max_queries data max_ms',
+                    defaults=(None, None))
+
+SUBMISSION = b'query budget essay'
+
+BUDGETS = [
+    # Student
+    Budget('student_bp.dashboard', 'student', 'GET', '/student/dashboard', 8),
+    Budget('student_bp.assignments', 'student', 'GET', '/student/assignments', 7),
+    Budget('student_bp.assignment_details', 'student', 'GET', '/student/assignments/{assignment_id}/details', 6),
+    Budget('student_bp.download_assignment_file', 'student', 'GET',
+           '/student/assignments/{assignment_id}/download/brief.pdf', 5),
+    Budget('student_bp.assignment_feedback', 'student', 'GET', '/student/assignments/{graded_assignment_id}/feedback', 7),
+    Budget('student_bp.assignment_submission', 'student', 'GET',
+           '/student/assignments/{assignment_id}/submission', 6),
+    Budget('student_bp.grades', 'student', 'GET', '/student/grades', 7),
+    Budget('student_bp.profile', 'student', 'GET', '/student/profile', 8),
+    Budget('student_bp.classes', 'student', 'GET', '/student/classes', 7),
+    Budget('student_bp.classes_api', 'student', 'GET', '/student/api/classes', 5),
+    Budget('student_bp.join_class_page', 'student', 'GET', '/student/join', 4),
+    Budget('student_bp.join_class_by_code', 'student', 'GET', '/student/join/{open_class_code}', 9),
+
+    # Teacher
+    Budget('teacher_bp.dashboard', 'teacher', 'GET', '/teacher/dashboard', 9),
+    Budget('teacher_bp.students', 'teacher', 'GET', '/teacher/students', 5),
+    Budget('teacher_bp.classes', 'teacher', 'GET', '/teacher/classes', 6),
+    Budget('teacher_bp.assignments', 'teacher', 'GET', '/teacher/assignments', 6),
+    Budget('teacher_bp.grades', 'teacher', 'GET', '/teacher/grades', 7),
+    Budget('teacher_bp.grades_api', 'teacher', 'GET', '/teacher/api/grades', 4),
+    Budget('teacher_bp.profile', 'teacher', 'GET', '/teacher/profile', 3),
+    Budget('teacher_bp.view_student', 'teacher', 'GET', '/teacher/students/{student_id}', 6),
+    Budget('teacher_bp.export_grades', 'teacher', 'GET', '/teacher/export_grades', 5),
+    Budget('teacher_bp.export_students', 'teacher', 'GET', '/teacher/export_students', 5),
+    Budget('teacher_bp.view_class', 'teacher', 'GET', '/teacher/classes/{class_id}', 8),
+    Budget('teacher_bp.view_assignment', 'teacher', 'GET', '/teacher/assignments/{assignment_id}', 6),
+    Budget('teacher_bp.download_submission', 'teacher', 'GET', '/teacher/submissions/{submission_id}/download', 7),
+    Budget('teacher_bp.submission_versions', 'teacher', 'GET', '/teacher/submissions/{submission_id}/versions', 5),
+    Budget('teacher_bp.grade_assignment', 'teacher', 'GET', '/teacher/assignments/{assignment_id}/grade', 5),
+
+    # Admin
+    Budget('admin_bp.dashboard', 'admin', 'GET', '/admin/dashboard', 13),
+    Budget('admin_bp.manage_users', 'admin', 'GET', '/admin/users', 5),
+    Budget('admin_bp.manage_teachers', 'admin', 'GET', '/admin/teachers', 4),
+    Budget('admin_bp.manage_students', 'admin', 'GET', '/admin/students', 4),
+    Budget('admin_bp.manage_assignments', 'admin', 'GET', '/admin/assignments', 7),
+    Budget('admin_bp.manage_roles', 'admin', 'GET', '/admin/roles', 6),
+    Budget('admin_bp.edit_profile', 'admin', 'GET', '/admin/profile', 2),
+    Budget('admin_bp.add_user', 'admin', 'GET', '/admin/users/add', 2),
+    Budget('admin_bp.add_teacher', 'admin', 'GET', '/admin/teachers/add', 2),
+    Budget('admin_bp.add_student', 'admin', 'GET', '/admin/students/add', 2),
+    Budget('admin_bp.system_settings', 'admin', 'GET', '/admin/settings', 2),
+    Budget('admin_bp.activity_log', 'admin', 'GET', '/admin/activity-log', 3),
+    Budget('admin_bp.activity_feed_api', 'admin', 'GET', '/admin/api/activity', 3),
+    Budget('admin_bp.admission_stats_api', 'admin', 'GET', '/admin/api/admission', 2),
+    Budget('admin_bp.profiling_stats_api', 'admin', 'GET', '/admin/api/profiling', 2),
+    Budget('admin_bp.view_user', 'admin', 'GET', '/admin/users/{student_user_id}', 4),
+    Budget('admin_bp.change_role', 'admin', 'GET', '/admin/users/{student_user_id}/change-role', 3),
+    Budget('admin_bp.view_assignment', 'admin', 'GET', '/admin/assignments/{assignment_id}', 7),
+
+    # Views that change data
+    Budget('student_bp.submit_assignment', 'student', 'POST', '/student/assignments/submit', 12,
+           data=lambda ids: {'assignment_id': ids['assignment_id'], 'comments': 'Done',
+                             'file': (io.BytesIO(SUBMISSION), 'essay.txt', 'text/plain')}),
+    Budget('student_bp.join_class', 'student', 'POST', '/student/classes/{open_class_id}/join', 11),
+    Budget('student_bp.leave_class', 'student', 'POST', '/student/classes/{open_class_id}/leave', 11),
+    Budget('teacher_bp.grade_submission', 'teacher', 'POST', '/teacher/submissions/{submission_id}/grade', 15,
+           data=lambda ids: {'grade': '88', 'feedback': 'Well argued'}),
+    Budget('teacher_bp.create_class', 'teacher', 'POST', '/teacher/classes', 8,
+           data=lambda ids: {'name': 'Budget 101', 'description': 'Extra section'}),
+    Budget('teacher_bp.create_assignment', 'teacher', 'POST', '/teacher/assignments', 10,
+           data=lambda ids: {'class_id': ids['class_id'], 'title': 'Budget essay', 'due_date': '2030-01-15'}),
+    Budget('teacher_bp.update_notifications', 'teacher', 'POST', '/teacher/update_notifications', 3,
+           data=lambda ids: {'email_notifications': 'on'}),
+    Budget('teacher_bp.upload_avatar', 'teacher', 'POST', '/teacher/upload_avatar', 3),
+    Budget('teacher_bp.change_password', 'teacher', 'POST', '/teacher/profile/password', 2,
+           data=lambda ids: {'current_password': 'wrong-password', 'new_password': 'x', 'confirm_password': 'x'}),
+    Budget('admin_bp.refresh_stats', 'admin', 'POST', '/admin/stats/refresh', 7),
+    Budget('admin_bp.update_settings', 'admin', 'POST', '/admin/settings/update', 3),
+    Budget('admin_bp.delete_assignment', 'admin', 'POST', '/admin/assignments/{assignment_id}/delete', 11),
+    Budget('admin_bp.delete_user', 'admin', 'POST', '/admin/users/{student_user_id}/delete', 17),
+]
+
+
+def test_every_view_has_a_budget(school_apps):
+    app = school_apps[0].app
+    views = {rule.endpoint for rule in app.url_map.iter_rules()
+             if rule.endpoint.split('.')[0] in ('student_bp', 'teacher_bp', 'admin_bp')}
+    budgeted = [budget.endpoint for budget in BUDGETS]
+    assert len(budgeted) == len(set(budgeted))
+    assert views == set(budgeted)
+
+
+@pytest.mark.parametrize('budget', BUDGETS, ids=[budget.endpoint for budget in BUDGETS])
+def test_query_budget(budget, school_apps, query_counter):
+    measurements = []
+    for school in school_apps:
+        data = budget.data(school.ids) if budget.data else None
+        measured = query_counter.request(school.app, school.client(budget.role), budget.method,
+                                         budget.url.format(**school.ids), label=f'{school.scale} scale', data=data)
+        assert measured.response.status_code < 500, f'{budget.endpoint} failed at {school.scale} scale'
+        measurements.append(measured)
+    query_counter.check(budget.endpoint, measurements, budget.max_queries, budget.max_ms)
@@ -0,0 +1,150 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from utils.passwords import hash_password
+from utils.rate_limit import (
+    MemoryBackend, DatabaseBackend, RateLimiter, RateLimitExceeded, parse_limit
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def assert_bucket_behaviour(self, backend):
+        clock = FakeClock()
+        limiter = RateLimiter(backend, {('login', 'email'): parse_limit('2/60')}, clock=clock)
+
+        limiter.check('login', email='a@example.com')
+        limiter.check('login', email='a@example.com')
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.check('login', email='a@example.com')
+        self.assertEqual(raised.exception.retry_after, 30)
+
+        # Other keys have their own bucket
+        limiter.check('login', email='b@example.com')
+
+        # One token comes back every 30 seconds
+        clock.now += 30
+        limiter.check('login', email='a@example.com')
+        with self.assertRaises(RateLimitExceeded):
+            limiter.check('login', email='a@example.com')
+        self.assertEqual(limiter.rejected, 2)
+
+        # A refund makes room for one more attempt, but never above capacity
+        limiter.refund('login', email='a@example.com')
+        limiter.check('login', email='a@example.com')
+        for _ in range(3):
+            limiter.refund('login', email='b@example.com')
+        limiter.check('login', email='b@example.com')
+        limiter.check('login', email='b@example.com')
+        with self.assertRaises(RateLimitExceeded):
+            limiter.check('login', email='b@example.com')
+
+    def test_memory_backend(self):
+        self.assert_bucket_behaviour(MemoryBackend())
+
+    def test_memory_backend_is_bounded(self):
+        backend = MemoryBackend(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            backend.take(key, 1, 1.0, 0)
+        self.assertEqual(list(backend._buckets), ['b', 'c'])
+
+    def test_database_backend(self):
+        app = create_app({'ACTIVITY_LOG_ASYNC': False})
+        with app.app_context():
+            db.create_all()
+            try:
+                self.assert_bucket_behaviour(DatabaseBackend(app))
+            finally:
+                db.drop_all()
+
+
+class LoginRateLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive',
+            'RATE_LIMIT_LOGIN_EMAIL': '3/300',
+            'RATE_LIMIT_LOGIN_IP': '5/60',
+            'PROXY_FIX': 1
+        })
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_rejects_before_any_password_work(self):
+        data = {'email': 'Victim@example.com', 'password': 'guess'}
+        for _ in range(3):
+            self.assertEqual(self.client.post('/login', data=data).status_code, 200)
+
+        with mock.patch('routes.auth.verify_password') as verify, \
+                mock.patch('routes.auth.User') as user_model:
+            response = self.client.post('/login', data={'email': 'victim@example.com', 'password': 'x'})
+            verify.assert_not_called()
+            user_model.query.filter_by.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+        # GET requests are never throttled
+        self.assertEqual(self.client.get('/login').status_code, 200)
+
+    def test_ip_limit_covers_many_emails(self):
+        for i in range(5):
+            self.client.post('/login', data={'email': f'user{i}@example.com', 'password': 'x'})
+        response = self.client.post('/login', data={'email': 'new@example.com', 'password': 'x'},
+                                    headers={'Accept': 'text/html'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(b'Too Many Requests', response.data)
+
+    def test_successful_logins_do_not_use_up_the_ip_limit(self):
+        # A whole class signing in from one school address
+        for i in range(8):
+            db.session.add(User(username=f'pupil{i}', email=f'pupil{i}@example.com',
+                                password=hash_password('secret123'), role='admin'))
+        db.session.commit()
+        for i in range(8):
+            client = self.app.test_client()
+            response = client.post('/login', data={'email': f'pupil{i}@example.com', 'password': 'secret123'})
+            self.assertEqual(response.status_code, 302)
+
+        # Failed attempts from the same address still count
+        for i in range(5):
+            self.client.post('/login', data={'email': f'pupil{i}@example.com', 'password': 'x'})
+        self.assertEqual(self.client.post('/login', data={'email': 'pupil7@example.com',
+                                                          'password': 'x'}).status_code, 429)
+
+    def test_ip_buckets_follow_the_forwarded_client_address(self):
+        for i in range(5):
+            self.client.post('/login', data={'email': f'user{i}@example.com', 'password': 'x'},
+                             headers={'X-Forwarded-For': '203.0.113.7'})
+        response = self.client.post('/login', data={'email': 'new@example.com', 'password': 'x'},
+                                    headers={'X-Forwarded-For': '203.0.113.7'})
+        self.assertEqual(response.status_code, 429)
+        # Another client behind the same proxy has its own bucket
+        response = self.client.post('/login', data={'email': 'new@example.com', 'password': 'x'},
+                                    headers={'X-Forwarded-For': '203.0.113.8'})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
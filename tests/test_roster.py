@@ -0,0 +1,111 @@
+import os
+import unittest
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from utils.roster import teacher_roster
+
+
+class TeacherRosterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({'ACTIVITY_LOG_ASYNC': False})
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        teacher_user = User(username='tina', email='tina@example.com', password='x', role='teacher')
+        other_user = User(username='olga', email='olga@example.com', password='x', role='teacher')
+        db.session.add_all([teacher_user, other_user])
+        db.session.flush()
+        self.teacher = Teacher(user_id=teacher_user.id)
+        other_teacher = Teacher(user_id=other_user.id)
+        db.session.add_all([self.teacher, other_teacher])
+        db.session.flush()
+        self.math = Class(name='Math', teacher_id=self.teacher.id)
+        self.art = Class(name='Art', teacher_id=self.teacher.id)
+        self.other = Class(name='Other', teacher_id=other_teacher.id)
+        db.session.add_all([self.math, self.art, self.other])
+
+        self.students = {}
+        for first, last in [('Ann', 'Young'), ('Bob', 'Adams'), ('Cid', 'Moss'), ('Dee', 'Nash')]:
+            user = User(username=first.lower(), email=f'{first.lower()}@example.com', password='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id, first_name=first, last_name=last)
+            db.session.add(student)
+            self.students[first] = student
+        db.session.flush()
+
+        self.students['Ann'].classes.extend([self.math, self.art])
+        self.students['Bob'].classes.append(self.math)
+        self.students['Cid'].classes.append(self.art)
+        # Not in any of this teacher's classes
+        self.students['Dee'].classes.append(self.other)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_distinct_students_with_aggregated_classes(self):
+        roster = teacher_roster(self.teacher.id)
+        self.assertEqual(roster['total'], 3)
+        self.assertEqual(roster['classes'], 2)
+        self.assertEqual([s['full_name'] for s in roster['items']], ['Bob Adams', 'Cid Moss', 'Ann Young'])
+
+        ann = roster['items'][2]
+        self.assertEqual(ann['email'], 'ann@example.com')
+        self.assertEqual(ann['class_count'], 2)
+        self.assertEqual(sorted(ann['class_name'].split(', ')), ['Art', 'Math'])
+
+    def test_duplicate_enrollment_rows_are_collapsed(self):
+        self.students['Bob'].classes.append(self.math)
+        db.session.commit()
+        roster = teacher_roster(self.teacher.id)
+        self.assertEqual(roster['total'], 3)
+        bob = next(s for s in roster['items'] if s['first_name'] == 'Bob')
+        self.assertEqual((bob['class_name'], bob['class_count']), ('Math', 1))
+
+    def test_sort_search_and_pages(self):
+        by_email = teacher_roster(self.teacher.id, sort='email', direction='desc')
+        self.assertEqual([s['first_name'] for s in by_email['items']], ['Cid', 'Bob', 'Ann'])
+
+        page = teacher_roster(self.teacher.id, sort='name', per_page=2, page=2)
+        self.assertEqual((page['pages'], [s['first_name'] for s in page['items']]), (2, ['Ann']))
+
+        found = teacher_roster(self.teacher.id, search='MOSS')
+        self.assertEqual([s['first_name'] for s in found['items']], ['Cid'])
+
+        self.assertEqual(len(teacher_roster(self.teacher.id, per_page=None)['items']), 3)
+
+    def test_sort_by_account_creation(self):
+        for offset, name in enumerate(['Cid', 'Ann', 'Bob']):
+            self.students[name].created_at = datetime(2025, 9, 1 + offset)
+        db.session.commit()
+        joined = teacher_roster(self.teacher.id, sort='joined')
+        self.assertEqual([s['first_name'] for s in joined['items']], ['Cid', 'Ann', 'Bob'])
+        self.assertEqual(joined['items'][0]['joined_date'], 'Sep 01, 2025')
+
+    def test_two_queries_per_page(self):
+        teacher_id = self.teacher.id
+        statements = []
+        listener = lambda *a: statements.append(a[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            teacher_roster(teacher_id, per_page=2)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(len(statements), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
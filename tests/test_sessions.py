@@ -0,0 +1,157 @@
+import hashlib
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.user_session import UserSession
+from utils.passwords import hash_password
+from utils.sessions import count_active_sessions
+
+
+class ServerSessionTestCase(unittest.TestCase):
+    # Requests run in their own app context here: a shared one would let
+    # Flask-Login's per-context user cache hide what the session holds.
+
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            pwhash = hash_password('secret123')
+            admin = User(username='admin', email='admin@example.com', password=pwhash, role='admin')
+            student = User(username='stu', email='stu@example.com', password=pwhash, role='student')
+            db.session.add_all([admin, student])
+            db.session.flush()
+            db.session.add(Student(user_id=student.id))
+            db.session.commit()
+            self.student_id = student.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, email):
+        client = self.app.test_client()
+        response = client.post('/login', data={'email': email, 'password': 'secret123'})
+        self.assertEqual(response.status_code, 302)
+        return client
+
+    def active_sessions(self):
+        with self.app.app_context():
+            return count_active_sessions()
+
+    def test_cookie_carries_only_session_id(self):
+        client = self.login('stu@example.com')
+        self.assertLess(len(client.get_cookie('session').value), 64)
+        self.assertEqual(client.get('/student/dashboard').status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(UserSession.query.filter_by(user_id=self.student_id).count(), 1)
+
+        # Anonymous sessions are stored but not counted as active
+        self.app.test_client().get('/login')
+        self.assertEqual(self.active_sessions(), 1)
+
+    def test_login_and_logout_issue_new_session_ids(self):
+        client = self.app.test_client()
+        client.get('/login')
+        planted = client.get_cookie('session').value
+
+        client.post('/login', data={'email': 'stu@example.com', 'password': 'secret123'})
+        logged_in = client.get_cookie('session').value
+        self.assertNotEqual(logged_in, planted)
+
+        # A client still holding the pre-login id is not logged in
+        attacker = self.app.test_client()
+        attacker.set_cookie('session', planted)
+        response = attacker.get('/student/dashboard')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+        client.get('/logout')
+        self.assertNotEqual(client.get_cookie('session').value, logged_in)
+        attacker.set_cookie('session', logged_in)
+        self.assertEqual(attacker.get('/student/dashboard').status_code, 302)
+        with self.app.app_context():
+            old_keys = [hashlib.sha256(sid.encode()).hexdigest() for sid in (planted, logged_in)]
+            self.assertEqual(UserSession.query.filter(UserSession.id.in_(old_keys)).count(), 0)
+            self.assertEqual(UserSession.query.filter(UserSession.user_id.isnot(None)).count(), 0)
+
+    def test_static_requests_skip_the_store(self):
+        client = self.login('stu@example.com')
+        store = self.app.extensions['session_store']
+        reads = []
+        original = store.get
+        store.get = lambda *args: reads.append(args) or original(*args)
+        try:
+            client.get('/static/css/style.css').close()
+            self.assertEqual(reads, [])
+            self.app.test_client().get('/login')
+            self.assertEqual(reads, [])
+            client.get('/student/dashboard')
+            self.assertEqual(len(reads), 1)
+        finally:
+            store.get = original
+
+    def test_role_change_revokes_sessions(self):
+        student_client = self.login('stu@example.com')
+        admin_client = self.login('admin@example.com')
+        self.assertEqual(self.active_sessions(), 2)
+
+        response = admin_client.post(f'/admin/users/{self.student_id}/change-role', data={'role': 'teacher'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.active_sessions(), 1)
+
+        response = student_client.get('/teacher/dashboard')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+    def test_expired_sessions_are_ignored_and_purged(self):
+        client = self.login('stu@example.com')
+        with self.app.app_context():
+            UserSession.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+
+        self.assertEqual(self.active_sessions(), 0)
+        response = client.get('/student/dashboard')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+        with self.app.app_context():
+            purged = self.app.extensions['session_store'].purge_expired(datetime.utcnow())
+            self.assertGreaterEqual(purged, 1)
+            self.assertEqual(UserSession.query.filter_by(user_id=self.student_id).count(), 0)
+
+
+    def test_purge_thread_starts_on_first_request_of_each_process(self):
+        with mock.patch('utils.sessions.threading') as threading:
+            thread = threading.Thread
+            app = create_app({'ACTIVITY_LOG_ASYNC': False, 'TOUCH_ASYNC': False,
+                              'SESSION_PURGE_INTERVAL': 3600})
+            purger = app.extensions['session_purger']
+            thread.assert_not_called()
+
+            client = app.test_client()
+            client.get('/login')
+            client.get('/login')
+            self.assertEqual(thread.call_count, 1)
+
+            # A forked worker starts its own
+            with mock.patch('utils.sessions.os.getpid', return_value=purger._pid + 1):
+                client.get('/login')
+            self.assertEqual(thread.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from models.submission_version import SubmissionVersion
+from utils.passwords import hash_password
+from utils.submissions import (save_submission, store_file, discard_file, version_history, diff_versions,
+                               SubmissionRejected)
+
+
+class SubmissionVersionsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = tempfile.mkdtemp()
+        self.app = create_app({
+            'SUBMISSION_UPLOAD_FOLDER': self.store,
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            users = [User(username=name, email=f'{name}@example.com',
+                          password=hash_password('secret123'), role='teacher')
+                     for name in ('tina', 'olga')]
+            student_user = User(username='ann', email='ann@example.com', password='x', role='student')
+            db.session.add_all(users + [student_user])
+            db.session.flush()
+            teacher, other_teacher = Teacher(user_id=users[0].id), Teacher(user_id=users[1].id)
+            student = Student(user_id=student_user.id, first_name='Ann')
+            db.session.add_all([teacher, other_teacher, student])
+            db.session.flush()
+            cls = Class(name='Math', teacher_id=teacher.id)
+            db.session.add(cls)
+            db.session.flush()
+            assignment = Assignment(title='HW', description='-', class_id=cls.id)
+            db.session.add(assignment)
+            db.session.commit()
+            self.assignment_id, self.student_id = assignment.id, student.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.store)
+
+    def upload(self, content, name='essay.txt'):
+        return store_file(io.BytesIO(content), self.store, name, 'text/plain')
+
+    def submit(self, content, comments='', name='essay.txt'):
+        with self.app.app_context():
+            return save_submission(self.assignment_id, self.student_id, self.upload(content, name), comments)
+
+    def test_identical_content_is_stored_once(self):
+        self.submit(b'draft', name='one.txt')
+        with self.app.app_context():
+            first = SubmissionVersion.query.one()
+        second = self.upload(b'draft', 'two.txt')
+        other = self.upload(b'final')
+
+        # Already stored: the upload is dropped and the stored copy reused
+        self.assertEqual(first.file_path, second.path)
+        self.assertIsNone(second.staged_path)
+        self.assertEqual(second.name, 'two.txt')
+        self.assertNotEqual(first.file_path, other.path)
+        self.assertEqual(second.size, 5)
+        with open(second.path, 'rb') as f:
+            self.assertEqual(f.read(), b'draft')
+        # New content waits in a staged file until it is saved
+        self.assertFalse(os.path.exists(other.path))
+        self.assertTrue(os.path.exists(other.staged_path))
+        discard_file(other)
+        stored = [f for _, _, files in os.walk(self.store) for f in files]
+        self.assertEqual(stored, ['one.txt'])
+
+    def test_rejected_submit_stores_no_file(self):
+        self.submit(b'draft')
+        stored = self.upload(b'final')
+        with self.app.app_context():
+            with self.assertRaises(SubmissionRejected):
+                save_submission(self.assignment_id, self.student_id, stored, policy='reject')
+        self.assertFalse(os.path.exists(stored.staged_path))
+        self.assertFalse(os.path.exists(stored.path))
+        files = [f for _, _, files in os.walk(self.store) for f in files]
+        self.assertEqual(files, ['essay.txt'])
+
+    def test_only_the_newest_version_is_latest(self):
+        submission_id, _ = self.submit(b'draft')
+        self.submit(b'final')
+        self.submit(b'final', comments='now with comments')
+
+        with self.app.app_context():
+            versions = SubmissionVersion.query.filter_by(submission_id=submission_id).order_by(SubmissionVersion.version).all()
+            self.assertEqual([v.is_latest for v in versions], [False, False, True])
+            # Versions 2 and 3 share the stored file
+            self.assertEqual(versions[1].file_path, versions[2].file_path)
+            submission = db.session.get(Submission, submission_id)
+            self.assertEqual((submission.version, submission.content_hash, submission.comments),
+                             (3, versions[2].content_hash, 'now with comments'))
+
+    def test_unchanged_resubmit_is_refused(self):
+        self.submit(b'draft', comments='hi')
+        with self.assertRaises(SubmissionRejected) as caught:
+            self.submit(b'draft', comments='hi', name='renamed.txt')
+        self.assertEqual(caught.exception.reason, 'unchanged')
+
+    def test_metadata_diff(self):
+        submission_id, _ = self.submit(b'draft', name='draft.txt')
+        self.submit(b'longer final', comments='fixed typos', name='final.txt')
+
+        with self.app.app_context():
+            history = version_history(submission_id)
+        diff = diff_versions(history, 1, 2)
+        self.assertEqual(set(diff['changes']), {'file_name', 'file_size', 'content_hash', 'comments', 'submitted_at'})
+        self.assertEqual(diff['changes']['file_name'], {'from': 'draft.txt', 'to': 'final.txt'})
+        self.assertEqual(diff['size_delta'], 7)
+        self.assertFalse(diff['same_content'])
+        self.assertIsNone(diff_versions(history, 1, 5))
+
+    def login(self, email):
+        client = self.app.test_client()
+        client.post('/login', data={'email': email, 'password': 'secret123'})
+        return client
+
+    def test_versions_endpoint_and_download(self):
+        submission_id, _ = self.submit(b'draft', name='draft.txt')
+        self.submit(b'final', name='final.txt')
+
+        client = self.login('tina@example.com')
+        body = client.get(f'/teacher/submissions/{submission_id}/versions?from=1').get_json()
+        self.assertEqual([v['version'] for v in body['versions']], [1, 2])
+        self.assertEqual(body['diff']['to'], 2)
+        self.assertEqual(body['diff']['changes']['file_name']['to'], 'final.txt')
+        self.assertEqual(client.get(f'/teacher/submissions/{submission_id}/versions?from=9').status_code, 404)
+
+        old = client.get(f'/teacher/submissions/{submission_id}/download?version=1')
+        self.assertEqual(old.data, b'draft')
+        self.assertIn('draft.txt', old.headers['Content-Disposition'])
+        old.close()
+        latest = client.get(f'/teacher/submissions/{submission_id}/download')
+        self.assertEqual(latest.data, b'final')
+        latest.close()
+
+        other = self.login('olga@example.com')
+        self.assertEqual(other.get(f'/teacher/submissions/{submission_id}/versions').status_code, 404)
+
+
+    def test_shared_file_downloads_under_each_students_name(self):
+        self.submit(b'same answer', name='ann-essay.txt')
+        with self.app.app_context():
+            user = User(username='ben', email='ben@example.com', password='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id, first_name='Ben')
+            db.session.add(student)
+            db.session.commit()
+            ben_id = student.id
+            submission_id, _ = save_submission(self.assignment_id, ben_id,
+                                               self.upload(b'same answer', 'ben-essay.txt'))
+            submission = db.session.get(Submission, submission_id)
+            self.assertEqual(submission.file_name, 'ben-essay.txt')
+            self.assertTrue(submission.file_path.endswith('ann-essay.txt'))
+
+        response = self.login('tina@example.com').get(f'/teacher/submissions/{submission_id}/download')
+        self.assertEqual(response.data, b'same answer')
+        self.assertIn('ben-essay.txt', response.headers['Content-Disposition'])
+        self.assertNotIn('ann', response.headers['Content-Disposition'])
+        response.close()
+
+    def test_deleting_the_assignment_deletes_versions(self):
+        self.submit(b'draft')
+        self.submit(b'final')
+        with self.app.app_context():
+            db.session.delete(db.session.get(Assignment, self.assignment_id))
+            db.session.commit()
+            self.assertEqual(Submission.query.count(), 0)
+            self.assertEqual(SubmissionVersion.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
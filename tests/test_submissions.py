@@ -0,0 +1,242 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from models.submission_version import SubmissionVersion
+from utils.passwords import hash_password
+from utils.submissions import save_submission, StoredFile, SubmissionRejected, _upsert_fallback
+
+THREADS = 8
+
+
+def stored(name, content=None):
+    """A StoredFile for a file that was never written (only its metadata matters)"""
+    content = content if content is not None else name.encode()
+    return StoredFile(name, name, len(content), 'text/plain', hashlib.sha256(content).hexdigest())
+
+
+class SubmissionUpsertTestCase(unittest.TestCase):
+    def setUp(self):
+        # A database file rather than :memory:, so threads get their own connections
+        self.tmpdir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'test.db')}",
+            'SUBMISSION_UPLOAD_FOLDER': os.path.join(self.tmpdir, 'submissions'),
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='tina', email='tina@example.com', password='x', role='teacher')
+            db.session.add(user)
+            db.session.flush()
+            teacher = Teacher(user_id=user.id)
+            db.session.add(teacher)
+            db.session.flush()
+            cls = Class(name='Math', teacher_id=teacher.id)
+            db.session.add(cls)
+            db.session.flush()
+            assignment = Assignment(title='HW', description='-', class_id=cls.id)
+            db.session.add(assignment)
+            db.session.flush()
+            self.assignment_id = assignment.id
+
+            self.student_ids = []
+            for i in range(THREADS * 10):
+                student_user = User(username=f'pupil{i}', email=f'pupil{i}@example.com',
+                                    password=hash_password('secret123') if i == 0 else 'x', role='student')
+                db.session.add(student_user)
+                db.session.flush()
+                student = Student(user_id=student_user.id, first_name=f'P{i}')
+                db.session.add(student)
+                db.session.flush()
+                student.classes.append(cls)
+                self.student_ids.append(student.id)
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def run_threads(self, target, count=THREADS):
+        """Start count threads at the same moment and collect what each returns or raises"""
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def run(i):
+            with self.app.app_context():
+                barrier.wait()
+                try:
+                    results[i] = target(i)
+                except Exception as e:
+                    results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def versions(self, submission_id):
+        with self.app.app_context():
+            return [v for v, in db.session.query(SubmissionVersion.version)
+                    .filter_by(submission_id=submission_id).order_by(SubmissionVersion.version)]
+
+    def test_second_submit_is_rejected(self):
+        student_id = self.student_ids[0]
+        with self.app.app_context():
+            submission_id, version = save_submission(self.assignment_id, student_id, stored('a.txt'), policy='reject')
+            self.assertEqual(version, 1)
+            with self.assertRaises(SubmissionRejected) as caught:
+                save_submission(self.assignment_id, student_id, stored('b.txt'), policy='reject')
+            self.assertEqual(caught.exception.reason, 'submitted')
+            self.assertEqual(db.session.get(Submission, submission_id).file_path, 'a.txt')
+        self.assertEqual(self.versions(submission_id), [1])
+
+    def test_replace_keeps_history_until_graded(self):
+        student_id = self.student_ids[0]
+        with self.app.app_context():
+            submission_id, _ = save_submission(self.assignment_id, student_id, stored('a.txt'), policy='replace')
+            self.assertEqual(save_submission(self.assignment_id, student_id, stored('b.txt'), policy='replace'),
+                             (submission_id, 2))
+            submission = db.session.get(Submission, submission_id)
+            self.assertEqual((submission.file_path, submission.version), ('b.txt', 2))
+            self.assertEqual([v.file_path for v in submission.versions], ['a.txt', 'b.txt'])
+
+            submission.grade = 90
+            db.session.commit()
+            with self.assertRaises(SubmissionRejected) as caught:
+                save_submission(self.assignment_id, student_id, stored('c.txt'), policy='replace')
+            self.assertEqual(caught.exception.reason, 'graded')
+        self.assertEqual(self.versions(submission_id), [1, 2])
+
+    def test_fallback_upsert_matches_on_conflict(self):
+        # The path for databases without ON CONFLICT, run against SQLite here
+        student_id = self.student_ids[0]
+        with self.app.app_context():
+            submission_id, _ = save_submission(self.assignment_id, student_id, stored('a.txt'), policy='replace')
+            before = db.session.get(Submission, submission_id).updated_at
+            db.session.remove()
+
+            values = {'assignment_id': self.assignment_id, 'student_id': student_id, 'file_path': 'b.txt',
+                      'comments': '', 'content_hash': stored('b.txt').content_hash,
+                      'submitted_at': datetime.utcnow(), 'updated_at': datetime.utcnow() + timedelta(seconds=1)}
+            with db.engine.begin() as conn:
+                self.assertEqual(tuple(_upsert_fallback(conn, values, 'replace')), (submission_id, 2))
+                self.assertIsNone(_upsert_fallback(conn, values, 'replace'))
+                self.assertIsNone(_upsert_fallback(conn, values, 'reject'))
+            submission = db.session.get(Submission, submission_id)
+            self.assertEqual((submission.file_path, submission.version), ('b.txt', 2))
+            self.assertEqual(submission.updated_at, values['updated_at'])
+            self.assertGreater(submission.updated_at, before)
+
+    def test_concurrent_double_submit_creates_one_row(self):
+        student_id = self.student_ids[0]
+        results = self.run_threads(
+            lambda i: save_submission(self.assignment_id, student_id, stored(f'{i}.txt'), policy='reject'))
+
+        created = [r for r in results if isinstance(r, tuple)]
+        rejected = [r for r in results if isinstance(r, SubmissionRejected)]
+        self.assertEqual((len(created), len(rejected)), (1, THREADS - 1), results)
+        with self.app.app_context():
+            self.assertEqual(Submission.query.filter_by(student_id=student_id).count(), 1)
+        self.assertEqual(self.versions(created[0][0]), [1])
+
+    def test_concurrent_replaces_number_versions_in_order(self):
+        student_id = self.student_ids[0]
+        results = self.run_threads(
+            lambda i: save_submission(self.assignment_id, student_id, stored(f'{i}.txt'), policy='replace'))
+
+        self.assertTrue(all(isinstance(r, tuple) for r in results), results)
+        self.assertEqual(len({submission_id for submission_id, _ in results}), 1)
+        self.assertEqual(sorted(version for _, version in results), list(range(1, THREADS + 1)))
+        with self.app.app_context():
+            submission = Submission.query.filter_by(student_id=student_id).one()
+            self.assertEqual(submission.version, THREADS)
+        self.assertEqual(self.versions(submission.id), list(range(1, THREADS + 1)))
+
+    def test_concurrent_throughput(self):
+        per_thread = len(self.student_ids) // THREADS
+
+        def submit_batch(i):
+            for student_id in self.student_ids[i * per_thread:(i + 1) * per_thread]:
+                save_submission(self.assignment_id, student_id, stored(f'{student_id}.txt'))
+                # A double click right behind every submit
+                try:
+                    save_submission(self.assignment_id, student_id, stored(f'{student_id}.txt'))
+                except SubmissionRejected:
+                    pass
+            return per_thread
+
+        started = time.perf_counter()
+        results = self.run_threads(submit_batch)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(results, [per_thread] * THREADS)
+        with self.app.app_context():
+            self.assertEqual(Submission.query.count(), len(self.student_ids))
+            self.assertEqual(SubmissionVersion.query.count(), len(self.student_ids))
+        # Two statements per submit on SQLite with one writer at a time;
+        # a floor well below what any machine manages, to catch lock stalls
+        self.assertGreater(len(self.student_ids) * 2 / elapsed, 20)
+
+    def test_submit_route_handles_resubmits(self):
+        client = self.app.test_client()
+        client.post('/login', data={'email': 'pupil0@example.com', 'password': 'secret123'})
+
+        def submit(content):
+            data = {'assignment_id': str(self.assignment_id),
+                    'file': (io.BytesIO(content), 'essay.txt', 'text/plain')}
+            return client.post('/student/assignments/submit', data=data, content_type='multipart/form-data')
+
+        self.assertEqual(submit(b'my essay').get_json()['version'], 1)
+        # A double click uploads the same bytes again
+        unchanged = submit(b'my essay')
+        self.assertEqual(unchanged.status_code, 400)
+        self.assertIn('identical', unchanged.get_json()['message'])
+        self.assertEqual(submit(b'my essay, fixed').get_json()['version'], 2)
+
+        self.app.config['SUBMISSION_RESUBMIT_POLICY'] = 'reject'
+        rejected = submit(b'third try')
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(rejected.get_json()['message'], 'Assignment already submitted')
+
+        with self.app.app_context():
+            submission = Submission.query.filter_by(student_id=self.student_ids[0]).one()
+            paths = {v.file_path for v in submission.versions}
+        self.assertEqual(len(paths), 2)
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+
+        # The rejected upload was never stored
+        third = hashlib.sha256(b'third try').hexdigest()
+        folder = self.app.config['SUBMISSION_UPLOAD_FOLDER']
+        self.assertFalse(os.path.exists(os.path.join(folder, third[:2], third)))
+        self.assertTrue(all(path.startswith(folder) for path in paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
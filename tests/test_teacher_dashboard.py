@@ -0,0 +1,151 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils.passwords import hash_password
+from utils import teacher_dashboard
+from utils.teacher_dashboard import dashboard_summary
+
+# Session load, user loader, teacher, summary, class versions and three
+# widget queries
+COLD_QUERY_BUDGET = 8
+# Widgets served from the cache (keyed on the class versions)
+WARM_QUERY_BUDGET = 5
+
+
+class TeacherDashboardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='tina', email='tina@example.com',
+                        password=hash_password('secret123'), role='teacher')
+            db.session.add(user)
+            db.session.flush()
+            teacher = Teacher(user_id=user.id, first_name='Tina')
+            db.session.add(teacher)
+            db.session.flush()
+            self.teacher_id = teacher.id
+            self.add_data(classes=2, students=3)
+            db.session.commit()
+        teacher_dashboard._cache.clear()
+
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_data(self, classes, students):
+        """Add classes that share the same students, each with a future assignment and submissions"""
+        offset = Student.query.count()
+        pupils = []
+        for i in range(students):
+            user = User(username=f'pupil{offset + i}', email=f'pupil{offset + i}@example.com',
+                        password='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            pupils.append(Student(user_id=user.id, first_name=f'P{offset + i}'))
+        db.session.add_all(pupils)
+        for _ in range(classes):
+            cls = Class(name='Class', teacher_id=self.teacher_id)
+            db.session.add(cls)
+            db.session.flush()
+            for pupil in pupils:
+                pupil.classes.append(cls)
+            assignment = Assignment(title='HW', description='-', class_id=cls.id,
+                                    due_date=datetime.utcnow() + timedelta(days=7))
+            db.session.add(assignment)
+            db.session.flush()
+            db.session.add_all([Submission(assignment_id=assignment.id, student_id=p.id) for p in pupils])
+
+    def get_dashboard(self):
+        statements = []
+        listener = lambda *a: statements.append(a[2])
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            response = self.client.get('/teacher/dashboard')
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 200)
+        return response, len(statements)
+
+    def test_summary_counts_distinct_students(self):
+        with self.app.app_context():
+            self.assertEqual(dashboard_summary(self.teacher_id), {
+                'total_students': 3,
+                'total_classes': 2,
+                'pending_assignments': 6,
+                'upcoming_deadlines': 2,
+            })
+
+    def test_class_sizes_count_only_the_teachers_classes(self):
+        statements = []
+        listener = lambda *a: statements.append(a[2])
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                teacher_dashboard._load_widgets(self.teacher_id)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        grouped = [sql for sql in statements if 'GROUP BY class_student.class_id' in sql]
+        self.assertEqual(len(grouped), 1)
+        self.assertIn('WHERE class_student.class_id IN', grouped[0])
+
+    def test_query_budget(self):
+        # The first view after login also writes the session (consumed flash)
+        self.get_dashboard()
+        teacher_dashboard._cache.clear()
+
+        _, cold = self.get_dashboard()
+        _, warm = self.get_dashboard()
+        self.assertLessEqual(cold, COLD_QUERY_BUDGET)
+        self.assertLessEqual(warm, WARM_QUERY_BUDGET)
+
+        # More classes, students and submissions do not add queries (the
+        # new data changes the class versions, so the cache refills first)
+        with self.app.app_context():
+            self.add_data(classes=10, students=10)
+            db.session.commit()
+        _, cold_large = self.get_dashboard()
+        _, warm_large = self.get_dashboard()
+        self.assertEqual(cold_large, cold)
+        self.assertEqual(warm_large, warm)
+
+    def test_grading_invalidates_widgets(self):
+        with self.app.app_context():
+            submission = Submission.query.order_by(Submission.id.desc()).first()
+            submission_id = submission.id
+        response, _ = self.get_dashboard()
+        self.assertNotIn(b'87.0%', response.data)
+
+        response = self.client.post(f'/teacher/submissions/{submission_id}/grade',
+                                    data={'grade': '87', 'feedback': 'ok'})
+        self.assertLess(response.status_code, 400)
+        response, _ = self.get_dashboard()
+        self.assertIn(b'87.0%', response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import event
+from app import create_app, db
+from models.user import User
+from models.student import Student
+from models.teacher import Teacher
+from models.class_model import Class
+from models.assignment import Assignment
+from models.submission import Submission
+from utils import analytics
+from utils.passwords import hash_password
+
+
+class TeacherDetailViewsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'TOUCH_ASYNC': False,
+            'SESSION_PURGE_INTERVAL': 0,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='tina', email='tina@example.com',
+                        password=hash_password('secret123'), role='teacher')
+            other = User(username='olga', email='olga@example.com', password='x', role='teacher')
+            db.session.add_all([user, other])
+            db.session.flush()
+            teacher = Teacher(user_id=user.id, first_name='Tina')
+            other_teacher = Teacher(user_id=other.id, first_name='Olga')
+            db.session.add_all([teacher, other_teacher])
+            db.session.flush()
+
+            cls = Class(name='Math', teacher_id=teacher.id)
+            other_cls = Class(name='Art', teacher_id=other_teacher.id)
+            db.session.add_all([cls, other_cls])
+            db.session.flush()
+            self.teacher_id, self.class_id, self.other_class_id = teacher.id, cls.id, other_cls.id
+
+            self.student_id = self.add_students(1)[0]
+            self.outsider_id = self.add_students(1, class_id=other_cls.id)[0]
+            self.assignment_id = self.add_assignments(1, [self.student_id])[0]
+            self.other_assignment_id = self.add_assignments(1, [self.outsider_id], class_id=other_cls.id)[0]
+            db.session.commit()
+
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'email': 'tina@example.com', 'password': 'secret123'})
+        # The first page after login also writes the session (flash consumed)
+        self.client.get('/teacher/dashboard')
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_students(self, count, class_id=None):
+        ids = []
+        for _ in range(count):
+            n = User.query.count()
+            user = User(username=f'pupil{n}', email=f'pupil{n}@example.com', password='x', role='student')
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id, first_name=f'P{n}', last_name='Doe')
+            db.session.add(student)
+            db.session.flush()
+            student.classes.append(db.session.get(Class, class_id or self.class_id))
+            ids.append(student.id)
+        return ids
+
+    def add_assignments(self, count, student_ids, class_id=None):
+        ids = []
+        for i in range(count):
+            assignment = Assignment(title=f'HW{i}', description='-', class_id=class_id or self.class_id)
+            db.session.add(assignment)
+            db.session.flush()
+            db.session.add_all([Submission(assignment_id=assignment.id, student_id=s, grade=80 + i % 20)
+                                for s in student_ids])
+            ids.append(assignment.id)
+        return ids
+
+    def count_queries(self, url):
+        # Analytics are cached per class; measure every page cold
+        analytics._cache.clear()
+        statements = []
+        with self.app.app_context():
+            engine = db.engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 200)
+        return len(statements), response
+
+    def test_view_student_query_count_is_constant(self):
+        url = f'/teacher/students/{self.student_id}'
+        small, _ = self.count_queries(url)
+
+        with self.app.app_context():
+            self.add_assignments(25, [self.student_id])
+            db.session.commit()
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertIn(b'HW24', response.data)
+
+    def test_view_student_hides_other_teachers_work(self):
+        with self.app.app_context():
+            student = db.session.get(Student, self.student_id)
+            student.classes.append(db.session.get(Class, self.other_class_id))
+            self.add_assignments(1, [self.student_id], class_id=self.other_class_id)
+            db.session.commit()
+        response = self.client.get(f'/teacher/students/{self.student_id}')
+        self.assertIn(b'Math', response.data)
+        self.assertNotIn(b'Art', response.data)
+
+    def test_view_student_authorization(self):
+        response = self.client.get(f'/teacher/students/{self.outsider_id}')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith('/teacher/students'))
+        self.assertEqual(self.client.get('/teacher/students/9999').status_code, 404)
+
+    def test_view_assignment_query_count_is_constant(self):
+        url = f'/teacher/assignments/{self.assignment_id}'
+        small, _ = self.count_queries(url)
+
+        with self.app.app_context():
+            pupils = self.add_students(25)
+            db.session.add_all([Submission(assignment_id=self.assignment_id, student_id=s, grade=70)
+                                for s in pupils])
+            db.session.commit()
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.data.count(b'Doe</strong>'), 26)
+
+    def test_view_assignment_authorization(self):
+        response = self.client.get(f'/teacher/assignments/{self.other_assignment_id}')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get('/teacher/assignments/9999').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app import create_app, db
+from models.user import User
+from utils.passwords import hash_password
+from utils.touch import touch, flush_touches
+
+
+class TouchBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'WTF_CSRF_ENABLED': False,
+            'ACTIVITY_LOG_ASYNC': False,
+            'PASSWORD_HASH_METHOD': 'scrypt-interactive'
+        })
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        # Keep the buffer filling up; flushes happen only when the test asks
+        self.buffer = self.app.extensions['touch_buffer']
+        self.buffer.stop()
+        self.buffer.asynchronous = True
+        self.users = [User(username=f'u{i}', email=f'u{i}@example.com', password='x') for i in range(3)]
+        db.session.add_all(self.users)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def last_logins(self):
+        db.session.expire_all()
+        return [db.session.get(User, u.id).last_login for u in self.users]
+
+    def test_touches_are_batched_and_keep_latest(self):
+        earlier = datetime(2024, 1, 1, 8, 0)
+        later = earlier + timedelta(hours=1)
+        touch(User, 'last_login', self.users[0].id, later)
+        touch(User, 'last_login', self.users[0].id, earlier)
+        touch(User, 'last_login', self.users[1].id, earlier)
+
+        self.assertEqual(self.buffer.pending(), 3)
+        self.assertEqual(self.last_logins(), [None, None, None])
+
+        flush_touches()
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.last_logins(), [later, earlier, None])
+
+    def test_login_defers_last_login_write(self):
+        user = self.users[2]
+        user.password = hash_password('secret123')
+        db.session.commit()
+
+        client = self.app.test_client()
+        response = client.post('/login', data={'email': user.email, 'password': 'secret123'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(self.last_logins()[2])
+
+        self.buffer.stop()
+        self.assertIsNotNone(self.last_logins()[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Persistent activity log
+
+Events are appended to the activity_events table through an in-process
+buffer that is flushed in batches (see utils/buffered.py), so recording an
+event never adds a write transaction to the request. The admin feed pages
+backwards with a (created_at, id) keyset cursor, and old events are rolled
+up into daily per-type counts by the `flask activity prune` command.
+"""
+from datetime import datetime, date, timedelta
+import click
+from flask import current_app, has_request_context
+from flask.cli import AppGroup
+from flask_login import current_user
+from sqlalchemy import func, or_, and_
+from extensions import db
+from models.activity_event import ActivityEvent, ActivityRollup
+from utils.buffered import BatchBuffer
+
+
+# Event types shown in the admin feed filter, in display order
+ACTIVITY_TYPES = {
+    'user_registered': 'User Registration',
+    'user_login': 'Login',
+    'login_failed': 'Failed Login',
+    'user_logout': 'Logout',
+    'user_added': 'User Added',
+    'user_deleted': 'User Deletion',
+    'role_changed': 'Role Change',
+    'class_created': 'Class Created',
+    'class_joined': 'Class Enrollment',
+    'class_left': 'Class Unenrollment',
+    'assignment_created': 'Assignment Created',
+    'assignment_submitted': 'Assignment Submitted',
+    'assignment_graded': 'Assignment Graded',
+    'assignment_deleted': 'Assignment Deleted',
+}
+
+_CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+activity_cli = AppGroup('activity', help='Activity log maintenance.')
+
+
+def init_app(app):
+    """Create the event buffer for an application and register the CLI"""
+    buffer = BatchBuffer(
+        lambda rows: _write_events(app, rows),
+        max_items=app.config.get('ACTIVITY_FLUSH_SIZE', 100),
+        interval=app.config.get('ACTIVITY_FLUSH_INTERVAL', 2.0),
+        asynchronous=app.config.get('ACTIVITY_LOG_ASYNC', True),
+        name='activity-log'
+    )
+    app.extensions['activity_log'] = buffer
+    app.cli.add_command(activity_cli)
+
+
+def _write_events(app, rows):
+    # Use a dedicated connection so a flush never commits a request's session
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(ActivityEvent.__table__.insert(), rows)
+
+
+def record_activity(event_type, description, user_id=None):
+    """
+    Queue an activity event for the next batch write
+
+    Args:
+        event_type (str): One of ACTIVITY_TYPES
+        description (str): Human readable summary
+        user_id (int): Acting user; defaults to the logged in user
+    """
+    buffer = current_app.extensions.get('activity_log')
+    if buffer is None:
+        return
+    if user_id is None and has_request_context() and current_user.is_authenticated:
+        user_id = current_user.id
+    buffer.add({
+        'type': event_type,
+        'description': description[:255],
+        'user_id': user_id,
+        'created_at': datetime.utcnow()
+    })
+
+
+def flush_activity():
+    """Write any buffered events now"""
+    buffer = current_app.extensions.get('activity_log')
+    if buffer is not None:
+        buffer.flush()
+
+
+def encode_cursor(event):
+    """Build the keyset cursor that pages past event"""
+    return f"{event.created_at.strftime(_CURSOR_FORMAT)}-{event.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at, id) or None if the cursor is malformed
+    """
+    try:
+        timestamp, event_id = cursor.rsplit('-', 1)
+        return datetime.strptime(timestamp, _CURSOR_FORMAT), int(event_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def activity_feed(event_type=None, before=None, limit=50):
+    """
+    Get one page of the activity feed, newest first
+
+    Args:
+        event_type (str): Only return events of this type
+        before (str): Cursor from a previous page
+        limit (int): Page size
+
+    Returns:
+        tuple: (events: list of ActivityEvent, next_cursor: str or None)
+    """
+    flush_activity()
+
+    query = ActivityEvent.query
+    if event_type:
+        query = query.filter(ActivityEvent.type == event_type)
+
+    position = decode_cursor(before) if before else None
+    if position:
+        created_at, event_id = position
+        query = query.filter(or_(
+            ActivityEvent.created_at < created_at,
+            and_(ActivityEvent.created_at == created_at, ActivityEvent.id < event_id)
+        ))
+
+    events = query.order_by(
+        ActivityEvent.created_at.desc(), ActivityEvent.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
+
+
+def event_to_dict(event):
+    """Serialize an event for templates and the JSON feed"""
+    return {
+        'id': event.id,
+        'type': event.type,
+        'description': event.description,
+        'user_id': event.user_id,
+        'timestamp': event.created_at
+    }
+
+
+def prune_activity_events(retention_days):
+    """
+    Roll events older than the retention window into daily counts and delete them
+
+    Args:
+        retention_days (int): Number of days of raw events to keep
+
+    Returns:
+        int: Number of events deleted
+    """
+    flush_activity()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    day = func.date(ActivityEvent.created_at)
+
+    counts = (
+        db.session.query(day, ActivityEvent.type, func.count(ActivityEvent.id))
+        .filter(ActivityEvent.created_at < cutoff)
+        .group_by(day, ActivityEvent.type)
+        .all()
+    )
+
+    try:
+        for event_day, event_type, count in counts:
+            if not isinstance(event_day, date):
+                event_day = date.fromisoformat(str(event_day))
+            rollup = ActivityRollup.query.filter_by(day=event_day, type=event_type).first()
+            if rollup:
+                rollup.count += count
+            else:
+                db.session.add(ActivityRollup(day=event_day, type=event_type, count=count))
+
+        deleted = ActivityEvent.query.filter(
+            ActivityEvent.created_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return deleted
+
+
+@activity_cli.command('prune')
+@click.option('--days', type=int, default=None,
+              help='Days of raw events to keep (default: ACTIVITY_RETENTION_DAYS).')
+def prune_command(days):
+    """Roll up and delete activity events past the retention window."""
+    if days is None:
+        days = current_app.config.get('ACTIVITY_RETENTION_DAYS', 90)
+    deleted = prune_activity_events(days)
+    click.echo(f'Pruned {deleted} activity events older than {days} days.')
@@ -0,0 +1,130 @@
+"""
+Precomputed statistics snapshot for the admin pages
+
+The admin dashboard and roles page read counts from a snapshot that is
+rebuilt with one grouped query per entity at most once every
+ADMIN_STATS_REFRESH_SECONDS, or on demand via refresh_admin_stats(). The
+snapshot is a single row in the database rather than per-process memory,
+so reading it costs one primary key lookup and a refresh is seen by every
+worker at once.
+"""
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, case, select
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.user import User
+from models.assignment import Assignment
+from models.submission import Submission
+from models.admin_stats_snapshot import AdminStatsSnapshot
+
+SNAPSHOT_ID = 1
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_admin_stats():
+    """
+    Build a fresh statistics snapshot from the database
+
+    Returns:
+        dict: User counts by role, assignment and submission counters and
+        the time the snapshot was taken
+    """
+    now = datetime.utcnow()
+
+    users_by_role = dict(
+        db.session.query(User.role, func.count(User.id)).group_by(User.role).all()
+    )
+
+    total_assignments, pending_assignments, late_assignments = db.session.query(
+        func.count(Assignment.id),
+        _count_if(Assignment.status == 'pending'),
+        _count_if(Assignment.due_date < now)
+    ).one()
+
+    total_submissions, graded_submissions = db.session.query(
+        func.count(Submission.id),
+        _count_if(Submission.grade.isnot(None))
+    ).one()
+
+    return {
+        'users_by_role': users_by_role,
+        'total_users': sum(users_by_role.values()),
+        'total_admins': users_by_role.get('admin', 0),
+        'total_teachers': users_by_role.get('teacher', 0),
+        'total_students': users_by_role.get('student', 0),
+        'total_assignments': total_assignments,
+        'pending_assignments': pending_assignments,
+        'late_assignments': late_assignments,
+        'total_submissions': total_submissions,
+        'graded_submissions': graded_submissions,
+        'refreshed_at': now
+    }
+
+
+def _load_snapshot():
+    row = db.session.execute(
+        select(AdminStatsSnapshot.data, AdminStatsSnapshot.refreshed_at)
+        .where(AdminStatsSnapshot.id == SNAPSHOT_ID)
+    ).first()
+    if row is None:
+        return None
+    snapshot = json.loads(row.data)
+    snapshot['refreshed_at'] = row.refreshed_at
+    return snapshot
+
+
+def _store_snapshot(snapshot, exists=True):
+    # Dedicated connections, so storing never commits the request's session
+    table = AdminStatsSnapshot.__table__
+    values = {
+        'data': json.dumps({key: value for key, value in snapshot.items() if key != 'refreshed_at'}),
+        'refreshed_at': snapshot['refreshed_at']
+    }
+    update = table.update().where(table.c.id == SNAPSHOT_ID).values(**values)
+    if exists:
+        with db.engine.begin() as conn:
+            if conn.execute(update).rowcount:
+                return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(table.insert().values(id=SNAPSHOT_ID, **values))
+    except IntegrityError:
+        # Another worker stored the first snapshot at the same moment
+        with db.engine.begin() as conn:
+            conn.execute(update)
+
+
+def _rebuild(exists=True):
+    snapshot = compute_admin_stats()
+    _store_snapshot(snapshot, exists)
+    return snapshot
+
+
+def refresh_admin_stats():
+    """
+    Rebuild the snapshot immediately, for every worker
+
+    Returns:
+        dict: The new snapshot
+    """
+    return _rebuild()
+
+
+
+def get_admin_stats():
+    """
+    Get the current snapshot, rebuilding it if older than the refresh interval
+
+    Returns:
+        dict: See compute_admin_stats()
+    """
+    interval = current_app.config.get('ADMIN_STATS_REFRESH_SECONDS', 60)
+    snapshot = _load_snapshot()
+    if snapshot is not None and datetime.utcnow() - snapshot['refreshed_at'] < timedelta(seconds=interval):
+        return snapshot
+    return _rebuild(exists=snapshot is not None)
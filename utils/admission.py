@@ -0,0 +1,246 @@
+"""
+Admission control for request bursts
+
+Submissions pile up in the last minutes before Assignment.due_date, and
+each one competes for the same workers as dashboard and analytics reads.
+With ADMISSION_MAX_CONCURRENT > 0, a WSGI middleware in front of the app
+limits how many requests run at once in this process and decides who goes
+first when that limit is reached:
+
+- critical (submitting, grading) may use every slot, including the
+  ADMISSION_RESERVED slots nobody else can take, and queues for up to
+  ADMISSION_QUEUE_TIMEOUT seconds.
+- normal (everything else) uses the unreserved slots and queues the same way.
+- low (dashboards, analytics) is further capped at ADMISSION_LOW_LIMIT
+  concurrent requests and only waits ADMISSION_LOW_QUEUE_TIMEOUT seconds
+  (0 = shed at once).
+
+A freed slot goes to the highest priority waiting. Requests that cannot be
+admitted in time, or that find ADMISSION_MAX_QUEUE requests already queued,
+are shed with a 503 and a Retry-After header before Flask (or the session
+store) sees them. Static files and /metrics are never queued.
+
+The counters behind stats() (in flight, queue depth, admitted and shed per
+class) are per process, like the limit itself.
+"""
+import json
+import re
+import threading
+import time
+from flask import current_app, render_template
+from werkzeug.wsgi import ClosingIterator
+
+
+PRIORITIES = ('critical', 'normal', 'low')
+
+# (method or None, path regex, class); first match wins, default normal
+DEFAULT_RULES = [
+    ('POST', r'^/student/assignments/submit$', 'critical'),
+    ('POST', r'^/teacher/submissions/\d+/grade$', 'critical'),
+    # The assignment page is where teachers grade from
+    (None, r'^/teacher/assignments/\d+(/grade)?$', 'critical'),
+    (None, r'^/static/', None),
+    (None, r'^/favicon\.ico$', None),
+    (None, r'^/metrics$', None),
+    (None, r'^/(student|teacher|admin)/dashboard$', 'low'),
+    (None, r'^/teacher/classes/\d+$', 'low'),
+    (None, r'^/teacher/(grades|api/grades|export_grades)$', 'low'),
+    (None, r'^/student/grades$', 'low'),
+    (None, r'^/admin/(stats/refresh|activity-log|api/activity)$', 'low'),
+]
+
+
+class AdmissionController:
+    """
+    Concurrency limit with per-class reservations and a priority queue
+
+    Args:
+        max_concurrent (int): Requests allowed to run at once
+        reserved (int): Slots only critical requests may use
+        low_limit (int): Most low-priority requests running at once
+        max_queue (int): Most requests waiting at once, across classes
+        queue_timeout (float): Seconds critical/normal requests may wait
+        low_queue_timeout (float): Seconds low-priority requests may wait
+        clock: Monotonic time source (for tests)
+    """
+
+    def __init__(self, max_concurrent, reserved=0, low_limit=None, max_queue=64,
+                 queue_timeout=5.0, low_queue_timeout=0.0, clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.reserved = min(reserved, max_concurrent - 1)
+        self.low_limit = low_limit if low_limit is not None else max_concurrent
+        self.max_queue = max_queue
+        self.timeouts = {'critical': queue_timeout, 'normal': queue_timeout, 'low': low_queue_timeout}
+        self.clock = clock
+        self.in_flight = dict.fromkeys(PRIORITIES, 0)
+        self.waiting = dict.fromkeys(PRIORITIES, 0)
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.shed = dict.fromkeys(PRIORITIES, 0)
+        self._cond = threading.Condition()
+
+    def _can_run(self, priority):
+        running = sum(self.in_flight.values())
+        if priority == 'critical':
+            return running < self.max_concurrent
+        # Waiting critical requests get the next free slot
+        if self.waiting['critical'] or running >= self.max_concurrent - self.reserved:
+            return False
+        if priority == 'low':
+            return not self.waiting['normal'] and self.in_flight['low'] < self.low_limit
+        return True
+
+    def acquire(self, priority):
+        """
+        Take a slot for a request, waiting up to the class's queue timeout
+
+        Returns:
+            bool: True if admitted (call release() when done), False if shed
+        """
+        with self._cond:
+            if self._can_run(priority):
+                return self._admit(priority)
+            timeout = self.timeouts[priority]
+            if timeout <= 0 or sum(self.waiting.values()) >= self.max_queue:
+                self.shed[priority] += 1
+                return False
+
+            deadline = self.clock() + timeout
+            self.waiting[priority] += 1
+            try:
+                while not self._can_run(priority):
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.shed[priority] += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting[priority] -= 1
+                # A lower-priority waiter may have been held back by this one
+                self._cond.notify_all()
+            return self._admit(priority)
+
+    def _admit(self, priority):
+        self.in_flight[priority] += 1
+        self.admitted[priority] += 1
+        return True
+
+    def release(self, priority):
+        """Give back the slot of a finished request"""
+        with self._cond:
+            self.in_flight[priority] -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Snapshot of the admission counters
+
+        Returns:
+            dict: max_concurrent, reserved, and per-class in_flight,
+                queue_depth, admitted and shed dicts
+        """
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'reserved': self.reserved,
+                'in_flight': dict(self.in_flight),
+                'queue_depth': dict(self.waiting),
+                'admitted': dict(self.admitted),
+                'shed': dict(self.shed),
+            }
+
+
+class AdmissionMiddleware:
+    """
+    WSGI middleware that runs each request through an AdmissionController
+
+    Args:
+        app: Flask application (its wsgi_app is wrapped)
+        controller (AdmissionController): Slot accounting
+        rules (list): (method, path regex, class) tuples; class None = exempt
+        retry_after (int): Value of the Retry-After header on shed requests
+    """
+
+    def __init__(self, app, controller, rules=None, retry_after=2):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.controller = controller
+        self.rules = [(method, re.compile(pattern), priority)
+                      for method, pattern, priority in (rules or DEFAULT_RULES)]
+        self.retry_after = retry_after
+        self._busy_page = None
+
+    def classify(self, method, path):
+        """Return the priority class of a request, or None if it is exempt"""
+        for rule_method, pattern, priority in self.rules:
+            if (rule_method is None or rule_method == method) and pattern.match(path):
+                return priority
+        return 'normal'
+
+    def __call__(self, environ, start_response):
+        priority = self.classify(environ.get('REQUEST_METHOD', 'GET'), environ.get('PATH_INFO', ''))
+        if priority is None:
+            return self.wsgi_app(environ, start_response)
+        if not self.controller.acquire(priority):
+            return self._shed(environ, start_response)
+
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.controller.release(priority)
+            raise
+        # Held until the response body has been sent
+        return ClosingIterator(app_iter, lambda: self.controller.release(priority))
+
+    def _shed(self, environ, start_response):
+        message = 'The server is busy. Please try again in a moment.'
+        # Same negotiation as the app's own 503 handler
+        if 'text/html' in environ.get('HTTP_ACCEPT', ''):
+            body, content_type = self._render_busy_page(message), 'text/html; charset=utf-8'
+        else:
+            body = json.dumps({'success': False, 'message': message}).encode()
+            content_type = 'application/json'
+        start_response('503 SERVICE UNAVAILABLE', [
+            ('Content-Type', content_type),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(self.retry_after)),
+        ])
+        return [body]
+
+    def _render_busy_page(self, message):
+        # Rendered once; shedding must stay cheaper than serving
+        if self._busy_page is None:
+            with self.app.test_request_context():
+                self._busy_page = render_template('errors/503.html', message=message).encode()
+        return self._busy_page
+
+
+def init_app(app):
+    """Wrap the app in admission control if ADMISSION_MAX_CONCURRENT is set"""
+    max_concurrent = app.config.get('ADMISSION_MAX_CONCURRENT', 0)
+    if max_concurrent <= 0:
+        return
+    controller = AdmissionController(
+        max_concurrent,
+        reserved=app.config.get('ADMISSION_RESERVED', 0),
+        low_limit=app.config.get('ADMISSION_LOW_LIMIT') or None,
+        max_queue=app.config.get('ADMISSION_MAX_QUEUE', 64),
+        queue_timeout=app.config.get('ADMISSION_QUEUE_TIMEOUT', 5.0),
+        low_queue_timeout=app.config.get('ADMISSION_LOW_QUEUE_TIMEOUT', 0.0)
+    )
+    app.wsgi_app = AdmissionMiddleware(
+        app, controller,
+        rules=app.config.get('ADMISSION_RULES'),
+        retry_after=app.config.get('ADMISSION_RETRY_AFTER', 2)
+    )
+    app.extensions['admission'] = controller
+
+
+def admission_stats():
+    """
+    Admission counters of the current application
+
+    Returns:
+        dict: See AdmissionController.stats(), or None when admission control is off
+    """
+    controller = current_app.extensions.get('admission')
+    return controller.stats() if controller is not None else None
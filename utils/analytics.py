@@ -0,0 +1,202 @@
+"""
+Vectorized grade analytics for classes and assignments
+
+Grades are pulled in a single query per class or assignment and every
+statistic is computed with NumPy array operations. Results are cached
+under the version the class or assignment has in the database, which every
+write to its grades, submissions or enrolments raises (utils/versions.py),
+so a change made by any worker makes the cached result unreachable.
+"""
+import numpy as np
+from extensions import db
+from models.assignment import Assignment
+from models.class_model import Class
+from models.submission import Submission
+from utils.cache import LRUCache
+
+
+# Letter buckets in histogram order: F [0, 60), D [60, 70), ... A [90, 100]
+GRADE_BINS = np.array([0, 60, 70, 80, 90, 100], dtype=float)
+GRADE_LETTERS = ('F', 'D', 'C', 'B', 'A')
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_cache = LRUCache(maxsize=512, name='grade_analytics')
+
+
+def _version(model, entity_id):
+    # The view has usually loaded the row already; updated_at is included as
+    # counters start again at 1 in a recreated database
+    obj = db.session.get(model, entity_id)
+    return (obj.version, obj.updated_at) if obj is not None else None
+
+
+def letter_distribution(grades):
+    """
+    Bucket grades into A-F in one vectorized pass
+
+    Args:
+        grades: Sequence or array of numeric grades (0-100)
+
+    Returns:
+        tuple: (counts: dict letter -> int, percents: dict letter -> int)
+    """
+    grades = np.asarray(grades, dtype=float)
+    counts, _ = np.histogram(grades, bins=GRADE_BINS)
+    total = counts.sum()
+    percents = np.rint(counts * 100.0 / total) if total else np.zeros_like(counts)
+    # Report in A-F order to match the templates
+    letters = GRADE_LETTERS[::-1]
+    counts, percents = counts[::-1], percents[::-1]
+    return (
+        {letter: int(c) for letter, c in zip(letters, counts)},
+        {letter: int(p) for letter, p in zip(letters, percents)}
+    )
+
+
+def summarize(grades):
+    """
+    Compute descriptive statistics for an array of grades
+
+    Args:
+        grades: Sequence or array of numeric grades
+
+    Returns:
+        dict: count, mean, median, std, min, max, percentiles and distribution,
+        or None when there are no grades
+    """
+    grades = np.asarray(grades, dtype=float)
+    if grades.size == 0:
+        return None
+
+    percentile_values = np.percentile(grades, PERCENTILES)
+    counts, percents = letter_distribution(grades)
+    return {
+        'count': int(grades.size),
+        'mean': round(float(grades.mean()), 1),
+        'median': round(float(np.median(grades)), 1),
+        'std': round(float(grades.std()), 1),
+        'min': round(float(grades.min()), 1),
+        'max': round(float(grades.max()), 1),
+        'percentiles': {p: round(float(v), 1) for p, v in zip(PERCENTILES, percentile_values)},
+        'distribution': counts,
+        'distribution_percent': percents
+    }
+
+
+def _group_stats(keys, grades):
+    """
+    Mean/std/count per key using bincount instead of a Python loop
+
+    Returns:
+        tuple: (unique_keys, inverse_index, counts, means, stds)
+    """
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=grades) / counts
+    squares = np.bincount(inverse, weights=grades * grades) / counts
+    stds = np.sqrt(np.maximum(squares - means * means, 0.0))
+    return unique_keys, inverse, counts, means, stds
+
+
+def _z_scores(grades, means, stds):
+    """Element-wise z-scores, 0 where the group has no spread"""
+    safe_stds = np.where(stds > 0, stds, 1.0)
+    return np.where(stds > 0, (grades - means) / safe_stds, 0.0)
+
+
+def _load_grades(*criteria):
+    """Fetch (assignment_id, student_id, grade) rows for graded submissions as arrays"""
+    rows = (
+        db.session.query(Submission.assignment_id, Submission.student_id, Submission.grade)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .filter(Submission.grade.isnot(None), *criteria)
+        .all()
+    )
+    if not rows:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty
+    data = np.array(rows, dtype=float)
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+
+
+def _compute_class_analytics(class_id):
+    assignment_ids, student_ids, grades = _load_grades(Assignment.class_id == class_id)
+    result = {
+        'summary': summarize(grades),
+        'assignments': {},
+        'students': {}
+    }
+    if grades.size == 0:
+        return result
+
+    keys, inverse, counts, means, stds = _group_stats(assignment_ids, grades)
+    for key, count, mean, std in zip(keys, counts, means, stds):
+        result['assignments'][int(key)] = {
+            'count': int(count),
+            'mean': round(float(mean), 1),
+            'std': round(float(std), 1),
+            # Share of the available points students did not get
+            'difficulty': round(float(1.0 - mean / 100.0), 2)
+        }
+
+    # A student's standing is their average z-score across assignments, so a
+    # hard assignment does not drag down everyone who took it
+    z = _z_scores(grades, means[inverse], stds[inverse])
+    student_keys, student_inverse = np.unique(student_ids, return_inverse=True)
+    student_counts = np.bincount(student_inverse)
+    student_means = np.bincount(student_inverse, weights=grades) / student_counts
+    student_z = np.bincount(student_inverse, weights=z) / student_counts
+    for key, count, mean, z_mean in zip(student_keys, student_counts, student_means, student_z):
+        result['students'][int(key)] = {
+            'count': int(count),
+            'mean': round(float(mean), 1),
+            'z_score': round(float(z_mean), 2)
+        }
+    return result
+
+
+def _compute_assignment_analytics(assignment_id):
+    _, student_ids, grades = _load_grades(Submission.assignment_id == assignment_id)
+    result = {
+        'summary': summarize(grades),
+        'students': {}
+    }
+    if grades.size == 0:
+        return result
+
+    z = _z_scores(grades, grades.mean(), grades.std())
+    result['students'] = {
+        int(student_id): round(float(score), 2) for student_id, score in zip(student_ids, z)
+    }
+    return result
+
+
+def class_analytics(class_id):
+    """
+    Get grade analytics for a class
+
+    Args:
+        class_id (int): Class to analyse
+
+    Returns:
+        dict: 'summary' (see summarize), 'assignments' mapping assignment id to
+        count/mean/std/difficulty, and 'students' mapping student id to
+        count/mean/z_score
+    """
+    key = ('class', class_id, _version(Class, class_id))
+    return _cache.get_or_set(key, lambda: _compute_class_analytics(class_id))
+
+
+def assignment_analytics(assignment_id):
+    """
+    Get grade analytics for a single assignment
+
+    Args:
+        assignment_id (int): Assignment to analyse
+
+    Returns:
+        dict: 'summary' (see summarize) and 'students' mapping student id to
+        the z-score of their grade within the assignment
+    """
+    key = ('assignment', assignment_id, _version(Assignment, assignment_id))
+    return _cache.get_or_set(key, lambda: _compute_assignment_analytics(assignment_id))
@@ -0,0 +1,271 @@
+"""
+Static asset pipeline and response compression
+
+`flask assets build` copies every stylesheet and script under the static
+folder to static/dist, minified, with a hash of the content in the name and
+gzip (and, with the brotli package, brotli) versions next to it:
+
+    css/style.css  ->  dist/css/style.3f2a1b9c0d.css
+                       dist/css/style.3f2a1b9c0d.css.gz
+                       dist/css/style.3f2a1b9c0d.css.br
+
+static/dist/manifest.json maps each source to its build. Once it exists,
+url_for('static', filename='css/style.css') links to the build, which is
+served with the precompressed file the client accepts and cached for
+ASSETS_MAX_AGE seconds as immutable; a changed file gets a new name, so
+nothing has to be invalidated. Sources without a build (or with
+ASSETS_FINGERPRINT off) are served as before. The manifest is read at
+startup, so restart workers after a build.
+
+Stylesheets are minified here. Scripts are minified with the rjsmin package
+if it is installed and copied unchanged otherwise; files named *.min.* are
+never minified again.
+
+HTML and JSON responses of at least COMPRESS_MIN_SIZE bytes are gzipped on
+the fly for clients that accept it (COMPRESS_ENABLED).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+# Try to import brotli and rjsmin (optional, build step only)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+logger = logging.getLogger(__name__)
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+SOURCE_EXTENSIONS = ('.css', '.js')
+HASH_LENGTH = 10
+
+# Content types compressed on the fly
+COMPRESSIBLE = ('text/html', 'application/json')
+
+# Precompressed variants, preferred first: (Accept-Encoding token, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+assets_cli = AppGroup('assets', help='Static asset pipeline.')
+
+
+def minify_css(css):
+    """
+    Strip comments and whitespace from a stylesheet
+
+    Strings are left alone, and /*! ... */ comments (licenses) are kept.
+
+    Args:
+        css (str): Stylesheet source
+
+    Returns:
+        str: The minified stylesheet
+    """
+    pieces, code = [], []
+
+    def squeeze():
+        text = _CSS_SPACE.sub(' ', ''.join(code))
+        pieces.append(_CSS_PUNCTUATION.sub(r'\1', text).replace(';}', '}'))
+        code.clear()
+
+    position = 0
+    for match in _CSS_TOKENS.finditer(css):
+        code.append(css[position:match.start()])
+        string, comment = match.groups()
+        if string or comment.startswith('/*!'):
+            squeeze()
+            pieces.append(match.group())
+        else:
+            code.append(' ')
+        position = match.end()
+    code.append(css[position:])
+    squeeze()
+    return ''.join(pieces).strip()
+
+
+def minify(path, content):
+    """Minify a stylesheet or script, unless its name says it already is"""
+    name = os.path.basename(path)
+    if '.min.' in name:
+        return content
+    if name.endswith('.css'):
+        return minify_css(content.decode('utf-8')).encode('utf-8')
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(content.decode('utf-8')).encode('utf-8')
+    return content
+
+
+def fingerprint(path, content):
+    """'css/style.css' -> 'css/style.<hash>.css'"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = os.path.splitext(path)
+    return f'{stem}.{digest}{extension}'
+
+
+def _sources(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder)
+        if relative_root == '.':
+            # Build output and user uploads are not assets
+            dirs[:] = sorted(d for d in dirs if d not in (BUILD_DIR, 'uploads'))
+        else:
+            dirs.sort()
+        for name in sorted(files):
+            if name.endswith(SOURCE_EXTENSIONS):
+                yield os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, '/')
+
+
+def build_assets(static_folder, gzip_level=9, brotli_quality=11):
+    """
+    Minify, fingerprint and precompress every asset under a static folder
+
+    The previous build is removed first.
+
+    Args:
+        static_folder (str): Folder to read; the build goes to its dist/
+        gzip_level (int): gzip compression level
+        brotli_quality (int): brotli quality (needs the brotli package)
+
+    Returns:
+        dict: Manifest mapping source paths to build paths, both relative
+            to the static folder
+    """
+    out_dir = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    if brotli is None:
+        logger.warning('brotli package not installed; building gzip versions only')
+
+    manifest = {}
+    for source in _sources(static_folder):
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            content = minify(source, f.read())
+        target = f'{BUILD_DIR}/{fingerprint(source, content)}'
+        target_path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with open(target_path, 'wb') as f:
+            f.write(content)
+        # mtime=0 keeps the .gz identical between builds of the same content
+        with open(target_path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=gzip_level, mtime=0))
+        if brotli is not None:
+            with open(target_path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=brotli_quality))
+        manifest[source] = target
+
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """The build manifest of an application's static folder"""
+
+    def __init__(self, app):
+        self.app = app
+        self.sources = {}
+        self.builds = set()
+
+    def load(self):
+        """Read static/dist/manifest.json; without one nothing is fingerprinted"""
+        path = os.path.join(self.app.static_folder, BUILD_DIR, MANIFEST)
+        try:
+            with open(path) as f:
+                self.sources = json.load(f)
+        except FileNotFoundError:
+            self.sources = {}
+        except (OSError, ValueError):
+            logger.warning('Could not read the asset manifest at %s', path, exc_info=True)
+            self.sources = {}
+        self.builds = set(self.sources.values())
+        return self
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def compress_response(response):
+    """Gzip a large HTML or JSON response if the client accepts it"""
+    config = current_app.config
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    data = response.get_data()
+    if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not _accepts('gzip'):
+        return response
+    response.set_data(gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6)))
+    response.headers['Content-Encoding'] = 'gzip'
+    # The gzipped body is a different representation of the same version
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Fingerprint static URLs, serve builds and compress responses"""
+    manifest = AssetManifest(app)
+    if app.config.get('ASSETS_FINGERPRINT', True):
+        manifest.load()
+    app.extensions['assets'] = manifest
+    app.cli.add_command(assets_cli)
+    serve_source = app.view_functions['static']
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest.sources:
+            values['filename'] = manifest.sources[values['filename']]
+
+    def static(filename):
+        if filename not in manifest.builds:
+            return serve_source(filename=filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if _accepts(encoding) and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+                response = send_from_directory(app.static_folder, filename + suffix,
+                                               mimetype=mimetype, max_age=app.config.get('ASSETS_MAX_AGE'))
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, mimetype=mimetype,
+                                           max_age=app.config.get('ASSETS_MAX_AGE'))
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
+
+    if app.config.get('COMPRESS_ENABLED', True):
+        app.after_request(compress_response)
+
+
+@assets_cli.command('build')
+def build_command():
+    """Minify, fingerprint and precompress static assets."""
+    manifest = build_assets(current_app.static_folder)
+    for source, target in sorted(manifest.items()):
+        click.echo(f'{source} -> {target}')
+    click.echo(f'Built {len(manifest)} assets; restart the app to serve them.')
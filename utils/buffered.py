@@ -0,0 +1,130 @@
+"""
+In-process write buffer flushed in batches by a background thread
+"""
+import atexit
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchBuffer:
+    """
+    Collect items in memory and hand them to a flush callback in batches
+
+    The buffer is flushed every `interval` seconds, as soon as it holds
+    `max_items` entries, on stop() and at interpreter exit. With
+    `asynchronous=False` every add() flushes inline, which keeps tests and
+    single-shot scripts deterministic.
+
+    The flush thread is started by the first add() in each process, not when
+    the app is created: a server that loads the app and then forks workers
+    (gunicorn --preload) would otherwise leave every worker without one.
+    Items whose flush fails are put back for the next flush, keeping at most
+    `max_pending` of them; beyond that the oldest are dropped.
+
+    Args:
+        flush_func (callable): Called with a non-empty list of items
+        max_items (int): Buffer size that triggers an early flush
+        interval (float): Seconds between periodic flushes
+        asynchronous (bool): Flush from a background thread
+        name (str): Thread name, used in logs
+        max_pending (int): Most items kept while flushes fail
+            (default: 10 * max_items)
+    """
+
+    def __init__(self, flush_func, max_items=100, interval=2.0, asynchronous=True, name='batch-buffer',
+                 max_pending=None):
+        self.flush_func = flush_func
+        self.max_items = max_items
+        self.interval = interval
+        self.asynchronous = asynchronous
+        self.name = name
+        self.max_pending = max_pending or max_items * 10
+        self._reset()
+
+    def _reset(self):
+        # Fresh state for this process; a forked child must not reuse the
+        # parent's locks or think the parent's thread is its own
+        self._pid = os.getpid()
+        self._items = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background flush thread of this process (no-op in synchronous mode)"""
+        if not self.asynchronous:
+            return
+        if self._pid != os.getpid():
+            # Forked: whatever was buffered belongs to the parent, which flushes it
+            self._reset()
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def add(self, item):
+        """Queue an item for the next flush"""
+        self.start()
+        with self._lock:
+            self._items.append(item)
+            full = len(self._items) >= self.max_items
+        if not self.asynchronous:
+            self.flush()
+        elif full:
+            self._wakeup.set()
+
+    def pending(self):
+        """Number of items waiting to be flushed"""
+        return len(self._items)
+
+    def flush(self):
+        """Hand every buffered item to flush_func now"""
+        with self._flush_lock:
+            with self._lock:
+                items, self._items = self._items, []
+            if not items:
+                return 0
+            try:
+                self.flush_func(items)
+            except Exception:
+                logger.exception('%s: failed to flush %d items, keeping them for the next flush',
+                                 self.name, len(items))
+                self._requeue(items)
+                return 0
+            return len(items)
+
+    def _requeue(self, items):
+        with self._lock:
+            self._items[:0] = items
+            dropped = len(self._items) - self.max_pending
+            if dropped > 0:
+                del self._items[:dropped]
+        if dropped > 0:
+            logger.error('%s: dropped %d items that could not be flushed', self.name, dropped)
+
+    def stop(self):
+        """Flush remaining items and stop the background thread"""
+        if self._pid != os.getpid():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
@@ -0,0 +1,151 @@
+"""
+Class catalog queries for students
+
+A catalog page costs two queries however many classes it shows: one count
+of the matching classes and one page query. The page query picks the page
+of classes first (joining the teacher and marking the classes the student
+is enrolled in with one outer join against their class_student rows), then
+takes student and assignment counts for just those classes from a single
+grouped subquery.
+"""
+from sqlalchemy import func, literal, or_, select, union_all
+from extensions import db
+from models.assignment import Assignment
+from models.class_model import Class, class_student
+from models.teacher import Teacher
+from models.user import User
+
+
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 50
+
+
+def _class_counts(class_ids):
+    # Enrollments and assignments of the given classes stacked into one
+    # (class_id, students, assignments) stream, then summed once per class
+    rows = union_all(
+        select(class_student.c.class_id.label('class_id'),
+               literal(1).label('students'), literal(0).label('assignments'))
+        .where(class_student.c.class_id.in_(class_ids)),
+        select(Assignment.class_id.label('class_id'),
+               literal(0).label('students'), literal(1).label('assignments'))
+        .where(Assignment.class_id.in_(class_ids))
+    ).subquery()
+    return (
+        select(rows.c.class_id,
+               func.sum(rows.c.students).label('student_count'),
+               func.sum(rows.c.assignments).label('assignment_count'))
+        .group_by(rows.c.class_id)
+        .subquery('class_counts')
+    )
+
+
+def _enrolled_class_ids(student_id):
+    # DISTINCT because class_student has no unique constraint
+    return (
+        select(class_student.c.class_id)
+        .where(class_student.c.student_id == student_id)
+        .distinct()
+        .subquery('enrolled')
+    )
+
+
+def class_catalog(student_id, search=None, enrolled=None, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of the class catalog as seen by a student
+
+    Args:
+        student_id (int): Student whose enrollments are marked
+        search (str): Case-insensitive match on class name or teacher name
+        enrolled (bool): Only enrolled (True) or only not enrolled (False) classes
+        page (int): 1-based page number
+        per_page (int): Page size, capped at MAX_PAGE_SIZE
+
+    Returns:
+        dict: items (list of dicts), total, page, per_page and pages
+    """
+    page = max(page or 1, 1)
+    per_page = min(max(per_page or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    enrolled_ids = _enrolled_class_ids(student_id)
+
+    filters = []
+    if search:
+        search = search.strip()
+        filters.append(or_(
+            Class.name.icontains(search, autoescape=True),
+            Teacher.first_name.icontains(search, autoescape=True),
+            Teacher.last_name.icontains(search, autoescape=True),
+            User.username.icontains(search, autoescape=True)
+        ))
+    if enrolled is True:
+        filters.append(enrolled_ids.c.class_id.isnot(None))
+    elif enrolled is False:
+        filters.append(enrolled_ids.c.class_id.is_(None))
+
+    def with_joins(query):
+        return (
+            query
+            .outerjoin(Teacher, Teacher.id == Class.teacher_id)
+            .outerjoin(User, User.id == Teacher.user_id)
+            .outerjoin(enrolled_ids, enrolled_ids.c.class_id == Class.id)
+            .filter(*filters)
+        )
+
+    total = with_joins(db.session.query(func.count(Class.id))).scalar()
+
+    page_rows = (
+        with_joins(db.session.query(
+            Class.id.label('id'), Class.name.label('name'), Class.description.label('description'),
+            Class.teacher_id.label('teacher_id'), Class.created_at.label('created_at'),
+            Teacher.first_name.label('first_name'), Teacher.last_name.label('last_name'),
+            User.username.label('username'),
+            enrolled_ids.c.class_id.isnot(None).label('enrolled')
+        ))
+        .order_by(Class.name, Class.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .cte('page')
+    )
+    # Counted for the classes on this page only, not the whole catalog
+    counts = _class_counts(select(page_rows.c.id))
+    rows = (
+        db.session.query(
+            page_rows.c.id, page_rows.c.name, page_rows.c.description,
+            page_rows.c.teacher_id, page_rows.c.created_at,
+            page_rows.c.first_name, page_rows.c.last_name, page_rows.c.username,
+            func.coalesce(counts.c.student_count, 0),
+            func.coalesce(counts.c.assignment_count, 0),
+            page_rows.c.enrolled
+        )
+        .outerjoin(counts, counts.c.class_id == page_rows.c.id)
+        .order_by(page_rows.c.name, page_rows.c.id)
+        .all()
+    )
+
+    items = []
+    for (class_id, name, description, teacher_id, created_at, first_name, last_name,
+         username, student_count, assignment_count, is_enrolled) in rows:
+        if teacher_id is None:
+            teacher = 'No Teacher'
+        else:
+            # Same fallback as Teacher.full_name, without loading the teacher
+            teacher = f"{first_name or ''} {last_name or ''}".strip() or username or 'Unknown'
+        items.append({
+            'id': class_id,
+            'name': name,
+            'description': description or 'No description',
+            'teacher': teacher,
+            'teacher_id': teacher_id,
+            'created_at': created_at.strftime('%b %d, %Y') if created_at else 'N/A',
+            'student_count': int(student_count),
+            'assignment_count': int(assignment_count),
+            'enrolled': bool(is_enrolled)
+        })
+
+    return {
+        'items': items,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page
+    }
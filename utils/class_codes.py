@@ -0,0 +1,74 @@
+"""
+Class code resolution
+
+Join attempts (including mistyped and guessed codes) resolve a code to a
+class id through a small LRU instead of querying the classes table each
+time. Unknown codes are cached too, for a shorter time, so repeating an
+invalid code never reaches the database. Malformed codes are rejected
+without touching either.
+"""
+import re
+from sqlalchemy import event
+from extensions import db
+from models.class_model import Class, CLASS_CODE_LENGTH
+from utils.cache import LRUCache
+
+
+# Unknown codes are remembered briefly: a class created in another worker
+# becomes joinable here after at most this many seconds
+NEGATIVE_TTL = 60
+
+_CODE_PATTERN = re.compile(rf'^[A-Z0-9]{{{CLASS_CODE_LENGTH}}}$')
+_MISSING = object()
+
+_cache = LRUCache(maxsize=4096, ttl=3600, name='class_codes')
+
+
+def normalize_code(code):
+    """Uppercase and strip a user-entered class code"""
+    return (code or '').strip().upper()
+
+
+def resolve_class_code(code):
+    """
+    Look up the class id for a join code
+
+    Args:
+        code (str): Class code as entered by the student
+
+    Returns:
+        int: Class id, or None if no class has this code
+    """
+    code = normalize_code(code)
+    if not _CODE_PATTERN.match(code):
+        return None
+
+    class_id = _cache.get(code, _MISSING)
+    if class_id is _MISSING:
+        class_id = db.session.query(Class.id).filter_by(class_code=code).scalar()
+        _cache.set(code, class_id, ttl=None if class_id else NEGATIVE_TTL)
+    return class_id
+
+
+def get_class_by_code(code):
+    """
+    Load the class for a join code
+
+    Returns:
+        Class: The class, or None if the code is unknown
+    """
+    class_id = resolve_class_code(code)
+    if class_id is None:
+        return None
+    cls = db.session.get(Class, class_id)
+    if cls is None:
+        # Deleted in another worker since it was cached
+        _cache.delete(normalize_code(code))
+    return cls
+
+
+@event.listens_for(Class, 'after_insert')
+@event.listens_for(Class, 'after_delete')
+def _forget_code(mapper, connection, target):
+    # Drop a cached "unknown" answer for a new code, or the id of a deleted class
+    _cache.delete(target.class_code)
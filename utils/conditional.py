@@ -0,0 +1,95 @@
+"""
+Conditional GET from version stamps
+
+A view that can say which rows its body is made of answers a repeated
+request with 304 Not Modified before loading or rendering anything else:
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    etag = version_etag(assignment, student.id)
+    cached = not_modified(etag, assignment.updated_at)
+    if cached is not None:
+        return cached
+    ...
+    return with_validators(jsonify(...), etag, assignment.updated_at)
+
+The ETag is a strong hash of each part: model instances by table, id and
+version counter (bumped by utils/versions.py on every write to what they
+show), other values by str(). Last-Modified comes from updated_at, which
+the same bump sets. Responses are marked "private, no-cache", so browsers
+keep the body but ask again every time, and shared caches keep nothing.
+"""
+import hashlib
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def version_etag(*parts):
+    """
+    Build a strong ETag from the versions a response is made of
+
+    Args:
+        *parts: Model instances (keyed by table, id and version) and other
+            values such as the id of the user the body is for
+
+    Returns:
+        str: Hex digest, unquoted
+    """
+    segments = []
+    for part in parts:
+        table = getattr(part, '__tablename__', None)
+        if table is not None:
+            segments.append(f'{table}/{part.id}@{getattr(part, "version", 0)}')
+        else:
+            segments.append(str(part))
+    return hashlib.sha1('|'.join(segments).encode('utf-8')).hexdigest()
+
+
+def latest(*timestamps):
+    """The most recent of some updated_at values, ignoring missing ones"""
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def with_validators(response, etag, last_modified=None):
+    """
+    Add ETag, Last-Modified and Cache-Control to a response
+
+    Args:
+        response: Anything make_response() accepts
+        etag (str): From version_etag()
+        last_modified (datetime): When the newest part last changed (UTC)
+
+    Returns:
+        Response: The response, with validators set
+    """
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Answer 304 if the client already has this version of the response
+
+    If-None-Match is compared with the ETag; If-Modified-Since is only
+    looked at when the request sends no If-None-Match.
+
+    Args:
+        etag (str): From version_etag()
+        last_modified (datetime): When the newest part last changed (UTC)
+
+    Returns:
+        Response: A 304 with the validators set, or None if the client's
+            copy is missing or stale and the full response has to be built
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(('', 304), etag, last_modified)
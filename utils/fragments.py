@@ -0,0 +1,161 @@
+"""
+Fragment caching for Jinja templates
+
+    {% cache 'class-roster', class_obj %}
+        ... a large table ...
+    {% endcache %}
+
+The block's rendered HTML is stored under a key made of the fragment name,
+every model instance passed after it (its table, id and version counter,
+see utils/versions.py), str() of any other value passed, and the role of
+the current user. A write that changes what the block shows bumps the
+version, so the next render misses and the old entry is never looked up
+again; it ages out of the cache instead of being deleted. Anything in the
+block that differs per user beyond the role (names, CSRF tokens) has to be
+passed as a key part or kept outside the block.
+
+The body only runs on a miss, so a view can pass functions that load the
+block's data and save the queries as well as the rendering on a hit.
+
+Fragments live in one of two stores (FRAGMENT_CACHE_BACKEND):
+    memory  per-process LRU of FRAGMENT_CACHE_MAX_ENTRIES (default)
+    redis   a Redis server at FRAGMENT_CACHE_REDIS_URL, shared by every
+            worker (needs the redis package)
+
+Entries expire after FRAGMENT_CACHE_TTL seconds, which bounds how long a
+change that bumps no version (a teacher renaming themselves) stays
+unnoticed. With FRAGMENT_CACHE_ENABLED off the tag renders its body every
+time.
+"""
+import logging
+from flask import current_app, has_request_context
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from utils.cache import LRUCache
+from utils import versions  # noqa: F401 - registers the version bumps keys rely on
+
+# Try to import redis (optional, only needed for FRAGMENT_CACHE_BACKEND=redis)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'fragment:'
+
+
+class MemoryStore:
+    """Fragments in a per-process, size-bounded LRU"""
+
+    def __init__(self, max_entries=1000, ttl=None):
+        self.cache = LRUCache(maxsize=max_entries, ttl=ttl, name='fragments')
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, html):
+        self.cache.set(key, html)
+
+
+class RedisStore:
+    """Fragments in Redis, shared by every worker"""
+
+    def __init__(self, url, ttl=None):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            value = self.client.get(KEY_PREFIX + key)
+        except redis.RedisError:
+            logger.warning('Fragment cache unavailable; rendering without it', exc_info=True)
+            return None
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, html):
+        try:
+            self.client.set(KEY_PREFIX + key, html.encode('utf-8'), ex=self.ttl)
+        except redis.RedisError:
+            logger.warning('Could not store a fragment', exc_info=True)
+
+
+def _create_store(app):
+    ttl = app.config.get('FRAGMENT_CACHE_TTL', 600) or None
+    name = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    if name == 'redis':
+        if redis is not None:
+            return RedisStore(app.config.get('FRAGMENT_CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl=ttl)
+        logger.warning('FRAGMENT_CACHE_BACKEND=redis but the redis package is not installed; '
+                       'using a per-process cache')
+    elif name != 'memory':
+        raise ValueError(f"Unknown FRAGMENT_CACHE_BACKEND '{name}'")
+    return MemoryStore(max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 1000), ttl=ttl)
+
+
+def fragment_key(name, parts, role):
+    """
+    Build the cache key of a fragment
+
+    Args:
+        name (str): Fragment name
+        parts (list): Model instances (keyed by table, id and version) and
+            other values (keyed by str())
+        role (str): Role of the user the fragment is rendered for
+
+    Returns:
+        str: e.g. "class-roster:classes/3@7:teacher"
+    """
+    segments = [str(name)]
+    for part in parts:
+        table = getattr(part, '__tablename__', None)
+        if table is not None:
+            segments.append(f'{table}/{part.id}@{getattr(part, "version", 0)}')
+        else:
+            segments.append(str(part))
+    segments.append(role or 'anonymous')
+    return ':'.join(segments)
+
+
+def _current_role():
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.role
+    return None
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache name, *parts %} ... {% endcache %} tag"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        parts = []
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [name, nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, parts, caller):
+        store = current_app.extensions.get('fragment_cache')
+        if store is None:
+            return caller()
+        key = fragment_key(name, parts, _current_role())
+        html = store.get(key)
+        if html is None:
+            html = str(caller())
+            store.set(key, html)
+        # The body was escaped when it was rendered
+        return Markup(html)
+
+
+def init_app(app):
+    """Add the {% cache %} tag to an application's templates and create its store"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        app.extensions['fragment_cache'] = _create_store(app)
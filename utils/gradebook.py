@@ -0,0 +1,197 @@
+"""
+Teacher gradebook queries
+
+Grades are read one page at a time, newest submission first, with keyset
+pagination on the submission id: the next page starts strictly after the
+last row of the previous one instead of at an OFFSET, so any page costs one
+bounded index walk however long the teacher's history is. The cursor handed
+to clients is the last row's id as a string.
+
+"Newest" is by first submission. A resubmit updates its row in place and
+keeps its id, so it keeps its position; ordering on submitted_at instead
+would move it to the top, and a teacher part-way through the pages would
+never see it.
+
+Filters (class, assignment, graded/pending, submission date range) apply to
+both the page and the summary counts. Summaries are cached per teacher and
+filters, keyed on the versions of the teacher's classes, which go up with
+every submission and grade (utils/versions.py), so paging through the
+gradebook aggregates once.
+"""
+from sqlalchemy import case, func
+from extensions import db
+from models.assignment import Assignment
+from models.class_model import Class
+from models.student import Student
+from models.submission import Submission
+from utils.cache import LRUCache
+from utils.versions import class_versions
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STATUSES = ('graded', 'pending')
+
+_summary_cache = LRUCache(maxsize=256, name='grade_summary')
+
+
+def encode_cursor(submission_id):
+    """Encode the key of the last row on a page"""
+    return str(submission_id)
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        int: Id of the last submission on the previous page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    return int(cursor)
+
+
+def _filters(teacher_id, class_id=None, assignment_id=None, status=None, start=None, end=None):
+    filters = [Class.teacher_id == teacher_id]
+    if class_id:
+        filters.append(Class.id == class_id)
+    if assignment_id:
+        filters.append(Submission.assignment_id == assignment_id)
+    if status == 'graded':
+        filters.append(Submission.grade.isnot(None))
+    elif status == 'pending':
+        filters.append(Submission.grade.is_(None))
+    if start:
+        filters.append(Submission.submitted_at >= start)
+    if end:
+        filters.append(Submission.submitted_at < end)
+    return filters
+
+
+def grade_page(teacher_id, cursor=None, limit=DEFAULT_PAGE_SIZE, **filters):
+    """
+    Get one page of a teacher's submissions, newest first
+
+    Args:
+        teacher_id (int): Teacher whose classes are listed
+        cursor (str): next_cursor of the previous page, None for the first page
+        limit (int): Page size, capped at MAX_PAGE_SIZE
+        **filters: class_id, assignment_id, status ('graded' or 'pending'),
+            start and end (datetimes, end exclusive)
+
+    Returns:
+        dict: items (list of dicts), next_cursor (None on the last page) and limit
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+    query = (
+        db.session.query(
+            Submission.id, Submission.submitted_at, Submission.grade, Submission.feedback,
+            Student.id, Student.first_name, Student.last_name,
+            Assignment.id, Assignment.title, Class.id, Class.name
+        )
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Class, Assignment.class_id == Class.id)
+        .join(Student, Submission.student_id == Student.id)
+        .filter(*_filters(teacher_id, **filters))
+    )
+    if cursor:
+        query = query.filter(Submission.id < decode_cursor(cursor))
+
+    # One extra row tells whether there is a next page
+    rows = (
+        query
+        .order_by(Submission.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    for (submission_id, submitted_at, grade, feedback, student_id, first_name, last_name,
+         assignment_id, title, class_id, class_name) in rows:
+        items.append({
+            'submission_id': submission_id,
+            'student_id': student_id,
+            'student_name': f"{first_name or ''} {last_name or ''}".strip(),
+            'class_id': class_id,
+            'class_name': class_name,
+            'assignment_id': assignment_id,
+            'assignment_title': title,
+            'submitted_at': submitted_at.isoformat() if submitted_at else None,
+            'submission_date': submitted_at.strftime('%b %d, %Y') if submitted_at else 'N/A',
+            'grade': grade if grade is not None else 'Not graded',
+            'feedback': feedback or '',
+            'status': 'Graded' if grade is not None else 'Pending',
+        })
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last[0])
+
+    return {'items': items, 'next_cursor': next_cursor, 'limit': limit}
+
+
+def grade_summary(teacher_id, **filters):
+    """
+    Count and average a teacher's submissions in one query
+
+    Args:
+        teacher_id (int): Teacher whose classes are counted
+        **filters: Same filters as grade_page
+
+    Returns:
+        dict: total, graded, pending and average (None when nothing is graded)
+    """
+    key = (teacher_id, class_versions(teacher_id), tuple(sorted(filters.items())))
+    return _summary_cache.get_or_set(key, lambda: _compute_summary(teacher_id, **filters))
+
+
+def _compute_summary(teacher_id, **filters):
+    total, graded, average = (
+        db.session.query(
+            func.count(Submission.id),
+            func.coalesce(func.sum(case((Submission.grade.isnot(None), 1), else_=0)), 0),
+            func.avg(Submission.grade)
+        )
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Class, Assignment.class_id == Class.id)
+        .filter(*_filters(teacher_id, **filters))
+        .one()
+    )
+    return {
+        'total': total,
+        'graded': int(graded),
+        'pending': total - int(graded),
+        'average': round(average, 1) if average is not None else None,
+    }
+
+
+def grade_filter_options(teacher_id):
+    """
+    List the teacher's classes and assignments for the filter dropdowns
+
+    Returns:
+        dict: classes as (id, name) and assignments as (id, class_name, title) tuples
+    """
+    rows = (
+        db.session.query(Class.id, Class.name, Assignment.id, Assignment.title)
+        .outerjoin(Assignment, Assignment.class_id == Class.id)
+        .filter(Class.teacher_id == teacher_id)
+        .order_by(Class.name, Class.id, Assignment.title)
+        .all()
+    )
+    classes = {}
+    assignments = []
+    for class_id, class_name, assignment_id, title in rows:
+        classes.setdefault(class_id, class_name)
+        if assignment_id is not None:
+            assignments.append((assignment_id, class_name, title))
+    return {'classes': list(classes.items()), 'assignments': assignments}
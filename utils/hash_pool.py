@@ -0,0 +1,124 @@
+"""
+Bounded worker pool for password hashing
+
+Password hashes cost tens of milliseconds of CPU and hold the GIL while they
+run. When PASSWORD_HASH_WORKERS > 0, utils.passwords submits hashing and
+verification to a process pool instead of running them on the request
+thread. The pool admits at most workers + PASSWORD_HASH_QUEUE_SIZE jobs;
+anything beyond that, or a job that is not finished within
+PASSWORD_HASH_TIMEOUT seconds, raises HashPoolBusy. The app turns that into
+a 503 with a Retry-After header, so login spikes fail fast instead of
+growing latency without bound.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app, jsonify, render_template, request
+
+
+class HashPoolBusy(Exception):
+    """Raised when the hashing pool cannot take or finish a job in time"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Password hashing pool is saturated')
+        self.retry_after = retry_after
+
+
+class HashPool:
+    """
+    Process pool with a bounded admission queue and a per-job timeout
+
+    Args:
+        workers (int): Number of worker processes
+        max_pending (int): Jobs allowed to wait for a free worker
+        timeout (float): Seconds to wait for a job before giving up
+        retry_after (int): Value of the Retry-After header on rejection
+    """
+
+    def __init__(self, workers, max_pending=32, timeout=5.0, retry_after=1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily and per process, so pre-forking servers give each
+        # worker its own pool instead of sharing one across a fork
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, func, *args):
+        """
+        Run func(*args) in the pool and return its result
+
+        Raises:
+            HashPoolBusy: If the queue is full or the job times out
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashPoolBusy(self.retry_after)
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot stays taken until the job really finishes, even if the
+        # caller stops waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise HashPoolBusy(self.retry_after) from None
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def init_app(app):
+    """Create the pool if PASSWORD_HASH_WORKERS is set and register the 503 handler"""
+    workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if workers > 0:
+        app.extensions['hash_pool'] = HashPool(
+            workers,
+            max_pending=app.config.get('PASSWORD_HASH_QUEUE_SIZE', 32),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 5.0),
+            retry_after=app.config.get('PASSWORD_HASH_RETRY_AFTER', 1)
+        )
+    app.register_error_handler(HashPoolBusy, handle_busy)
+
+
+def run_hash_job(func, *args):
+    """Run a hashing function in the pool when one is configured, else inline"""
+    pool = current_app.extensions.get('hash_pool')
+    if pool is None:
+        return func(*args)
+    return pool.run(func, *args)
+
+
+def handle_busy(error):
+    """Reject the request with 503 + Retry-After"""
+    message = 'The server is busy. Please try again in a moment.'
+    # Page navigations ask for text/html explicitly; fetch() calls send */*
+    if 'text/html' in request.accept_mimetypes.values():
+        response = current_app.make_response(render_template('errors/503.html', message=message))
+    else:
+        response = jsonify({'success': False, 'message': message})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
@@ -0,0 +1,222 @@
+"""
+Structured, non-blocking application logging
+
+Log calls on a request thread only put the record on an in-memory queue
+(QueueHandler); a QueueListener thread formats it and does the file I/O.
+The queue is bounded by LOG_QUEUE_SIZE: when it is full, records are
+dropped and counted instead of making the request wait.
+
+Records are written as one JSON object per line (LOG_FORMAT=json, default)
+or as plain text, to LOG_FILE, rotated at LOG_MAX_BYTES with
+LOG_BACKUP_COUNT old files kept. Every record logged while a request is
+being served carries its request id, user id, method, path and endpoint;
+these are captured on the request thread, before the record is queued.
+
+Each request gets an id (the incoming X-Request-ID header if it looks
+sane, otherwise a new one) that is echoed in the X-Request-ID response
+header, and with LOG_REQUESTS an access record ("access" logger) with its
+status, duration, query count and DB time.
+
+Handlers are attached to app.logger and to the "utils", "routes" and
+"access" loggers, not to the root logger, so libraries that check their
+level (SQLAlchemy's echo) are left alone. There is one listener per
+process; configuring another app replaces it.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, has_request_context, request
+
+
+# Loggers routed through the queue besides app.logger
+LOGGERS = ('utils', 'routes', 'access')
+
+REQUEST_FIELDS = ('request_id', 'user_id', 'method', 'path', 'endpoint')
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+access_logger = logging.getLogger('access')
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_installed = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the fields of the request being served"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            # Only a user Flask-Login already loaded; never query from a log call
+            user = g.get('_login_user')
+            record.user_id = user.get_id() if user is not None and user.is_authenticated else None
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+        else:
+            for field in REQUEST_FIELDS:
+                if not hasattr(record, field):
+                    setattr(record, field, None)
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Format a record as a single-line JSON object"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Keep the message and traceback text but nothing unpicklable or
+        # request-bound; formatting happens on the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers(app):
+    formatter = JSONFormatter() if app.config.get('LOG_FORMAT', 'json') == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    path = app.config.get('LOG_FILE')
+    if path:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=app.config.get('LOG_BACKUP_COUNT', 10),
+            encoding='utf-8'
+        )
+        handler.setFormatter(formatter)
+        handlers.append(handler)
+    return handlers
+
+
+def _install(app):
+    global _installed
+    level = logging.getLevelName(app.config.get('LOG_LEVEL', 'INFO').upper())
+    handler = DroppingQueueHandler(queue.Queue(app.config.get('LOG_QUEUE_SIZE', 10000)))
+    handler.addFilter(RequestContextFilter())
+    listener = QueueListener(handler.queue, *_build_handlers(app), respect_handler_level=True)
+    loggers = [app.logger] + [logging.getLogger(name) for name in LOGGERS]
+
+    with _lock:
+        if _installed is not None:
+            old_handler, old_listener, old_loggers = _installed
+            for logger in old_loggers:
+                logger.removeHandler(old_handler)
+            old_listener.stop()
+        for logger in loggers:
+            logger.addHandler(handler)
+            logger.setLevel(level)
+        listener.start()
+        _installed = (handler, listener, loggers)
+    return handler
+
+
+def shutdown():
+    """Write out every queued record and stop the listener thread"""
+    global _installed
+    with _lock:
+        if _installed is None:
+            return
+        handler, listener, loggers = _installed
+        for logger in loggers:
+            logger.removeHandler(handler)
+        listener.stop()
+        _installed = None
+
+
+atexit.register(shutdown)
+
+
+def init_app(app):
+    """Route an application's logging through the queue and tag its requests"""
+    handler = _install(app)
+    app.extensions['log_handler'] = handler
+    log_requests = app.config.get('LOG_REQUESTS', True)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g._log_started = time.perf_counter()
+
+    @app.after_request
+    def add_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        g._log_status = response.status_code
+        return response
+
+    if log_requests:
+        @app.teardown_request
+        def log_request(exc=None):
+            started = g.pop('_log_started', None)
+            if started is None:
+                return
+            status = g.pop('_log_status', 500)
+            fields = {
+                'status': status,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            }
+            # Filled in by utils/profiling.py when it is enabled
+            profile = g.get('_request_profile')
+            if profile is not None:
+                fields['queries'] = profile.queries
+                fields['db_ms'] = round(profile.db_seconds * 1000, 2)
+            access_logger.log(
+                logging.ERROR if status >= 500 else logging.INFO,
+                '%s %s %s %.1fms', request.method, request.path, status, fields['duration_ms'],
+                extra=fields
+            )
+
+
+def dropped_records():
+    """Number of log records dropped because the queue was full"""
+    with _lock:
+        return _installed[0].dropped if _installed is not None else 0
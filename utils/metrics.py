@@ -0,0 +1,423 @@
+"""
+Prometheus metrics
+
+GET /metrics serves the Prometheus text format. Request metrics are
+recorded by Flask hooks into an in-process registry (one short lock per
+update): latency per blueprint/endpoint, request counts by status, requests
+in flight, and bytes uploaded (multipart request bodies) and downloaded
+(files sent by views, inline or as attachments; static files are not
+counted). Views add their own counters with inc_counter(),
+e.g. login successes and failures. The rest is read from the other
+subsystems when the endpoint is scraped: connection pool usage, cache
+hits/misses, rate limiter and password hash pool rejections, dropped log
+records, admission control and the per-endpoint SQL histograms of
+utils/profiling.py.
+
+Every worker process has its own registry. With METRICS_MULTIPROC_DIR set,
+each worker also writes a JSON snapshot of its metrics there (at most every
+METRICS_WRITE_INTERVAL seconds, and at exit), and a scrape of any worker
+adds up the snapshots of all of them. Counters and histograms of exited
+workers are kept so totals never go backwards; their gauges are dropped.
+Empty the directory when the server starts (e.g. in gunicorn's on_starting
+hook), as worker pids are reused across restarts.
+
+Access: logged-in admins, scrapers sending "Authorization: Bearer
+<METRICS_TOKEN>", and clients whose address is in METRICS_ALLOW_FROM (IPs or
+networks, empty by default) may read /metrics; anyone else gets a 403.
+Behind a reverse proxy remote_addr is the proxy's address unless PROXY_FIX
+is set, so prefer the token there.
+"""
+import atexit
+import glob
+import hmac
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+from flask import Response, current_app, g, request
+from flask_login import current_user
+from extensions import db
+from utils.cache import cache_stats
+from utils.log import dropped_records
+from utils.profiling import Histogram
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name: (type, help) of every metric this module exposes
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by blueprint and endpoint'),
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status'),
+    'http_requests_in_flight': ('gauge', 'Requests currently being served'),
+    'http_upload_bytes_total': ('counter', 'Bytes received in multipart request bodies'),
+    'http_download_bytes_total': ('counter', 'Bytes of files sent by views'),
+    'auth_logins_total': ('counter', 'Login attempts by result'),
+    'db_pool_size': ('gauge', 'Configured connection pool size'),
+    'db_pool_checked_out': ('gauge', 'Connections currently checked out of the pool'),
+    'db_pool_overflow': ('gauge', 'Connections open beyond the pool size'),
+    'db_queries_per_request': ('histogram', 'SQL statements per request by endpoint'),
+    'db_request_duration_seconds': ('histogram', 'Time spent in SQL per request by endpoint'),
+    'cache_hits_total': ('counter', 'Cache hits by cache'),
+    'cache_misses_total': ('counter', 'Cache misses by cache'),
+    'cache_evictions_total': ('counter', 'Cache evictions by cache'),
+    'cache_entries': ('gauge', 'Entries currently cached by cache'),
+    'rate_limit_rejected_total': ('counter', 'Requests rejected by the login/registration rate limiter'),
+    'password_hash_rejected_total': ('counter', 'Password hashes refused by the busy hash pool'),
+    'admission_in_flight': ('gauge', 'Admitted requests running by priority'),
+    'admission_queue_depth': ('gauge', 'Requests waiting for admission by priority'),
+    'admission_admitted_total': ('counter', 'Requests admitted by priority'),
+    'admission_shed_total': ('counter', 'Requests shed with a 503 by priority'),
+    'log_records_dropped_total': ('counter', 'Log records dropped because the log queue was full'),
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms recorded by this process
+
+    Args:
+        latency_buckets (tuple): Histogram buckets for durations, in seconds
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_gauge(self, name, amount, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=None, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets or self.latency_buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: counters and gauges ([name, labels, value] lists) and
+                histograms ([name, labels, Histogram.snapshot()] lists)
+        """
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, dict(labels), h.snapshot()] for (name, labels), h in self.histograms.items()],
+            }
+
+
+def _collect_subsystems(app, snapshot):
+    counters, gauges, histograms = snapshot['counters'], snapshot['gauges'], snapshot['histograms']
+
+    for bind, engine in db.engines.items():
+        pool, labels = engine.pool, {'bind': bind or 'default'}
+        # Only QueuePool-style pools report sizes (SQLite memory databases don't)
+        for name, method in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'),
+                             ('db_pool_overflow', 'overflow')):
+            if hasattr(pool, method):
+                gauges.append([name, labels, getattr(pool, method)()])
+
+    for cache, stats in cache_stats().items():
+        labels = {'cache': cache}
+        counters.append(['cache_hits_total', labels, stats['hits']])
+        counters.append(['cache_misses_total', labels, stats['misses']])
+        counters.append(['cache_evictions_total', labels, stats['evictions']])
+        gauges.append(['cache_entries', labels, stats['size']])
+
+    limiter = app.extensions.get('rate_limiter')
+    if limiter is not None:
+        counters.append(['rate_limit_rejected_total', {}, limiter.rejected])
+    hash_pool = app.extensions.get('hash_pool')
+    if hash_pool is not None:
+        counters.append(['password_hash_rejected_total', {}, hash_pool.rejected])
+
+    counters.append(['log_records_dropped_total', {}, dropped_records()])
+
+    admission = app.extensions.get('admission')
+    if admission is not None:
+        stats = admission.stats()
+        for priority in stats['in_flight']:
+            labels = {'priority': priority}
+            gauges.append(['admission_in_flight', labels, stats['in_flight'][priority]])
+            gauges.append(['admission_queue_depth', labels, stats['queue_depth'][priority]])
+            counters.append(['admission_admitted_total', labels, stats['admitted'][priority]])
+            counters.append(['admission_shed_total', labels, stats['shed'][priority]])
+
+    profiler = app.extensions.get('profiler')
+    if profiler is not None:
+        for endpoint, stats in profiler.snapshot().items():
+            labels = {'blueprint': stats['blueprint'] or '', 'endpoint': endpoint}
+            histograms.append(['db_queries_per_request', labels, stats['queries']])
+            histograms.append(['db_request_duration_seconds', labels, _ms_to_seconds(stats['db_ms'])])
+    return snapshot
+
+
+def _ms_to_seconds(histogram):
+    return {
+        'buckets': [[bound / 1000 if bound is not None else None, count] for bound, count in histogram['buckets']],
+        'count': histogram['count'],
+        'sum': histogram['sum'] / 1000,
+    }
+
+
+class MultiprocessStore:
+    """
+    Per-worker snapshot files in a shared directory
+
+    Args:
+        directory (str): METRICS_MULTIPROC_DIR
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def write(self, snapshot):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as out:
+                json.dump(snapshot, out)
+            os.replace(temp_path, self.path(snapshot['pid']))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def read_others(self, pid):
+        """Snapshots of every other worker, with gauges of exited ones removed"""
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('pid') == pid:
+                continue
+            if not _process_alive(snapshot.get('pid')):
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return pid is not None
+    return True
+
+
+def merge(snapshots):
+    """
+    Add up the metrics of several processes
+
+    Counters and gauges with the same name and labels are summed, and so are
+    the buckets of histograms with the same bounds.
+
+    Returns:
+        dict: A snapshot in the MetricsRegistry.snapshot() format
+    """
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for target, kind in ((counters, 'counters'), (gauges, 'gauges')):
+            for name, labels, value in snapshot.get(kind, ()):
+                key = _key(name, labels)
+                target[key] = target.get(key, 0) + value
+        for name, labels, histogram in snapshot.get('histograms', ()):
+            key = _key(name, labels)
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = {'buckets': [list(b) for b in histogram['buckets']],
+                                   'count': histogram['count'], 'sum': histogram['sum']}
+            elif [b[0] for b in merged['buckets']] == [b[0] for b in histogram['buckets']]:
+                for bucket, (_, count) in zip(merged['buckets'], histogram['buckets']):
+                    bucket[1] += count
+                merged['count'] += histogram['count']
+                merged['sum'] += histogram['sum']
+    return {
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'gauges': [[name, dict(labels), value] for (name, labels), value in gauges.items()],
+        'histograms': [[name, dict(labels), h] for (name, labels), h in histograms.items()],
+    }
+
+
+def _format_labels(labels, extra=None):
+    items = sorted(labels.items()) + (extra or [])
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshot):
+    """
+    Format a snapshot in the Prometheus text exposition format (0.0.4)
+
+    Returns:
+        str: One HELP/TYPE block per metric, metrics sorted by name
+    """
+    samples = {}
+    for kind in ('counters', 'gauges'):
+        for name, labels, value in snapshot[kind]:
+            samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for name, labels, histogram in snapshot['histograms']:
+        lines = samples.setdefault(name, [])
+        for bound, count in histogram['buckets']:
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {count}")
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+    output = []
+    for name in sorted(samples):
+        kind, help_text = METRICS.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(sorted(samples[name]) if kind != 'histogram' else samples[name])
+    return '\n'.join(output) + '\n'
+
+
+def _parse_networks(value):
+    networks = []
+    for item in (value or '').split(','):
+        if item.strip():
+            networks.append(ipaddress.ip_network(item.strip(), strict=False))
+    return networks
+
+
+def _allowed(networks, token):
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        address = None
+    if address is not None and any(address in network for network in networks):
+        return True
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+
+def _is_download(response):
+    # send_file() responses pass their file through; generated exports
+    # (e.g. CSV) name themselves with a Content-Disposition instead
+    if request.endpoint == 'static':
+        return False
+    return response.direct_passthrough or 'Content-Disposition' in response.headers
+
+
+def init_app(app):
+    """Record request metrics for an application and serve them at /metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+    networks = _parse_networks(app.config.get('METRICS_ALLOW_FROM', ''))
+    token = app.config.get('METRICS_TOKEN', '')
+    directory = app.config.get('METRICS_MULTIPROC_DIR')
+    store = MultiprocessStore(directory) if directory else None
+    interval = app.config.get('METRICS_WRITE_INTERVAL', 5.0)
+    last_write = [0.0]
+
+    def local_snapshot():
+        snapshot = _collect_subsystems(app, registry.snapshot())
+        snapshot['pid'] = os.getpid()
+        return snapshot
+
+    def write_snapshot():
+        last_write[0] = time.monotonic()
+        with app.app_context():
+            store.write(local_snapshot())
+
+    def write_final_snapshot():
+        try:
+            write_snapshot()
+        except OSError:
+            pass  # directory already cleaned up
+
+    if store is not None:
+        atexit.register(write_final_snapshot)
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        registry.add_gauge('http_requests_in_flight', 1)
+
+    @app.after_request
+    def count_response(response):
+        endpoint = request.endpoint or 'unmatched'
+        g._metrics_status = response.status_code
+        if request.mimetype == 'multipart/form-data' and request.content_length:
+            registry.inc('http_upload_bytes_total', request.content_length, endpoint=endpoint)
+        if _is_download(response) and response.content_length:
+            registry.inc('http_download_bytes_total', response.content_length, endpoint=endpoint)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc=None):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        registry.add_gauge('http_requests_in_flight', -1)
+        endpoint = request.endpoint or 'unmatched'
+        blueprint = endpoint.rpartition('.')[0]
+        registry.observe('http_request_duration_seconds', time.perf_counter() - started,
+                         blueprint=blueprint, endpoint=endpoint)
+        status = g.pop('_metrics_status', 500)
+        registry.inc('http_requests_total', endpoint=endpoint, method=request.method, status=str(status))
+        if store is not None and time.monotonic() - last_write[0] >= interval:
+            write_snapshot()
+
+    def metrics():
+        if not _allowed(networks, token):
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        snapshot = local_snapshot()
+        if store is not None:
+            store.write(snapshot)
+            snapshot = merge([snapshot] + store.read_others(snapshot['pid']))
+        return Response(render(snapshot), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+
+def inc_counter(name, amount=1, **labels):
+    """
+    Add to a counter of the current application (no-op when metrics are off)
+
+    Args:
+        name (str): Metric name, listed in METRICS
+        amount (float): Increment
+        **labels: Label values
+    """
+    registry = current_app.extensions.get('metrics')
+    if registry is not None:
+        registry.inc(name, amount, **labels)
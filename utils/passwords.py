@@ -0,0 +1,100 @@
+"""
+Password hashing policy
+
+All password hashes are produced and checked here so the algorithm and
+its cost parameters can be tuned per deployment with PASSWORD_HASH_METHOD.
+Hashes created under an older policy are upgraded transparently the next
+time their owner logs in (see needs_rehash). When a hashing pool is
+configured the work runs there instead of on the request thread (see
+utils/hash_pool.py).
+"""
+from flask import current_app
+from werkzeug.security import (
+    generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+)
+from utils.hash_pool import run_hash_job
+
+
+# Named policies accepted by PASSWORD_HASH_METHOD; compare their cost with
+# benchmarks/login_throughput.py. Any raw werkzeug method string
+# ("scrypt:n:r:p", "pbkdf2:hash:iterations") is accepted as well.
+HASH_POLICIES = {
+    'pbkdf2-fast': 'pbkdf2:sha256:260000',
+    'scrypt-interactive': 'scrypt:16384:8:1',
+    'pbkdf2': f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}',
+    'scrypt': 'scrypt:32768:8:1',
+    'scrypt-strong': 'scrypt:65536:8:1',
+}
+
+DEFAULT_HASH_METHOD = 'scrypt'
+
+
+def normalize_method(method):
+    """
+    Expand a policy name or short werkzeug method into its full form
+
+    Args:
+        method (str): Policy name or werkzeug method, e.g. "scrypt"
+
+    Returns:
+        str: Method with every parameter spelled out, e.g. "scrypt:32768:8:1"
+    """
+    method = HASH_POLICIES.get(method, method)
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return method if args else HASH_POLICIES['scrypt']
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Unsupported password hash method '{method}'")
+
+
+def current_method():
+    """Get the configured hash method in normalized form"""
+    return normalize_method(current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_HASH_METHOD)
+
+
+def hash_password(password, method=None):
+    """
+    Hash a password with the configured policy
+
+    Args:
+        password (str): Plain text password
+        method (str): Override the configured policy
+
+    Returns:
+        str: Werkzeug-format hash ("method$salt$hash")
+    """
+    method = normalize_method(method) if method else current_method()
+    salt_length = current_app.config.get('PASSWORD_SALT_LENGTH', 16)
+    return run_hash_job(generate_password_hash, password, method, salt_length)
+
+
+def verify_password(pwhash, password):
+    """
+    Check a password against a stored hash of any supported policy
+
+    Returns:
+        bool: True if the password matches
+    """
+    if not pwhash or password is None:
+        return False
+    return run_hash_job(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """
+    Check whether a stored hash was made with a different policy
+
+    Args:
+        pwhash (str): Stored werkzeug-format hash
+
+    Returns:
+        bool: True if the hash should be regenerated with the current policy
+    """
+    stored_method = pwhash.split('$', 1)[0]
+    try:
+        return normalize_method(stored_method) != current_method()
+    except ValueError:
+        return True
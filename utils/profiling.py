@@ -0,0 +1,283 @@
+"""
+Per-request SQL profiling
+
+Every request gets a small counter (on flask.g) that SQLAlchemy's
+before/after_cursor_execute events fill in: how many statements it ran,
+how long they took and how many rows they touched. When the request is torn
+down the numbers are folded into per-endpoint histograms, so N+1 patterns
+show up as endpoints whose query count grows with the data instead of
+staying flat.
+
+- Statements slower than PROFILING_SLOW_QUERY_MS are logged (warning) with
+  the endpoint and path that ran them.
+- With app.debug or PROFILING_SERVER_TIMING, responses carry a Server-Timing
+  header (db time and query count, app time) that browser dev tools show in
+  the network panel.
+- endpoint_stats() returns the histograms; /admin/api/profiling serves them.
+
+Rows are what SQLAlchemy can see without wrapping the cursor: objects the
+ORM loads plus rows changed by INSERT/UPDATE/DELETE. Plain Core SELECTs add
+to the query count and time but not to rows. Statements issued outside a
+request (background flushes, CLI commands) are not counted. Histograms are
+per process.
+"""
+import logging
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from extensions import db
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets (the last bucket is unbounded)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+TIME_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Longest statement text written to the slow query log
+_MAX_LOGGED_STATEMENT = 500
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (not thread-safe; QueryProfiler locks around it)
+
+    Args:
+        buckets (tuple): Increasing upper bounds; values above the last one
+            fall into an implicit +Inf bucket
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty or +Inf)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: buckets ([upper bound, cumulative count] pairs, the last
+                bound being None for +Inf), count and sum
+        """
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets + (None,), self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {'buckets': cumulative, 'count': self.count, 'sum': round(self.sum, 3)}
+
+
+class EndpointStats:
+    """Request, query, time and row totals for one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.max_queries = 0
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_ms = Histogram(TIME_BUCKETS_MS)
+        self.total_ms = Histogram(TIME_BUCKETS_MS)
+
+    def record(self, queries, db_ms, total_ms, rows):
+        self.requests += 1
+        self.rows += rows
+        self.max_queries = max(self.max_queries, queries)
+        self.queries.observe(queries)
+        self.db_ms.observe(db_ms)
+        self.total_ms.observe(total_ms)
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'max_queries': self.max_queries,
+            'p95_queries': self.queries.quantile(0.95),
+            'p95_db_ms': self.db_ms.quantile(0.95),
+            'p95_total_ms': self.total_ms.quantile(0.95),
+            'queries': self.queries.snapshot(),
+            'db_ms': self.db_ms.snapshot(),
+            'total_ms': self.total_ms.snapshot(),
+        }
+
+
+class QueryProfiler:
+    """
+    Per-endpoint aggregation of request profiles
+
+    Args:
+        slow_query_ms (float): Log statements at least this slow (0 = off)
+        server_timing (bool): Add a Server-Timing header to responses
+    """
+
+    def __init__(self, slow_query_ms=100, server_timing=False):
+        self.slow_query_ms = slow_query_ms
+        self.server_timing = server_timing
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, queries, db_ms, total_ms, rows):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.record(queries, db_ms, total_ms, rows)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {endpoint: EndpointStats snapshot plus its blueprint}
+        """
+        with self._lock:
+            return {
+                endpoint: dict(stats.snapshot(), blueprint=endpoint.rpartition('.')[0] or None)
+                for endpoint, stats in self.endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+class RequestProfile:
+    """Counters of the request being served (kept on flask.g)"""
+
+    __slots__ = ('started', 'queries', 'db_seconds', 'rows')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+def _current_profile():
+    # Created on first use: the server-side session is loaded (one query)
+    # when the request context is pushed, before any before_request hook
+    if not has_request_context():
+        return None
+    profile = g.get('_request_profile')
+    if profile is None:
+        profile = g._request_profile = RequestProfile()
+    return profile
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_profile() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    started = getattr(context, '_profile_started', None)
+    if profile is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    profile.queries += 1
+    profile.db_seconds += elapsed
+    if (context.isinsert or context.isupdate or context.isdelete) and cursor.rowcount > 0:
+        profile.rows += cursor.rowcount
+
+    profiler = current_app.extensions.get('profiler')
+    if profiler is not None and profiler.slow_query_ms and elapsed * 1000 >= profiler.slow_query_ms:
+        logger.warning(
+            'Slow query (%.1f ms) in %s %s [%s]: %s',
+            elapsed * 1000, request.method, request.path, request.endpoint,
+            ' '.join(statement.split())[:_MAX_LOGGED_STATEMENT]
+        )
+
+
+def _on_load(target, context):
+    profile = _current_profile()
+    if profile is not None:
+        profile.rows += 1
+
+
+_load_listener_lock = threading.Lock()
+
+
+def _listen_for_loads():
+    # Mapper events are global, so register the ORM load counter only once
+    with _load_listener_lock:
+        if not event.contains(db.Model, 'load', _on_load):
+            event.listen(db.Model, 'load', _on_load, propagate=True)
+
+
+def init_app(app):
+    """Attach the SQL profiler to an application's engines and requests"""
+    if not app.config.get('PROFILING_ENABLED', True):
+        return
+    profiler = QueryProfiler(
+        slow_query_ms=app.config.get('PROFILING_SLOW_QUERY_MS', 100),
+        server_timing=app.debug or app.config.get('PROFILING_SERVER_TIMING', False)
+    )
+    app.extensions['profiler'] = profiler
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _listen_for_loads()
+
+    @app.before_request
+    def start_request_profile():
+        _current_profile()
+
+    @app.after_request
+    def add_server_timing(response):
+        profile = g.get('_request_profile')
+        if profiler.server_timing and profile is not None:
+            db_ms = profile.db_seconds * 1000
+            app_ms = (time.perf_counter() - profile.started) * 1000 - db_ms
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.1f};desc="{profile.queries} queries", app;dur={app_ms:.1f}'
+            )
+        return response
+
+    # Recorded at teardown so statements run while the response is finished
+    # (e.g. saving a server-side session) count towards the request
+    @app.teardown_request
+    def record_request_profile(exc=None):
+        profile = g.get('_request_profile')
+        if profile is None:
+            return
+        profiler.record(
+            request.endpoint or 'unmatched',
+            profile.queries,
+            profile.db_seconds * 1000,
+            (time.perf_counter() - profile.started) * 1000,
+            profile.rows
+        )
+
+
+def endpoint_stats():
+    """
+    Profiling histograms of the current application
+
+    Returns:
+        dict: See QueryProfiler.snapshot(), or None when profiling is off
+    """
+    profiler = current_app.extensions.get('profiler')
+    return profiler.snapshot() if profiler is not None else None
@@ -0,0 +1,368 @@
+"""
+Rate limiting for the login and registration forms
+
+Every POST to a limited view takes one token from two buckets: one keyed by
+client IP and one keyed by the submitted email. Buckets hold `capacity`
+tokens and refill continuously at capacity/period per second, so a limit of
+"10/300" allows a burst of 10 attempts and then one every 30 seconds. The
+check runs before the view body, so a rejected request never reaches the
+User lookup or the password hash.
+
+Login gives the IP token back when the user is logged in, so only failed
+attempts count against an IP: a classroom signing in together from one
+school NAT address is never throttled, while guessing from it is. Client
+IPs are only real behind a reverse proxy when PROXY_FIX says how many
+proxies to trust; otherwise every client shares the proxy's bucket.
+
+Bucket state lives in one of three backends (RATE_LIMIT_BACKEND):
+    memory    per-process, size-bounded LRU (default)
+    database  rate_limit_buckets table, shared by every worker
+    redis     a Redis server at RATE_LIMIT_REDIS_URL (needs the redis package)
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, render_template, request, session
+from sqlalchemy import case, select
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models.rate_limit_bucket import RateLimitBucket
+
+# Try to import redis (optional, only needed for RATE_LIMIT_BACKEND=redis)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request has no token left in one of its buckets"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Too many attempts')
+        self.retry_after = retry_after
+
+
+def parse_limit(limit):
+    """
+    Parse a "capacity/period" limit string
+
+    Args:
+        limit (str): e.g. "10/300" for 10 attempts per 300 seconds
+
+    Returns:
+        tuple: (capacity: int, refill_rate: float tokens per second)
+    """
+    capacity, period = limit.split('/')
+    capacity, period = int(capacity), float(period)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Invalid rate limit '{limit}'")
+    return capacity, capacity / period
+
+
+def _retry_after(tokens, rate):
+    """Seconds until a bucket holding `tokens` has a whole token again"""
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class MemoryBackend:
+    """
+    Token buckets in a per-process LRU
+
+    The least recently used bucket is dropped once `max_keys` are tracked;
+    a dropped bucket simply starts full again, which only errs on the side
+    of letting a request through.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """
+        Take one token from the bucket for key
+
+        Returns:
+            tuple: (allowed: bool, retry_after: int seconds, 0 when allowed)
+        """
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def refund(self, key, capacity, rate, now):
+        """Put one token back into the bucket for key"""
+        with self._lock:
+            if key not in self._buckets:
+                return
+            tokens, updated_at = self._buckets[key]
+            self._buckets[key] = (min(capacity, tokens + (now - updated_at) * rate + 1), now)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBackend:
+    """
+    Token buckets in the rate_limit_buckets table
+
+    Each take is a single conditional UPDATE that refills and decrements in
+    SQL, so concurrent workers cannot both spend the last token. Idle rows
+    are purged every `purge_every` takes; a missing row is the same as a
+    full bucket.
+    """
+
+    def __init__(self, app, purge_every=1000, idle_seconds=3600):
+        self.app = app
+        self.purge_every = purge_every
+        self.idle_seconds = idle_seconds
+        self._takes = 0
+
+    def take(self, key, capacity, rate, now):
+        table = RateLimitBucket.__table__
+        refilled = table.c.tokens + (now - table.c.updated_at) * rate
+        level = case((refilled > capacity, capacity), else_=refilled)
+
+        # Own connection, so the request's session is never committed here
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(table.c.key == key, level >= 1)
+                .values(tokens=level - 1, updated_at=now)
+            )
+            if result.rowcount:
+                allowed, tokens = True, None
+            elif _insert_ignore(conn, table, {'key': key, 'tokens': capacity - 1, 'updated_at': now}):
+                allowed, tokens = True, None
+            else:
+                row = conn.execute(
+                    select(table.c.tokens, table.c.updated_at).where(table.c.key == key)
+                ).first()
+                allowed = False
+                tokens = min(capacity, row.tokens + (now - row.updated_at) * rate) if row else 0
+
+            self._takes += 1
+            if self._takes % self.purge_every == 0:
+                conn.execute(table.delete().where(table.c.updated_at < now - self.idle_seconds))
+
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def refund(self, key, capacity, rate, now):
+        table = RateLimitBucket.__table__
+        refilled = table.c.tokens + (now - table.c.updated_at) * rate + 1
+        with db.engine.begin() as conn:
+            conn.execute(
+                table.update()
+                .where(table.c.key == key)
+                .values(tokens=case((refilled > capacity, capacity), else_=refilled), updated_at=now)
+            )
+
+    def clear(self):
+        with self.app.app_context(), db.engine.begin() as conn:
+            conn.execute(RateLimitBucket.__table__.delete())
+
+
+def _insert_ignore(conn, table, values):
+    """INSERT that does nothing if the key exists; returns True if a row was added"""
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(conn.dialect.name)
+    if dialect is None:
+        exists = conn.execute(select(table.c.key).where(table.c.key == values['key'])).first()
+        if exists:
+            return False
+        conn.execute(table.insert().values(**values))
+        return True
+    statement = dialect.insert(table).values(**values).on_conflict_do_nothing()
+    return conn.execute(statement).rowcount > 0
+
+
+class RedisBackend:
+    """Token buckets in Redis, refilled and decremented atomically by a Lua script"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+    return {allowed, tostring(tokens)}
+    """
+
+    REFUND_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    if not state[1] then
+        return 0
+    end
+    local tokens = math.min(capacity, tonumber(state[1]) + (now - tonumber(state[2])) * rate + 1)
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    return 1
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+        self._refund_script = self.client.register_script(self.REFUND_SCRIPT)
+
+    def take(self, key, capacity, rate, now):
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[capacity, rate, now])
+        allowed = bool(int(allowed))
+        return allowed, 0 if allowed else _retry_after(float(tokens), rate)
+
+    def refund(self, key, capacity, rate, now):
+        self._refund_script(keys=[self.prefix + key], args=[capacity, rate, now])
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class RateLimiter:
+    """
+    Applies the configured limits of a scope against a backend
+
+    Args:
+        backend: MemoryBackend, DatabaseBackend or RedisBackend
+        limits (dict): {(scope, 'ip'|'email'): (capacity, refill_rate)}
+        clock (callable): Returns the current Unix time (overridable in tests)
+    """
+
+    def __init__(self, backend, limits, clock=time.time):
+        self.backend = backend
+        self.limits = limits
+        self.clock = clock
+        self.rejected = 0
+
+    def check(self, scope, ip=None, email=None):
+        """
+        Take a token for each key of the request
+
+        Raises:
+            RateLimitExceeded: If any bucket is empty
+        """
+        now = self.clock()
+        for kind, value in (('ip', ip), ('email', email)):
+            limit = self.limits.get((scope, kind))
+            if not value or limit is None:
+                continue
+            capacity, rate = limit
+            try:
+                allowed, retry_after = self.backend.take(f'{scope}:{kind}:{value}', capacity, rate, now)
+            except Exception:
+                # An unavailable shared store must not lock everyone out
+                logger.exception('Rate limit backend failed; allowing request')
+                continue
+            if not allowed:
+                self.rejected += 1
+                raise RateLimitExceeded(retry_after)
+
+    def refund(self, scope, ip=None, email=None):
+        """Give back the tokens check() took for these keys"""
+        now = self.clock()
+        for kind, value in (('ip', ip), ('email', email)):
+            limit = self.limits.get((scope, kind))
+            if not value or limit is None:
+                continue
+            capacity, rate = limit
+            try:
+                self.backend.refund(f'{scope}:{kind}:{value}', capacity, rate, now)
+            except Exception:
+                logger.exception('Rate limit backend failed; token not refunded')
+
+    def reset(self):
+        """Forget every bucket"""
+        self.backend.clear()
+
+
+def _create_backend(app, limits):
+    name = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if name == 'database':
+        # A row idle for the longest period belongs to a full bucket
+        idle_seconds = max((capacity / rate for capacity, rate in limits.values()), default=3600)
+        return DatabaseBackend(app, idle_seconds=idle_seconds)
+    if name == 'redis':
+        if redis is not None:
+            return RedisBackend(app.config.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0'))
+        logger.warning('RATE_LIMIT_BACKEND=redis but the redis package is not installed; '
+                       'using per-process buckets')
+    elif name != 'memory':
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{name}'")
+    return MemoryBackend(max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 10000))
+
+
+def init_app(app):
+    """Create the limiter for an application and register the 429 handler"""
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    limits = {}
+    for scope in ('login', 'register'):
+        for kind in ('ip', 'email'):
+            limit = app.config.get(f'RATE_LIMIT_{scope.upper()}_{kind.upper()}')
+            if limit:
+                limits[(scope, kind)] = parse_limit(limit)
+    app.extensions['rate_limiter'] = RateLimiter(_create_backend(app, limits), limits)
+    app.register_error_handler(RateLimitExceeded, handle_rate_limited)
+
+
+def rate_limit(scope, ip_failures_only=False):
+    """
+    Throttle POSTs to a view by client IP and submitted email
+
+    Args:
+        scope (str): Limit set to apply, 'login' or 'register'
+        ip_failures_only (bool): Refund the IP token when the view logs the
+            user in, so only failed attempts count against the IP
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is None or request.method != 'POST':
+                return view(*args, **kwargs)
+            email = (request.form.get('email') or '').strip().lower()[:200]
+            limiter.check(scope, ip=request.remote_addr, email=email)
+            user_id = session.get('_user_id')
+            response = view(*args, **kwargs)
+            # Flask-Login's login_user() put a (different) user in the session
+            if ip_failures_only and session.get('_user_id') not in (None, user_id):
+                limiter.refund(scope, ip=request.remote_addr)
+            return response
+        return wrapped
+    return decorator
+
+
+def handle_rate_limited(error):
+    """Reject the request with 429 + Retry-After"""
+    message = 'Too many attempts. Please wait a moment and try again.'
+    if 'text/html' in request.accept_mimetypes.values():
+        response = current_app.make_response(render_template('errors/429.html', message=message))
+    else:
+        response = jsonify({'success': False, 'message': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
@@ -0,0 +1,141 @@
+"""
+Teacher student roster
+
+Students are deduplicated in SQL: the teacher's enrollments are reduced to
+DISTINCT (student, class) pairs, grouped per student with the class names
+aggregated into one string, and joined to the student's user row for the
+email. Pages are sorted and limited in the database, so the first page of
+a 2,000 student roster costs the same two queries as a 20 student one.
+"""
+from sqlalchemy import case, func, or_, select
+from extensions import db
+from models.class_model import Class, class_student
+from models.student import Student
+from models.user import User
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _per_student(teacher_id):
+    enrollments = (
+        select(class_student.c.student_id, class_student.c.class_id)
+        .join(Class, Class.id == class_student.c.class_id)
+        .where(Class.teacher_id == teacher_id)
+        .distinct()
+        .subquery('enrollments')
+    )
+    return (
+        select(
+            enrollments.c.student_id,
+            func.count(enrollments.c.class_id).label('class_count'),
+            func.aggregate_strings(Class.name, ', ').label('class_names'),
+            func.min(Class.name).label('first_class')
+        )
+        .join(Class, Class.id == enrollments.c.class_id)
+        .group_by(enrollments.c.student_id)
+        .subquery('roster')
+    )
+
+
+# ?sort= values and the columns they order by
+SORT_COLUMNS = {
+    'name': (Student.last_name, Student.first_name),
+    'email': (User.email,),
+    'class': ('first_class',),
+    # When the student's account was created; enrollments carry no date
+    'joined': (Student.created_at,),
+}
+
+
+def teacher_roster(teacher_id, search=None, sort='name', direction='asc', page=1, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of the distinct students across a teacher's classes
+
+    Args:
+        teacher_id (int): Teacher whose classes are listed
+        search (str): Case-insensitive match on name or email
+        sort (str): One of SORT_COLUMNS
+        direction (str): 'asc' or 'desc'
+        page (int): 1-based page number
+        per_page (int): Page size, capped at MAX_PAGE_SIZE; None returns every row
+
+    Returns:
+        dict: items (list of dicts), total, active, classes (taught by the
+            teacher), page, per_page, pages, sort and direction
+    """
+    per_student = _per_student(teacher_id)
+    sort = sort if sort in SORT_COLUMNS else 'name'
+    direction = 'desc' if direction == 'desc' else 'asc'
+
+    filters = []
+    if search:
+        search = search.strip()
+        filters.append(or_(
+            Student.first_name.icontains(search, autoescape=True),
+            Student.last_name.icontains(search, autoescape=True),
+            User.email.icontains(search, autoescape=True)
+        ))
+
+    def roster_query(*columns):
+        return (
+            db.session.query(*columns)
+            .select_from(Student)
+            .join(per_student, per_student.c.student_id == Student.id)
+            .join(User, User.id == Student.user_id)
+            .filter(*filters)
+        )
+
+    total, active, classes = roster_query(
+        func.count(Student.id),
+        func.coalesce(func.sum(case((User.status == 'active', 1), else_=0)), 0),
+        select(func.count(Class.id)).where(Class.teacher_id == teacher_id).scalar_subquery()
+    ).one()
+
+    order_by = []
+    for column in SORT_COLUMNS[sort]:
+        column = per_student.c[column] if isinstance(column, str) else column
+        order_by.append(column.desc() if direction == 'desc' else column.asc())
+
+    query = roster_query(
+        Student.id, Student.first_name, Student.last_name, Student.created_at,
+        User.username, User.email, User.status,
+        per_student.c.class_names, per_student.c.class_count
+    ).order_by(*order_by, Student.id)
+
+    if per_page is None:
+        page, pages = 1, 1
+    else:
+        page = max(page or 1, 1)
+        per_page = min(max(per_page, 1), MAX_PAGE_SIZE)
+        pages = (total + per_page - 1) // per_page
+        query = query.limit(per_page).offset((page - 1) * per_page)
+
+    items = []
+    for (student_id, first_name, last_name, created_at, username, email, status,
+         class_names, class_count) in query.all():
+        full_name = f"{first_name or ''} {last_name or ''}".strip()
+        items.append({
+            'id': student_id,
+            'first_name': first_name or '',
+            'last_name': last_name or '',
+            'full_name': full_name or username,
+            'email': email or '',
+            'class_name': class_names,
+            'class_count': class_count,
+            'joined_date': created_at.strftime('%b %d, %Y') if created_at else 'N/A',
+            'status': (status or 'active').title(),
+        })
+
+    return {
+        'items': items,
+        'total': total,
+        'active': int(active),
+        'classes': classes or 0,
+        'page': page,
+        'per_page': per_page,
+        'pages': pages,
+        'sort': sort,
+        'direction': direction,
+    }
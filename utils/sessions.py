@@ -0,0 +1,342 @@
+"""
+Server-side sessions
+
+With SESSION_BACKEND set to "database" (default) or "redis", session data
+is kept on the server and the cookie only carries a random session id.
+Cookies stay small however much Flask-Login, CSRF and flash data a session
+holds, and a user's sessions can be revoked (revoke_user_sessions) when an
+admin deletes the account or changes its role. "cookie" keeps Flask's
+signed cookie sessions, which cannot be revoked or counted.
+
+Sessions are written only when their data changes, or when less than half
+of PERMANENT_SESSION_LIFETIME is left, so plain page views don't each cost
+a write. Requests for static files and requests without a session cookie
+never read the store.
+
+The session id is replaced whenever the logged-in user changes (login,
+logout, switching accounts) and the old stored session is deleted, so an id
+that was known before the login is worthless after it (session fixation).
+
+Expired sessions are purged every SESSION_PURGE_INTERVAL seconds by
+a background thread, started by the first request of each process.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+from datetime import datetime
+from flask import current_app
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import func, select
+from werkzeug.datastructures import CallbackDict
+from extensions import db
+from models.user_session import UserSession
+
+# Try to import redis (optional, only needed for SESSION_BACKEND=redis)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and when its stored copy expires"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        # Who the session belonged to when it was loaded, and its id before
+        # regenerate() if that was called
+        self.loaded_user_id = self.get('_user_id')
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id; the old one is deleted on save"""
+        if self.new:
+            return
+        self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class DatabaseSessionStore:
+    """Sessions in the user_sessions table, accessed on a dedicated connection"""
+
+    def get(self, key, now):
+        """Return (data, expires_at) for a live session, or None"""
+        table = UserSession.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.data, table.c.expires_at)
+                .where(table.c.id == key, table.c.expires_at > now)
+            ).first()
+        return (row.data, row.expires_at) if row else None
+
+    def save(self, key, data, user_id, expires_at, new):
+        table = UserSession.__table__
+        values = {'data': data, 'user_id': user_id, 'expires_at': expires_at}
+        with db.engine.begin() as conn:
+            if not new:
+                # Falls through to an insert if the row was purged meanwhile
+                if conn.execute(table.update().where(table.c.id == key).values(**values)).rowcount:
+                    return
+            conn.execute(table.insert().values(id=key, created_at=datetime.utcnow(), **values))
+
+    def delete(self, key):
+        with db.engine.begin() as conn:
+            conn.execute(UserSession.__table__.delete().where(UserSession.__table__.c.id == key))
+
+    def delete_user(self, user_id):
+        table = UserSession.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(table.delete().where(table.c.user_id == user_id)).rowcount
+
+    def count_active(self, now):
+        table = UserSession.__table__
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(func.count())
+                .select_from(table)
+                .where(table.c.expires_at > now, table.c.user_id.isnot(None))
+            ).scalar()
+
+    def purge_expired(self, now):
+        table = UserSession.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(table.delete().where(table.c.expires_at <= now)).rowcount
+
+
+class RedisSessionStore:
+    """
+    Sessions in Redis
+
+    Each session is a string key with a TTL. A set per user lists that
+    user's sessions for revocation, and a sorted set of authenticated
+    sessions scored by expiry gives the active count.
+    """
+
+    def __init__(self, url, prefix='session:'):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.active_key = prefix + 'active'
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}user:{user_id}'
+
+    def get(self, key, now):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        return record['data'], datetime.fromisoformat(record['expires_at'])
+
+    def save(self, key, data, user_id, expires_at, new):
+        ttl = max(1, int((expires_at - datetime.utcnow()).total_seconds()))
+        record = json.dumps({'data': data, 'user_id': user_id, 'expires_at': expires_at.isoformat()})
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, record, ex=ttl)
+        if user_id is not None:
+            pipe.sadd(self._user_key(user_id), key)
+            pipe.zadd(self.active_key, {key: expires_at.timestamp()})
+        else:
+            pipe.zrem(self.active_key, key)
+        pipe.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+        self.client.zrem(self.active_key, key)
+
+    def delete_user(self, user_id):
+        keys = [k.decode() for k in self.client.smembers(self._user_key(user_id))]
+        if not keys:
+            return 0
+        pipe = self.client.pipeline()
+        pipe.delete(*[self.prefix + k for k in keys])
+        pipe.zrem(self.active_key, *keys)
+        pipe.delete(self._user_key(user_id))
+        return pipe.execute()[0]
+
+    def count_active(self, now):
+        return self.client.zcount(self.active_key, now.timestamp(), '+inf')
+
+    def purge_expired(self, now):
+        # Session keys expire by themselves; only the index needs trimming
+        return self.client.zremrangebyscore(self.active_key, '-inf', now.timestamp())
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by a session store"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def _key(sid):
+        return hashlib.sha256(sid.encode()).hexdigest()
+
+    @staticmethod
+    def _is_static(app, request):
+        return app.static_url_path is not None and request.path.startswith(app.static_url_path + '/')
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and not self._is_static(app, request):
+            try:
+                stored = self.store.get(self._key(sid), datetime.utcnow())
+            except Exception:
+                logger.exception('Could not load session')
+                stored = None
+            if stored is not None:
+                data, expires_at = stored
+                return ServerSideSession(self.serializer.loads(data), sid=sid, expires_at=expires_at)
+        # Never adopt an unknown id from the client (session fixation)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if not session:
+            if session.modified and not (session.new and session.previous_sid is None):
+                self.store.delete(self._key(session.previous_sid or session.sid))
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        user_id = session.get('_user_id')
+        if user_id != session.loaded_user_id:
+            session.regenerate()
+        if session.previous_sid is not None:
+            self.store.delete(self._key(session.previous_sid))
+
+        now = datetime.utcnow()
+        lifetime = app.permanent_session_lifetime
+        stale = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not (session.modified or stale):
+            return
+
+        expires_at = now + lifetime
+        self.store.save(
+            self._key(session.sid),
+            self.serializer.dumps(dict(session)),
+            int(user_id) if user_id is not None else None,
+            expires_at,
+            session.new
+        )
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+
+def _create_store(app):
+    name = app.config.get('SESSION_BACKEND', 'database')
+    if name == 'cookie':
+        return None
+    if name == 'redis':
+        if redis is not None:
+            return RedisSessionStore(app.config.get('SESSION_REDIS_URL', 'redis://localhost:6379/0'))
+        logger.warning('SESSION_BACKEND=redis but the redis package is not installed; '
+                       'storing sessions in the database')
+    elif name != 'database':
+        raise ValueError(f"Unknown SESSION_BACKEND '{name}'")
+    return DatabaseSessionStore()
+
+
+class _SessionPurger:
+    """
+    Purge expired sessions from a background thread in every process
+
+    The thread is started by the first request a process serves, not when
+    the app is created: a server that loads the app and then forks workers
+    (gunicorn --preload) would otherwise leave every worker without one.
+    """
+
+    def __init__(self, app, store, interval):
+        self.app = app
+        self.store = store
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            stopped = threading.Event()
+            threading.Thread(target=self._run, args=(stopped,), name='session-purge', daemon=True).start()
+            atexit.register(stopped.set)
+
+    def _run(self, stopped):
+        while not stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    purged = self.store.purge_expired(datetime.utcnow())
+                if purged:
+                    logger.info('Purged %d expired sessions', purged)
+            except Exception:
+                logger.exception('Session purge failed')
+
+
+def init_app(app):
+    """Install the server-side session interface and the expiry purge"""
+    store = _create_store(app)
+    if store is None:
+        return
+    app.session_interface = ServerSessionInterface(store)
+    app.extensions['session_store'] = store
+    interval = app.config.get('SESSION_PURGE_INTERVAL', 300)
+    if interval > 0:
+        purger = _SessionPurger(app, store, interval)
+        app.extensions['session_purger'] = purger
+        app.before_request(purger.ensure_started)
+
+
+def revoke_user_sessions(user_id):
+    """
+    Log a user out everywhere by deleting their stored sessions
+
+    Returns:
+        int: Number of sessions revoked (0 with cookie sessions)
+    """
+    store = current_app.extensions.get('session_store')
+    if store is None:
+        return 0
+    return store.delete_user(user_id)
+
+
+def count_active_sessions():
+    """
+    Count unexpired, logged-in sessions
+
+    Returns:
+        int: Active sessions, or None with cookie sessions
+    """
+    store = current_app.extensions.get('session_store')
+    if store is None:
+        return None
+    return store.count_active(datetime.utcnow())
@@ -0,0 +1,328 @@
+"""
+Assignment submission writes and version history
+
+There is one submissions row per (assignment, student), enforced by a
+unique constraint. A submit is a single INSERT ... ON CONFLICT against that
+constraint instead of an "already submitted?" query followed by an insert,
+so a double-clicked button cannot create two rows and the common case costs
+one statement. What a conflicting submit does is SUBMISSION_RESUBMIT_POLICY:
+
+- "replace" (default): the new file replaces an ungraded submission and its
+  version number goes up. Graded submissions are never replaced, and a
+  resubmit identical to the latest version (same file, same comments) is
+  refused rather than recorded again.
+- "reject": the first submission stands and later ones fail.
+
+Each accepted file is recorded as a SubmissionVersion in the same
+transaction. Exactly one version per submission is flagged is_latest, and
+the submissions row itself always mirrors it, so gradebook queries never
+have to look at older versions.
+
+Files are stored by content: store_file() names them after their SHA-256,
+so uploading the same bytes again (an unchanged resubmit, or the same file
+in two versions) reuses the stored copy instead of writing another one.
+A new file is only staged by store_file(); save_submission() moves it into
+place once the submission is accepted and removes it if it is rejected,
+so refused submits leave no files behind. A stored file can be shared by
+several submissions, so it carries the name of whoever uploaded it first;
+downloads use the name on the version row (Submission.file_name).
+"""
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.submission import Submission
+from models.submission_version import SubmissionVersion
+from utils.versions import touch_assignment
+
+
+RESUBMIT_POLICIES = ('reject', 'replace')
+
+# Metadata compared by diff_versions()
+DIFF_FIELDS = ('file_name', 'file_size', 'content_type', 'content_hash', 'comments', 'submitted_at')
+
+_CHUNK_SIZE = 64 * 1024
+
+# staged_path: where a new file waits until its submission is accepted
+StoredFile = namedtuple('StoredFile', 'path name size content_type content_hash staged_path', defaults=(None,))
+
+
+class SubmissionRejected(Exception):
+    """A submit that conflicts with an existing submission"""
+
+    MESSAGES = {
+        'submitted': 'Assignment already submitted',
+        'graded': 'Assignment already graded',
+        'unchanged': 'This file and comments are identical to your latest submission',
+    }
+
+    def __init__(self, reason):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+
+
+def store_file(stream, folder, filename, content_type=None):
+    """
+    Stage an uploaded file to be stored under its content hash
+
+    The file belongs at folder/<h[:2]>/<h>/<filename>, where h is its
+    SHA-256. If a file with the same content is already stored, that copy
+    is used and the upload discarded; otherwise the upload is kept in a
+    temporary file until save_submission() accepts it (or discard_file()).
+
+    Args:
+        stream: Binary file object (e.g. a werkzeug FileStorage)
+        folder (str): Root of the content-addressed store
+        filename (str): Sanitised name to store a new file under
+        content_type (str): MIME type reported by the client
+
+    Returns:
+        StoredFile: path, name, size, content_type, content_hash and
+        staged_path (None when the content was already stored)
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        content_hash = digest.hexdigest()
+        blob_dir = os.path.join(folder, content_hash[:2], content_hash)
+        existing = sorted(os.listdir(blob_dir)) if os.path.isdir(blob_dir) else []
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    if existing:
+        os.remove(temp_path)
+        return StoredFile(os.path.join(blob_dir, existing[0]), filename, size, content_type, content_hash)
+    return StoredFile(os.path.join(blob_dir, filename), filename, size, content_type, content_hash, temp_path)
+
+
+def _publish_file(stored):
+    # Move a staged file into place; a concurrent submit of the same content
+    # may have got there first, in which case both rows point at that copy
+    if stored.staged_path is None:
+        return
+    os.makedirs(os.path.dirname(stored.path), exist_ok=True)
+    if os.path.exists(stored.path):
+        os.remove(stored.staged_path)
+    else:
+        os.replace(stored.staged_path, stored.path)
+
+
+def discard_file(stored):
+    """Remove the staged copy of a file that will not be saved"""
+    if stored.staged_path is not None and os.path.exists(stored.staged_path):
+        os.remove(stored.staged_path)
+
+
+def _changed(table, values):
+    # True when a resubmit differs from the current version
+    return or_(
+        table.c.content_hash.is_distinct_from(values['content_hash']),
+        table.c.comments.is_distinct_from(values['comments'])
+    )
+
+
+def _upsert(conn, values, policy):
+    # Returns (id, version) of the written row, or None if it was left alone
+    table = Submission.__table__
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(conn.dialect.name)
+    if dialect is None:
+        return _upsert_fallback(conn, values, policy)
+
+    statement = dialect.insert(table).values(**values)
+    conflict = [table.c.assignment_id, table.c.student_id]
+    if policy == 'replace':
+        statement = statement.on_conflict_do_update(
+            index_elements=conflict,
+            set_={
+                'file_path': statement.excluded.file_path,
+                'comments': statement.excluded.comments,
+                'content_hash': statement.excluded.content_hash,
+                'submitted_at': statement.excluded.submitted_at,
+                'updated_at': statement.excluded.updated_at,
+                'version': table.c.version + 1,
+            },
+            where=table.c.grade.is_(None) & _changed(table, values)
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=conflict)
+    return conn.execute(statement.returning(table.c.id, table.c.version)).first()
+
+
+def _upsert_fallback(conn, values, policy):
+    # Same contract for databases without ON CONFLICT: let the unique
+    # constraint decide inside a savepoint, then update on a conflict
+    table = Submission.__table__
+    try:
+        with conn.begin_nested():
+            result = conn.execute(table.insert().values(**values))
+        return result.inserted_primary_key[0], 1
+    except IntegrityError:
+        if policy != 'replace':
+            return None
+    key = (table.c.assignment_id == values['assignment_id'], table.c.student_id == values['student_id'])
+    updated = conn.execute(
+        table.update()
+        .where(*key, table.c.grade.is_(None), _changed(table, values))
+        .values(file_path=values['file_path'], comments=values['comments'],
+                content_hash=values['content_hash'], submitted_at=values['submitted_at'],
+                updated_at=values['updated_at'], version=table.c.version + 1)
+    )
+    if not updated.rowcount:
+        return None
+    return conn.execute(select(table.c.id, table.c.version).where(*key)).first()
+
+
+def _rejection(conn, values, policy):
+    if policy != 'replace':
+        return SubmissionRejected('submitted')
+    table = Submission.__table__
+    grade = conn.execute(
+        select(table.c.grade)
+        .where(table.c.assignment_id == values['assignment_id'], table.c.student_id == values['student_id'])
+    ).scalar()
+    return SubmissionRejected('graded' if grade is not None else 'unchanged')
+
+
+def save_submission(assignment_id, student_id, stored, comments='', policy=None):
+    """
+    Create a student's submission, or add a version to it if the policy allows
+
+    Args:
+        assignment_id (int): Assignment being submitted
+        student_id (int): Submitting student
+        stored (StoredFile): The uploaded file, as returned by store_file()
+        comments (str): Student comments
+        policy (str): One of RESUBMIT_POLICIES (default: SUBMISSION_RESUBMIT_POLICY)
+
+    Returns:
+        tuple: (submission_id, version); version 1 is a first submission
+
+    Raises:
+        SubmissionRejected: If the student already submitted and the policy
+            does not allow a new version, the submission is graded, or
+            nothing changed since the latest version
+        ValueError: If the policy is unknown
+    """
+    policy = policy or current_app.config.get('SUBMISSION_RESUBMIT_POLICY', 'replace')
+    if policy not in RESUBMIT_POLICIES:
+        raise ValueError(f"Unknown SUBMISSION_RESUBMIT_POLICY '{policy}'")
+
+    now = datetime.utcnow()
+    values = {
+        'assignment_id': assignment_id,
+        'student_id': student_id,
+        'file_path': stored.path,
+        'comments': comments,
+        'content_hash': stored.content_hash,
+        'submitted_at': now,
+        'updated_at': now,
+        'version': 1,
+    }
+    # Dedicated connection: the row lock taken by the upsert is held until
+    # the version row is written, so concurrent replaces number versions in order
+    try:
+        with db.engine.begin() as conn:
+            submission_id, version = _save(conn, values, stored, comments, policy, now)
+    except BaseException:
+        discard_file(stored)
+        raise
+    return submission_id, version
+
+
+def _save(conn, values, stored, comments, policy, now):
+    versions = SubmissionVersion.__table__
+    row = _upsert(conn, values, policy)
+    if row is None:
+        raise _rejection(conn, values, policy)
+    submission_id, version = row
+    conn.execute(
+        versions.update()
+        .where(versions.c.submission_id == submission_id, versions.c.is_latest)
+        .values(is_latest=False)
+    )
+    conn.execute(versions.insert().values(
+        submission_id=submission_id, version=version, is_latest=True,
+        file_path=stored.path, file_name=stored.name, file_size=stored.size,
+        content_type=stored.content_type, content_hash=stored.content_hash,
+        comments=comments, submitted_at=now
+    ))
+    touch_assignment(conn, values['assignment_id'])
+    # Accepted: the file goes into place before the rows are committed
+    _publish_file(stored)
+    return submission_id, version
+
+
+def _version_dict(version):
+    return {
+        'version': version.version,
+        'is_latest': version.is_latest,
+        'file_name': version.file_name or (os.path.basename(version.file_path) if version.file_path else None),
+        'file_size': version.file_size,
+        'content_type': version.content_type,
+        'content_hash': version.content_hash,
+        'comments': version.comments or '',
+        'submitted_at': version.submitted_at.isoformat() if version.submitted_at else None,
+    }
+
+
+def version_history(submission_id):
+    """
+    List the versions of a submission, oldest first
+
+    Returns:
+        list: One dict of metadata per version
+    """
+    versions = (
+        SubmissionVersion.query
+        .filter_by(submission_id=submission_id)
+        .order_by(SubmissionVersion.version)
+        .all()
+    )
+    return [_version_dict(v) for v in versions]
+
+
+def diff_versions(history, old, new):
+    """
+    Compare the metadata of two versions
+
+    Args:
+        history (list): Output of version_history()
+        old (int): Version to compare from
+        new (int): Version to compare to
+
+    Returns:
+        dict: from, to, changes ({field: {'from': ..., 'to': ...}} for each
+            field of DIFF_FIELDS that differs), same_content and size_delta;
+            None if either version does not exist
+    """
+    by_number = {v['version']: v for v in history}
+    if old not in by_number or new not in by_number:
+        return None
+    a, b = by_number[old], by_number[new]
+    changes = {
+        field: {'from': a[field], 'to': b[field]}
+        for field in DIFF_FIELDS if a[field] != b[field]
+    }
+    size_delta = None
+    if a['file_size'] is not None and b['file_size'] is not None:
+        size_delta = b['file_size'] - a['file_size']
+    return {
+        'from': old,
+        'to': new,
+        'changes': changes,
+        'same_content': a['content_hash'] is not None and a['content_hash'] == b['content_hash'],
+        'size_delta': size_delta,
+    }
@@ -0,0 +1,136 @@
+"""
+Teacher dashboard data
+
+The headline numbers come from one summary query (a handful of scalar
+subqueries evaluated in a single round trip) and are always fresh. The
+recent classes / assignments / students widgets are cached per teacher
+under the versions of the teacher's classes (utils/versions.py), which go up
+with every submission, grade, enrollment or new assignment, and change when
+a class is added or deleted.
+"""
+from datetime import datetime
+from sqlalchemy import func, select
+from extensions import db
+from models.assignment import Assignment
+from models.class_model import Class, class_student
+from models.student import Student
+from models.submission import Submission
+from utils.cache import LRUCache
+from utils.versions import class_versions
+
+
+WIDGET_LIMIT = 5
+
+_cache = LRUCache(maxsize=256, name='teacher_dashboard')
+
+
+def dashboard_summary(teacher_id):
+    """
+    Get the dashboard counters in a single query
+
+    Args:
+        teacher_id (int): Teacher whose classes are counted
+
+    Returns:
+        dict: total_students (distinct across classes), total_classes,
+            pending_assignments (ungraded submissions) and upcoming_deadlines
+    """
+    teacher_classes = select(Class.id).where(Class.teacher_id == teacher_id)
+    teacher_assignments = select(Assignment.id).where(Assignment.class_id.in_(teacher_classes))
+
+    row = db.session.execute(select(
+        select(func.count(func.distinct(class_student.c.student_id)))
+        .where(class_student.c.class_id.in_(teacher_classes))
+        .scalar_subquery(),
+        select(func.count(Class.id))
+        .where(Class.teacher_id == teacher_id)
+        .scalar_subquery(),
+        select(func.count(Submission.id))
+        .where(Submission.assignment_id.in_(teacher_assignments), Submission.grade.is_(None))
+        .scalar_subquery(),
+        select(func.count(Assignment.id))
+        .where(Assignment.class_id.in_(teacher_classes), Assignment.due_date > datetime.utcnow())
+        .scalar_subquery()
+    )).one()
+
+    return {
+        'total_students': row[0],
+        'total_classes': row[1],
+        'pending_assignments': row[2],
+        'upcoming_deadlines': row[3],
+    }
+
+
+def _load_widgets(teacher_id):
+    # Enrollments of this teacher's classes only, not the whole table
+    teacher_classes = select(Class.id).where(Class.teacher_id == teacher_id)
+    student_counts = (
+        select(class_student.c.class_id, func.count(class_student.c.student_id).label('n'))
+        .where(class_student.c.class_id.in_(teacher_classes))
+        .group_by(class_student.c.class_id)
+        .subquery()
+    )
+    recent_classes = (
+        db.session.query(Class.id, Class.name, func.coalesce(student_counts.c.n, 0))
+        .outerjoin(student_counts, student_counts.c.class_id == Class.id)
+        .filter(Class.teacher_id == teacher_id)
+        .order_by(Class.created_at.desc(), Class.id.desc())
+        .limit(WIDGET_LIMIT)
+        .all()
+    )
+
+    recent_assignments = (
+        db.session.query(Assignment.id, Assignment.title, Assignment.due_date)
+        .join(Class, Assignment.class_id == Class.id)
+        .filter(Class.teacher_id == teacher_id)
+        .order_by(Assignment.created_at.desc())
+        .limit(WIDGET_LIMIT)
+        .all()
+    )
+
+    recent_submissions = (
+        db.session.query(
+            Student.id, Student.first_name, Student.last_name,
+            Class.name, Assignment.title, Submission.grade
+        )
+        .join(Submission, Submission.student_id == Student.id)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Class, Assignment.class_id == Class.id)
+        .filter(Class.teacher_id == teacher_id)
+        .order_by(Submission.submitted_at.desc())
+        .limit(WIDGET_LIMIT)
+        .all()
+    )
+
+    return {
+        'recent_classes': [{
+            'id': class_id,
+            'name': name,
+            'student_count': student_count,
+        } for class_id, name, student_count in recent_classes],
+        'recent_assignments': [{
+            'id': assignment_id,
+            'title': title,
+            'due_date': due_date.strftime('%b %d, %Y') if due_date else 'No date',
+            'status': 'pending',
+        } for assignment_id, title, due_date in recent_assignments],
+        'recent_students': [{
+            'id': student_id,
+            'first_name': first_name or '',
+            'last_name': last_name or '',
+            'class_name': class_name,
+            'last_assignment': title,
+            'grade': grade if grade else None,
+        } for student_id, first_name, last_name, class_name, title, grade in recent_submissions],
+    }
+
+
+def dashboard_widgets(teacher_id):
+    """
+    Get the recent classes, assignments and student submissions of a teacher
+
+    Returns:
+        dict: recent_classes, recent_assignments and recent_students lists
+    """
+    key = (teacher_id, class_versions(teacher_id))
+    return _cache.get_or_set(key, lambda: _load_widgets(teacher_id))
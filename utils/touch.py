@@ -0,0 +1,75 @@
+"""
+Deferred "touch" timestamp writes
+
+Columns such as User.last_login change on every request that touches them
+but nobody needs them to be exact to the millisecond. Instead of committing
+a write transaction per request, touches are queued in an in-process buffer
+(see utils/buffered.py) and written in batches: one executemany UPDATE per
+(table, column), keeping only the latest timestamp per row. The buffer is
+flushed every TOUCH_FLUSH_INTERVAL seconds, as soon as it holds
+TOUCH_FLUSH_SIZE entries, and at shutdown.
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam
+from extensions import db
+from utils.buffered import BatchBuffer
+
+
+def init_app(app):
+    """Create the touch buffer for an application"""
+    buffer = BatchBuffer(
+        lambda items: _write_touches(app, items),
+        max_items=app.config.get('TOUCH_FLUSH_SIZE', 200),
+        interval=app.config.get('TOUCH_FLUSH_INTERVAL', 5.0),
+        asynchronous=app.config.get('TOUCH_ASYNC', True),
+        name='touch-buffer'
+    )
+    app.extensions['touch_buffer'] = buffer
+
+
+def _write_touches(app, items):
+    # Collapse repeated touches of the same row to the newest timestamp
+    latest = {}
+    for table, column, row_id, value in items:
+        key = (table, column, row_id)
+        if key not in latest or latest[key] < value:
+            latest[key] = value
+
+    batches = {}
+    for (table, column, row_id), value in latest.items():
+        batches.setdefault((table, column), []).append({'_id': row_id, '_value': value})
+
+    # Dedicated connection, so a flush never commits a request's session
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for (table, column), params in batches.items():
+                statement = (
+                    table.update()
+                    .where(table.c.id == bindparam('_id'))
+                    .values({column: bindparam('_value')})
+                )
+                conn.execute(statement, params)
+
+
+def touch(model, column, row_id, when=None):
+    """
+    Queue a timestamp update for the next batch write
+
+    Args:
+        model: Model class whose table has an `id` primary key
+        column (str): Name of the timestamp column
+        row_id (int): Primary key of the row to update
+        when (datetime): Timestamp to store (default: now, UTC)
+    """
+    buffer = current_app.extensions.get('touch_buffer')
+    if buffer is None:
+        return
+    buffer.add((model.__table__, column, row_id, when or datetime.utcnow()))
+
+
+def flush_touches():
+    """Write any buffered touches now"""
+    buffer = current_app.extensions.get('touch_buffer')
+    if buffer is not None:
+        buffer.flush()
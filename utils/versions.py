@@ -0,0 +1,158 @@
+"""
+Version counters of classes and assignments
+
+Class.version and Assignment.version go up on every write that changes what
+a page about that class or assignment shows, so caches can key on them
+(utils/fragments.py) instead of being invalidated by hand:
+
+    assignment  its own columns and its submissions
+    class       its own columns, its enrolments, its assignments and their
+                submissions, and the names and emails of its students
+
+A before_flush listener picks up ORM changes; code that writes with Core
+statements (the submission upsert) calls touch_assignment() on the same
+connection. Counters are bumped with "version = version + 1" in SQL, so
+concurrent writers never hand out the same version twice, and since they
+live in the rows every worker sees the same value. The same UPDATE sets
+updated_at (the column's onupdate), which utils/conditional.py sends as
+Last-Modified.
+"""
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models.assignment import Assignment
+from models.class_model import Class
+from models.student import Student
+from models.submission import Submission
+from models.user import User
+
+
+# Columns of a student or user that the class pages show
+_STUDENT_COLUMNS = ('first_name', 'last_name')
+_USER_COLUMNS = ('username', 'email')
+
+
+def _changed(obj, columns):
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+def _old_and_new(obj, column):
+    # The current value and, if it changed in this flush, the previous one
+    history = inspect(obj).attrs[column].history
+    return set(history.added or [getattr(obj, column)]) | set(history.deleted or [])
+
+
+def _assignment_class_ids(session, assignment_ids):
+    # Classes of the given assignments: loaded ones from the identity map,
+    # the rest in one query
+    class_ids, missing = set(), set()
+    for assignment_id in assignment_ids:
+        assignment = session.identity_map.get(session.identity_key(Assignment, (assignment_id,)))
+        if assignment is not None:
+            class_ids.add(assignment.class_id)
+        else:
+            missing.add(assignment_id)
+    if missing:
+        assignments = Assignment.__table__
+        class_ids.update(session.connection().execute(
+            select(assignments.c.class_id).where(assignments.c.id.in_(sorted(missing)))
+        ).scalars())
+    return class_ids
+
+
+def _touched(session):
+    # Ids of the classes and assignments whose pages this flush changes
+    class_ids, assignment_ids, submitted_to = set(), set(), set()
+    for obj in session.new | session.dirty | session.deleted:
+        persisted = obj not in session.new
+        if isinstance(obj, Class):
+            if persisted and obj not in session.deleted and session.is_modified(obj, include_collections=False):
+                class_ids.add(obj.id)
+        elif isinstance(obj, Assignment):
+            class_ids |= _old_and_new(obj, 'class_id')
+            if persisted and obj not in session.deleted:
+                assignment_ids.add(obj.id)
+        elif isinstance(obj, Submission):
+            submitted_to |= _old_and_new(obj, 'assignment_id')
+        elif isinstance(obj, Student) and persisted:
+            enrolment = inspect(obj).attrs.classes.history
+            class_ids.update(cls.id for cls in enrolment.added + enrolment.deleted)
+            # A deleted student (or user) leaves every class roster
+            if obj in session.deleted or _changed(obj, _STUDENT_COLUMNS):
+                class_ids.update(cls.id for cls in obj.classes)
+        elif isinstance(obj, User) and persisted and _changed(obj, _USER_COLUMNS):
+            if obj.student_profile is not None:
+                class_ids.update(cls.id for cls in obj.student_profile.classes)
+    submitted_to.discard(None)
+    assignment_ids |= submitted_to
+    class_ids |= _assignment_class_ids(session, submitted_to)
+    class_ids.discard(None)
+    assignment_ids.discard(None)
+    return class_ids, assignment_ids
+
+
+def _bump(session, connection, model, ids):
+    if not ids:
+        return
+    connection.execute(
+        update(model.__table__)
+        .where(model.__table__.c.id.in_(sorted(ids)))
+        .values(version=model.__table__.c.version + 1)
+    )
+    # Loaded instances would otherwise keep the old number until expired
+    for entity_id in ids:
+        obj = session.identity_map.get(session.identity_key(model, (entity_id,)))
+        if obj is not None:
+            session.expire(obj, ['version', 'updated_at'])
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions(session, flush_context, instances):
+    class_ids, assignment_ids = _touched(session)
+    if class_ids or assignment_ids:
+        connection = session.connection()
+        _bump(session, connection, Class, class_ids)
+        _bump(session, connection, Assignment, assignment_ids)
+
+
+def touch_assignment(connection, assignment_id):
+    """
+    Bump the versions of an assignment and its class after a Core write
+
+    Args:
+        connection (Connection): Connection of the transaction that wrote
+        assignment_id (int): Assignment whose submissions changed
+    """
+    assignments = Assignment.__table__
+    classes = Class.__table__
+    connection.execute(
+        update(assignments)
+        .where(assignments.c.id == assignment_id)
+        .values(version=assignments.c.version + 1)
+    )
+    connection.execute(
+        update(classes)
+        .where(classes.c.id == select(assignments.c.class_id)
+               .where(assignments.c.id == assignment_id).scalar_subquery())
+        .values(version=classes.c.version + 1)
+    )
+
+
+def class_versions(teacher_id):
+    """
+    Versions of a teacher's classes, for keying caches of data about them
+
+    updated_at is part of each version, as counters start again at 1 in a
+    recreated database.
+
+    Returns:
+        tuple: (class_id, version, updated_at) tuples ordered by class id
+    """
+    rows = (
+        db.session.query(Class.id, Class.version, Class.updated_at)
+        .filter(Class.teacher_id == teacher_id)
+        .order_by(Class.id)
+        .all()
+    )
+    return tuple(tuple(row) for row in rows)